@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Artifact Store
+Content-addressed storage for the images the services hand back to the web
+app (annotated frames, plate crops, upscaled crops).
+
+Files are named <kind>_<sha1 of the encoded bytes><ext>, so rendering the same
+frame twice reuses the existing file instead of writing a new one. Writes go
+to a temporary file that is renamed into place, so a reader never sees a
+partial JPEG. Old files are evicted by age and by total size; only files
+following the store's naming scheme are touched, so uploads the API keeps in
+the same directory are left alone.
+
+Callers that do not need a file (in-process use, msgpack result frames) can
+take the encoded buffer from encode_image() and skip the store.
+
+Settings (environment):
+    ML_ARTIFACTS_DIR            store root (default: backend/temp)
+    ML_ARTIFACTS_MAX_MB         size cap, oldest artifacts evicted first (default 200)
+    ML_ARTIFACTS_MAX_AGE_HOURS  artifacts older than this are evicted (default 24)
+"""
+
+import os
+import re
+import time
+import hashlib
+import tempfile
+from pathlib import Path
+
+import cv2
+
+ML_DIR = Path(__file__).resolve().parent
+
+DIR_ENV_VAR = "ML_ARTIFACTS_DIR"
+MAX_MB_ENV_VAR = "ML_ARTIFACTS_MAX_MB"
+MAX_AGE_ENV_VAR = "ML_ARTIFACTS_MAX_AGE_HOURS"
+
+DEFAULT_DIR = ML_DIR.parent / 'temp'
+DEFAULT_MAX_MB = 200
+DEFAULT_MAX_AGE_HOURS = 24
+# Retention is checked on the first write and then every N writes
+EVICT_EVERY = 50
+
+ARTIFACT_NAME = re.compile(r"^[a-z_]+_[0-9a-f]{40}\.[a-z]+$")
+
+def _env_float(env_var, default):
+    try:
+        return float(os.environ[env_var])
+    except (KeyError, ValueError):
+        return default
+
+def encode_image(image, ext='.jpg', params=None):
+    """
+    Encode a frame in memory
+
+    Args:
+        image (numpy.ndarray): BGR image
+        ext (str): Output format extension understood by cv2.imencode
+        params (list): cv2.IMWRITE_* parameters
+
+    Returns:
+        bytes: Encoded image
+    """
+    ok, buffer = cv2.imencode(ext, image, params or [])
+    if not ok:
+        raise ValueError(f"Could not encode image as {ext}")
+    return buffer.tobytes()
+
+class ArtifactStore:
+    """Deduplicating, size- and age-capped directory of encoded images"""
+
+    def __init__(self, root=None, max_bytes=None, max_age_seconds=None):
+        self.root = Path(root or os.environ.get(DIR_ENV_VAR) or DEFAULT_DIR)
+        self.max_bytes = max_bytes if max_bytes is not None else \
+            int(_env_float(MAX_MB_ENV_VAR, DEFAULT_MAX_MB) * 1024 * 1024)
+        self.max_age_seconds = max_age_seconds if max_age_seconds is not None else \
+            _env_float(MAX_AGE_ENV_VAR, DEFAULT_MAX_AGE_HOURS) * 3600
+        self._writes = 0
+
+    def path_for(self, data, kind, ext):
+        return self.root / f"{kind}_{hashlib.sha1(data).hexdigest()}{ext}"
+
+    def put_bytes(self, data, kind, ext='.jpg'):
+        """
+        Store encoded bytes under their content hash
+
+        Returns:
+            Path: Location of the artifact (existing one when already stored)
+        """
+        path = self.path_for(data, kind, ext)
+        if path.exists():
+            # Refresh the age so a reused artifact is not evicted first
+            os.utime(path)
+        else:
+            self.root.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.tmp_')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        if self._writes % EVICT_EVERY == 0:
+            self.enforce_retention(keep=path)
+        self._writes += 1
+        return path
+
+    def put_image(self, image, kind, ext='.jpg', params=None):
+        """Encode a frame and store it; returns its Path"""
+        return self.put_bytes(encode_image(image, ext, params), kind, ext)
+
+    def enforce_retention(self, keep=None):
+        """
+        Evict expired artifacts, then the oldest ones until the store fits
+        in max_bytes
+
+        Args:
+            keep (Path): Artifact that must survive (the one just written)
+
+        Returns:
+            int: Bytes used by the remaining artifacts
+        """
+        if not self.root.is_dir():
+            return 0
+        now = time.time()
+        entries = []
+        for path in self.root.iterdir():
+            if not ARTIFACT_NAME.match(path.name):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in sorted(entries):
+            if path == keep:
+                continue
+            if now - mtime <= self.max_age_seconds and total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
+
+_store = None
+
+def get_store():
+    """Process-wide store configured from the environment"""
+    global _store
+    if _store is None:
+        _store = ArtifactStore()
+    return _store
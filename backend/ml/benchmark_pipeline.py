@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+ML Pipeline Benchmark Suite
+Measures cold-start and warm latency, throughput at several task chunk sizes
+and worker counts, and peak RSS for the detection, OCR, full-pipeline and crop
+workloads over a fixed local image set.
+
+Run from the backend directory (model paths are relative to it):
+
+    python ml/benchmark_pipeline.py --images datasets/vehicle_detection/test/images --limit 20
+
+Results are written as JSON to benchmarks/results/ so runs can be compared
+across commits with ml/compare_benchmarks.py.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import platform
+import subprocess
+import multiprocessing
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(ML_DIR)
+sys.path.append(ML_DIR)
+from stage_timer import summarize_samples
+
+RESULTS_SCHEMA_VERSION = 2
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# workload name -> (module, entry point)
+WORKLOADS = {
+    "detect": ("detect", "detect_vehicles"),
+    "plates": ("detect_license_plate", "detect_license_plates"),
+    "ocr": ("license_plate_ocr", "extract_license_plate_text"),
+    "full": ("license_plate_full_service", "process_license_plate_full"),
+    "crop": ("detect_and_crop_service", "detect_and_crop_license_plates"),
+}
+
+def _load_workload(name):
+    """Import the entry point for a workload"""
+    if ML_DIR not in sys.path:
+        sys.path.append(ML_DIR)
+    module_name, func_name = WORKLOADS[name]
+    module = __import__(module_name)
+    return getattr(module, func_name)
+
+def _peak_rss_kb():
+    """Peak resident set size of the current process in KB (None if unknown)"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS, kilobytes on Linux
+        return int(peak / 1024) if sys.platform == "darwin" else int(peak)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return int(getattr(info, "peak_wset", info.rss) / 1024)
+    except ImportError:
+        return None
+
+def _is_success(result):
+    return isinstance(result, dict) and bool(result.get("success"))
+
+def create_synthetic_images(output_dir, count, seed=0):
+    """
+    Render deterministic synthetic plate images with create_test_image_with_text
+
+    Args:
+        output_dir (Path): Directory for the generated images
+        count (int): Number of images
+        seed (int): Seed for the plate texts
+
+    Returns:
+        list: Paths of the generated images
+    """
+    if count <= 0:
+        return []
+    sys.path.append(BACKEND_DIR)
+    import cv2
+    from test_license_plate_pipeline import create_test_image_with_text
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    letters = "ABCDEFGHJKLMNPRSTUVWXYZ"
+    paths = []
+    for i in range(count):
+        text = (rng.choice(["MH", "KA", "DL", "TN", "KL"]) + f"{rng.randint(1, 99):02d}"
+                + "".join(rng.choice(letters) for _ in range(2)) + f"{rng.randint(0, 9999):04d}")
+        path = output_dir / f"synthetic_{seed}_{i:04d}_{text}.jpg"
+        if not path.exists():
+            cv2.imwrite(str(path), create_test_image_with_text(text, width=900, height=300))
+        paths.append(str(path))
+    return paths
+
+def collect_images(images_dir, limit):
+    """Sorted, optionally truncated list of images so the set is stable across runs"""
+    if not images_dir:
+        return []
+    directory = Path(images_dir)
+    if not directory.exists():
+        print(f"Warning: image directory not found: {directory}")
+        return []
+    paths = sorted(str(p) for p in directory.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+    return paths[:limit] if limit else paths
+
+def image_set_fingerprint(paths):
+    """Content hash of the image set so results are only compared on identical inputs"""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.basename(path).encode("utf-8"))
+        with open(path, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()[:16]
+
+def _git_revision():
+    try:
+        revision = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True,
+                                  text=True, cwd=ML_DIR).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--', ML_DIR], capture_output=True,
+                               text=True, cwd=ML_DIR).stdout.strip()
+        return {"commit": revision or None, "dirty": bool(dirty)}
+    except OSError:
+        return {"commit": None, "dirty": None}
+
+def _package_versions():
+    versions = {}
+    for module in ("ultralytics", "torch", "cv2", "numpy", "easyocr", "pytesseract"):
+        try:
+            versions[module] = getattr(__import__(module), "__version__", "unknown")
+        except Exception:
+            versions[module] = None
+    return versions
+
+def measure_cold_start(workload, image_path, runs):
+    """
+    Time `runs` fresh interpreters that import the entry point, load the
+    model and process one image, matching how the Node routes call the scripts
+    """
+    module_name, func_name = WORKLOADS[workload]
+    snippet = (f"import sys; sys.path.append({ML_DIR!r}); "
+               f"from {module_name} import {func_name}; {func_name}({image_path!r})")
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-c", snippet], capture_output=True,
+                                   text=True, cwd=os.getcwd())
+        elapsed = (time.perf_counter() - start) * 1000.0
+        if completed.returncode != 0:
+            return {"error": completed.stderr.strip().splitlines()[-1:] or ["cold start failed"]}
+        durations.append(elapsed)
+    return summarize_samples(durations)
+
+def _measure_warm(workload, paths, warm_runs):
+    """Child-process body: warm up once, then time every call"""
+    func = _load_workload(workload)
+    func(paths[0])
+    latencies = []
+    successes = 0
+    for _ in range(warm_runs):
+        for path in paths:
+            start = time.perf_counter()
+            result = func(path)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+            successes += _is_success(result)
+    return {"latencies_ms": latencies, "successes": successes, "peak_rss_kb": _peak_rss_kb()}
+
+_worker_func = None
+
+def _init_worker(workload, warmup_path, barrier):
+    """Pool initializer: load and warm the model, then wait for every worker"""
+    global _worker_func
+    _worker_func = _load_workload(workload)
+    _worker_func(warmup_path)
+    barrier.wait(timeout=600)
+
+def _run_chunk(paths):
+    start = time.time()
+    for path in paths:
+        _worker_func(path)
+    return start, time.time(), len(paths), _peak_rss_kb()
+
+def measure_throughput(workload, paths, workers, chunk_size, repeats):
+    """
+    Images per second for a warmed pool of `workers` processes, each task
+    processing `chunk_size` images one call at a time
+
+    The entry points take one image per call, so the chunk size only changes
+    the per-task dispatch overhead; it is not batched inference. Wall time
+    runs from the first chunk start to the last chunk end, so model loading
+    in the pool initializer is excluded.
+    """
+    work = paths * repeats
+    chunks = [work[i:i + chunk_size] for i in range(0, len(work), chunk_size)]
+    # Every worker must receive a chunk or the start barrier never releases
+    workers = min(workers, len(chunks))
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(workload, paths[0], barrier)) as executor:
+        spans = list(executor.map(_run_chunk, chunks))
+    wall_s = max(end for _, end, _, _ in spans) - min(start for start, _, _, _ in spans)
+    images = sum(count for _, _, count, _ in spans)
+    rss_values = [rss for _, _, _, rss in spans if rss is not None]
+    return {
+        "workers": workers,
+        "chunk_size": chunk_size,
+        "images": images,
+        "wall_s": round(wall_s, 3),
+        "images_per_sec": round(images / wall_s, 3) if wall_s > 0 else None,
+        "peak_rss_kb_per_worker": max(rss_values) if rss_values else None
+    }
+
+def run_workload(workload, paths, config):
+    """Cold start, warm latency and throughput for one workload"""
+    print(f"\n▶ {workload} ({len(paths)} images)")
+    try:
+        _load_workload(workload)
+    except Exception as e:
+        print(f"  skipped: {e}")
+        return {"skipped": str(e)}
+
+    entry = {"entry_point": ".".join(WORKLOADS[workload]), "images": len(paths)}
+
+    entry["cold_start_ms"] = measure_cold_start(workload, paths[0], config.cold_runs)
+    print(f"  cold start: {entry['cold_start_ms']}")
+
+    # Warm latency in a fresh process so peak RSS belongs to this workload only
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        warm = executor.submit(_measure_warm, workload, paths, config.warm_runs).result()
+    entry["warm_latency_ms"] = summarize_samples(warm["latencies_ms"])
+    entry["success_rate"] = round(warm["successes"] / len(warm["latencies_ms"]), 4)
+    entry["peak_rss_kb"] = warm["peak_rss_kb"]
+    print(f"  warm latency: {entry['warm_latency_ms']}")
+
+    entry["throughput"] = []
+    for workers in config.workers:
+        for chunk_size in config.chunk_sizes:
+            point = measure_throughput(workload, paths, workers, chunk_size, config.warm_runs)
+            entry["throughput"].append(point)
+            print(f"  workers={workers} chunk={chunk_size}: {point['images_per_sec']} img/s")
+    return entry
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the backend/ml pipeline")
+    parser.add_argument("--images", default="datasets/vehicle_detection/test/images",
+                        help="Directory of real images (sorted, truncated by --limit)")
+    parser.add_argument("--limit", type=int, default=20, help="Maximum real images (0 = all)")
+    parser.add_argument("--synthetic", type=int, default=10,
+                        help="Synthetic plate images from create_test_image_with_text")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for synthetic plate texts")
+    parser.add_argument("--workloads", default=",".join(WORKLOADS),
+                        help=f"Comma list of {', '.join(WORKLOADS)}")
+    parser.add_argument("--cold-runs", type=int, default=3, help="Fresh interpreter runs per workload")
+    parser.add_argument("--warm-runs", type=int, default=3, help="Passes over the image set when warm")
+    parser.add_argument("--chunk-sizes", type=_int_list, default=[1, 4, 8],
+                        help="Images per pool task, run one call at a time (not batched inference)")
+    parser.add_argument("--workers", type=_int_list, default=[1, 2])
+    parser.add_argument("--output", default="benchmarks/results", help="Directory for result JSON")
+    parser.add_argument("--label", default="", help="Free-form label stored with the run")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    config = parse_args(argv)
+    output_dir = Path(config.output)
+
+    real_images = collect_images(config.images, config.limit)
+    synthetic_images = create_synthetic_images(output_dir.parent / "synthetic",
+                                               config.synthetic, config.seed)
+    all_images = real_images + synthetic_images
+    if not all_images:
+        print("❌ No benchmark images. Pass --images or --synthetic.")
+        return 1
+
+    workloads = [w.strip() for w in config.workloads.split(",") if w.strip()]
+    unknown = [w for w in workloads if w not in WORKLOADS]
+    if unknown:
+        print(f"❌ Unknown workloads: {', '.join(unknown)}")
+        return 1
+
+    print("ML Pipeline Benchmark")
+    print("=====================")
+    print(f"Images: {len(real_images)} real + {len(synthetic_images)} synthetic")
+
+    run = {
+        "schema_version": RESULTS_SCHEMA_VERSION,
+        "label": config.label,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git": _git_revision(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "packages": _package_versions()
+        },
+        "config": {
+            "images_dir": config.images,
+            "real_images": len(real_images),
+            "synthetic_images": len(synthetic_images),
+            "seed": config.seed,
+            "cold_runs": config.cold_runs,
+            "warm_runs": config.warm_runs,
+            "chunk_sizes": config.chunk_sizes,
+            "workers": config.workers,
+            "image_set_fingerprint": image_set_fingerprint(all_images)
+        },
+        "workloads": {}
+    }
+
+    for workload in workloads:
+        # OCR benchmarks the recognizer on plate-like crops only
+        paths = synthetic_images if workload == "ocr" and synthetic_images else all_images
+        run["workloads"][workload] = run_workload(workload, paths, config)
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    commit = (run["git"]["commit"] or "nogit")[:7]
+    output_path = output_dir / f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{commit}.json"
+    with open(output_path, 'w') as f:
+        json.dump(run, f, indent=2)
+
+    print(f"\n✅ Results saved to {output_path}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Benchmark Regression Gate
+Compares two result files from ml/benchmark_pipeline.py per workload and
+exits non-zero when the candidate regresses beyond the configured tolerances.
+
+    python ml/compare_benchmarks.py benchmarks/results/bench_A.json benchmarks/results/bench_B.json
+
+Exit codes: 0 = no regression, 1 = regression found, 2 = runs not comparable.
+"""
+
+import sys
+import json
+import argparse
+
+# metric -> (path inside a workload entry, direction, default tolerance in %)
+METRICS = {
+    "cold_start_p50": (("cold_start_ms", "p50"), "lower", 15.0),
+    "warm_p50": (("warm_latency_ms", "p50"), "lower", 10.0),
+    "warm_p95": (("warm_latency_ms", "p95"), "lower", 15.0),
+    "peak_rss_kb": (("peak_rss_kb",), "lower", 10.0),
+    "throughput": (None, "higher", 10.0),
+}
+
+# Success rate is compared in absolute percentage points, not relative change
+DEFAULT_SUCCESS_RATE_DROP = 1.0
+# Latency changes smaller than this are treated as noise regardless of percentage
+DEFAULT_MIN_DELTA_MS = 2.0
+
+def load_run(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def _lookup(entry, path):
+    value = entry
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value if isinstance(value, (int, float)) else None
+
+def _throughput_points(entry):
+    # Schema 1 results called the chunk size "batch_size"
+    return {
+        (point["workers"], point.get("chunk_size", point.get("batch_size"))): point.get("images_per_sec")
+        for point in entry.get("throughput", [])
+    }
+
+def _check(name, baseline, candidate, direction, tolerance_pct, min_delta=0.0):
+    """
+    Build one comparison row; `regression` is True when outside tolerance or
+    when the candidate lost a metric the baseline has (e.g. a failed cold start)
+    """
+    row = {"metric": name, "baseline": baseline, "candidate": candidate,
+           "change_pct": None, "tolerance_pct": tolerance_pct, "regression": False}
+    if baseline is None:
+        row["status"] = "missing"
+        return row
+    if candidate is None:
+        row["regression"] = True
+        row["status"] = "REGRESSION (missing)"
+        return row
+    delta = candidate - baseline
+    if baseline:
+        row["change_pct"] = round(delta / baseline * 100.0, 2)
+    worse = delta > 0 if direction == "lower" else delta < 0
+    if worse and abs(delta) >= min_delta and (row["change_pct"] is None or abs(row["change_pct"]) > tolerance_pct):
+        row["regression"] = True
+        row["status"] = "REGRESSION"
+    elif not worse and row["change_pct"] is not None and abs(row["change_pct"]) > tolerance_pct:
+        row["status"] = "improved"
+    else:
+        row["status"] = "ok"
+    return row
+
+def compare_runs(baseline, candidate, tolerances=None, success_rate_drop=DEFAULT_SUCCESS_RATE_DROP,
+                 min_delta_ms=DEFAULT_MIN_DELTA_MS):
+    """
+    Compare every workload the baseline ran; candidate skips and lost metrics are regressions
+
+    Args:
+        baseline (dict): Baseline benchmark run
+        candidate (dict): Candidate benchmark run
+        tolerances (dict): Metric name -> allowed change in percent
+        success_rate_drop (float): Allowed success-rate drop in percentage points
+        min_delta_ms (float): Ignore latency changes below this many milliseconds
+
+    Returns:
+        dict: {workload: [rows]} plus a `regressions` count
+    """
+    tolerances = {name: spec[2] for name, spec in METRICS.items()} | (tolerances or {})
+    report = {"workloads": {}, "regressions": 0}
+
+    for workload, base_entry in baseline.get("workloads", {}).items():
+        cand_entry = candidate.get("workloads", {}).get(workload)
+        if "skipped" in base_entry:
+            report["workloads"][workload] = [{"metric": "-", "status": "skipped", "regression": False}]
+            continue
+        if cand_entry is None or "skipped" in cand_entry:
+            # The baseline ran this workload; a candidate that cannot is broken
+            reason = "absent" if cand_entry is None else cand_entry["skipped"]
+            report["workloads"][workload] = [{"metric": "-", "baseline": "ran", "candidate": reason,
+                                              "status": "REGRESSION (skipped)", "regression": True}]
+            report["regressions"] += 1
+            continue
+
+        rows = []
+        for name, (path, direction, _) in METRICS.items():
+            if path is None:
+                continue
+            min_delta = min_delta_ms if path[0].endswith("_ms") else 0.0
+            rows.append(_check(name, _lookup(base_entry, path), _lookup(cand_entry, path),
+                               direction, tolerances[name], min_delta))
+
+        base_points = _throughput_points(base_entry)
+        cand_points = _throughput_points(cand_entry)
+        for key in sorted(base_points):
+            rows.append(_check(f"throughput[w={key[0]},c={key[1]}]", base_points[key],
+                               cand_points.get(key), "higher", tolerances["throughput"]))
+
+        base_rate = base_entry.get("success_rate")
+        cand_rate = cand_entry.get("success_rate")
+        if base_rate is not None and cand_rate is not None:
+            change_points = round((cand_rate - base_rate) * 100.0, 2) + 0.0
+            regression = -change_points > success_rate_drop
+            rows.append({"metric": "success_rate", "baseline": base_rate, "candidate": cand_rate,
+                         "change_pct": change_points, "tolerance_pct": success_rate_drop,
+                         "regression": regression, "status": "REGRESSION" if regression else "ok"})
+
+        report["workloads"][workload] = rows
+        report["regressions"] += sum(1 for row in rows if row["regression"])
+    return report
+
+def comparability_problems(baseline, candidate):
+    """Reasons two runs should not be compared (different inputs or settings)"""
+    problems = []
+    base_config = baseline.get("config", {})
+    cand_config = candidate.get("config", {})
+    for key in ("image_set_fingerprint", "warm_runs"):
+        if base_config.get(key) != cand_config.get(key):
+            problems.append(f"{key} differs: {base_config.get(key)} vs {cand_config.get(key)}")
+    if baseline.get("environment", {}).get("cpu_count") != candidate.get("environment", {}).get("cpu_count"):
+        problems.append("runs were made on machines with different CPU counts")
+    return problems
+
+def print_report(report):
+    for workload, rows in report["workloads"].items():
+        print(f"\n{workload}")
+        print("-" * 78)
+        for row in rows:
+            change = row.get("change_pct")
+            change_text = f"{change:+.1f}%" if isinstance(change, (int, float)) else "n/a"
+            print(f"  {row['metric']:<28} {str(row.get('baseline')):>12} -> {str(row.get('candidate')):>12}"
+                  f"  {change_text:>8}  {row['status']}")
+
+def _parse_tolerance(value):
+    name, _, pct = value.partition("=")
+    if name not in METRICS or not pct:
+        raise argparse.ArgumentTypeError(f"expected <metric>=<percent> with metric in {', '.join(METRICS)}")
+    return name, float(pct)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail on performance regressions between benchmark runs")
+    parser.add_argument("baseline", help="Baseline result JSON")
+    parser.add_argument("candidate", help="Candidate result JSON")
+    parser.add_argument("--tolerance", type=_parse_tolerance, action="append", default=[],
+                        help="Override a tolerance, e.g. warm_p95=20 (repeatable)")
+    parser.add_argument("--config", help="JSON file with {metric: percent} tolerances")
+    parser.add_argument("--success-rate-drop", type=float, default=DEFAULT_SUCCESS_RATE_DROP,
+                        help="Allowed success-rate drop in percentage points")
+    parser.add_argument("--min-delta-ms", type=float, default=DEFAULT_MIN_DELTA_MS,
+                        help="Ignore latency changes smaller than this")
+    parser.add_argument("--allow-different-inputs", action="store_true",
+                        help="Compare even if image sets or settings differ")
+    parser.add_argument("--json", help="Write the comparison report to this path")
+    args = parser.parse_args(argv)
+
+    tolerances = {}
+    if args.config:
+        with open(args.config, 'r') as f:
+            tolerances.update(json.load(f))
+    tolerances.update(dict(args.tolerance))
+
+    baseline = load_run(args.baseline)
+    candidate = load_run(args.candidate)
+
+    problems = comparability_problems(baseline, candidate)
+    if problems:
+        for problem in problems:
+            print(f"⚠️  {problem}")
+        if not args.allow_different_inputs:
+            print("❌ Runs are not comparable (use --allow-different-inputs to override)")
+            return 2
+
+    report = compare_runs(baseline, candidate, tolerances, args.success_rate_drop, args.min_delta_ms)
+    report["baseline"] = {"path": args.baseline, "git": baseline.get("git")}
+    report["candidate"] = {"path": args.candidate, "git": candidate.get("git")}
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if report["regressions"]:
+        print(f"\n❌ {report['regressions']} performance regression(s) beyond tolerance")
+        return 1
+    print("\n✅ No performance regressions beyond tolerance")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
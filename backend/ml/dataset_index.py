@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Dataset Label Index
+Parses every YOLO label file of the datasets/vehicle_detection layout once
+into a compact columnar cache and reports class balance, box-size and
+aspect-ratio histograms, corrupt/empty labels and duplicate images.
+
+The cache (<dataset>/.label_index.npz) is reused incrementally: only images
+or labels whose size/mtime changed are re-read and re-hashed.
+
+    cd backend
+    python ml/dataset_index.py --dataset datasets/vehicle_detection --report label_report.json
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from yolo_dataset import list_images, label_path_for, load_class_names, parse_label_text
+
+INDEX_FILENAME = '.label_index.npz'
+INDEX_VERSION = 1
+DEFAULT_SPLITS = ('train', 'valid', 'test')
+
+# sqrt(w * h) of the normalized box: how much of the frame the object covers
+SIZE_BINS = [0.0, 0.02, 0.05, 0.1, 0.2, 0.4, 1.0]
+# Pixel width / height
+ASPECT_BINS = [0.0, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 4.0, 6.0, 8.0, np.inf]
+
+def _stat_signature(path):
+    try:
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+    except FileNotFoundError:
+        return -1, -1
+
+def _hash_file(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _image_size(path):
+    from PIL import Image
+    try:
+        with Image.open(path) as img:
+            return img.size
+    except Exception:
+        return -1, -1
+
+def load_index(dataset_path):
+    """Previous index as {image key: row dict} plus its box arrays, or empty"""
+    index_path = Path(dataset_path) / INDEX_FILENAME
+    if not index_path.exists():
+        return {}
+    try:
+        data = np.load(index_path, allow_pickle=False)
+        if int(data['version']) != INDEX_VERSION:
+            return {}
+    except Exception:
+        return {}
+
+    rows = {}
+    offsets = data['box_offsets']
+    for i, key in enumerate(data['image_key']):
+        start, end = offsets[i], offsets[i + 1]
+        rows[str(key)] = {
+            "split": str(data['image_split'][i]),
+            "width": int(data['image_width'][i]),
+            "height": int(data['image_height'][i]),
+            "image_sig": tuple(int(v) for v in data['image_sig'][i]),
+            "label_sig": tuple(int(v) for v in data['label_sig'][i]),
+            "hash": str(data['image_hash'][i]),
+            "bad_lines": int(data['bad_lines'][i]),
+            "boxes": data['boxes'][start:end],
+            "classes": data['box_class'][start:end],
+        }
+    return rows
+
+def _index_image(image_path, split):
+    label_path = label_path_for(image_path)
+    width, height = _image_size(image_path)
+    try:
+        with open(label_path, 'r') as f:
+            boxes, bad_lines = parse_label_text(f.read())
+    except FileNotFoundError:
+        boxes, bad_lines = [], 0
+    classes = np.array([b[0] for b in boxes], dtype=np.int16)
+    coords = np.array([b[1:] for b in boxes], dtype=np.float32).reshape(-1, 4)
+    return {
+        "split": split,
+        "width": width,
+        "height": height,
+        "image_sig": _stat_signature(image_path),
+        "label_sig": _stat_signature(label_path),
+        "hash": _hash_file(image_path),
+        "bad_lines": bad_lines,
+        "boxes": coords,
+        "classes": classes,
+    }
+
+def build_index(dataset_path, splits=DEFAULT_SPLITS):
+    """
+    Index every image/label pair of `splits`, reusing unchanged rows from
+    the cache; the cached rows of other splits are kept
+
+    Returns:
+        tuple: (rows dict keyed by 'split/filename', number of rows re-read)
+    """
+    dataset_path = Path(dataset_path)
+    previous = load_index(dataset_path)
+    rows = {}
+    reindexed = 0
+    for split in splits:
+        for image_path in list_images(dataset_path / split / 'images'):
+            key = f"{split}/{image_path.name}"
+            cached = previous.get(key)
+            if (cached is not None
+                    and cached["image_sig"] == _stat_signature(image_path)
+                    and cached["label_sig"] == _stat_signature(label_path_for(image_path))):
+                rows[key] = cached
+                continue
+            rows[key] = _index_image(image_path, split)
+            reindexed += 1
+    # Rows of splits not indexed this time stay in the cache
+    merged = {key: row for key, row in previous.items() if row["split"] not in splits}
+    merged.update(rows)
+    if reindexed or set(merged) != set(previous):
+        save_index(dataset_path, merged)
+    return rows, reindexed
+
+def save_index(dataset_path, rows):
+    """Write rows as columnar arrays: one entry per image, boxes concatenated"""
+    keys = sorted(rows)
+    counts = [len(rows[k]["classes"]) for k in keys]
+    offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(counts)
+    arrays = {
+        "version": np.array(INDEX_VERSION),
+        "image_key": np.array(keys, dtype=str),
+        "image_split": np.array([rows[k]["split"] for k in keys], dtype=str),
+        "image_width": np.array([rows[k]["width"] for k in keys], dtype=np.int32),
+        "image_height": np.array([rows[k]["height"] for k in keys], dtype=np.int32),
+        "image_sig": np.array([rows[k]["image_sig"] for k in keys], dtype=np.int64).reshape(-1, 2),
+        "label_sig": np.array([rows[k]["label_sig"] for k in keys], dtype=np.int64).reshape(-1, 2),
+        "image_hash": np.array([rows[k]["hash"] for k in keys], dtype=str),
+        "bad_lines": np.array([rows[k]["bad_lines"] for k in keys], dtype=np.int32),
+        "box_offsets": offsets,
+        "box_class": (np.concatenate([rows[k]["classes"] for k in keys]).astype(np.int16)
+                      if keys else np.zeros(0, dtype=np.int16)),
+        "boxes": (np.concatenate([rows[k]["boxes"] for k in keys]).astype(np.float32).reshape(-1, 4)
+                  if keys else np.zeros((0, 4), dtype=np.float32)),
+    }
+    index_path = Path(dataset_path) / INDEX_FILENAME
+    tmp_path = index_path.with_name(index_path.stem + '.tmp.npz')
+    np.savez_compressed(tmp_path, **arrays)
+    os.replace(tmp_path, index_path)
+
+def _histogram(values, bins):
+    counts, _ = np.histogram(values, bins=bins)
+    labels = [f"{lo:g}-{hi:g}" if np.isfinite(hi) else f">{lo:g}" for lo, hi in zip(bins[:-1], bins[1:])]
+    return dict(zip(labels, (int(c) for c in counts)))
+
+def dataset_report(rows, class_names):
+    """Class balance, histograms and integrity findings for an index"""
+    keys = sorted(rows)
+    classes = np.concatenate([rows[k]["classes"] for k in keys]) if keys else np.zeros(0, np.int16)
+    boxes = np.concatenate([rows[k]["boxes"] for k in keys]).reshape(-1, 4) if keys else np.zeros((0, 4))
+    widths = np.concatenate([np.full(len(rows[k]["classes"]), rows[k]["width"]) for k in keys]) if keys else np.zeros(0)
+    heights = np.concatenate([np.full(len(rows[k]["classes"]), rows[k]["height"]) for k in keys]) if keys else np.zeros(0)
+    splits = np.concatenate([np.full(len(rows[k]["classes"]), rows[k]["split"]) for k in keys]) if keys else np.zeros(0, str)
+
+    def name_for(class_id):
+        return class_names[class_id] if 0 <= class_id < len(class_names) else f"unknown_{class_id}"
+
+    report = {"images": len(keys), "boxes": int(len(classes)), "class_counts": {}, "per_class": {}}
+    for split in sorted(set(rows[k]["split"] for k in keys)):
+        ids, counts = np.unique(classes[splits == split], return_counts=True)
+        report["class_counts"][split] = {name_for(int(i)): int(c) for i, c in zip(ids, counts)}
+
+    sizes = np.sqrt(np.clip(boxes[:, 2] * boxes[:, 3], 0, None))
+    pixel_aspect = np.divide(boxes[:, 2] * widths, boxes[:, 3] * heights,
+                             out=np.zeros(len(boxes)), where=(boxes[:, 3] * heights) > 0)
+    for class_id in np.unique(classes):
+        mask = classes == class_id
+        report["per_class"][name_for(int(class_id))] = {
+            "boxes": int(mask.sum()),
+            "size_histogram": _histogram(sizes[mask], SIZE_BINS),
+            "aspect_ratio_histogram": _histogram(pixel_aspect[mask], ASPECT_BINS),
+            "median_box_px": [round(float(np.median(boxes[mask, 2] * widths[mask])), 1),
+                              round(float(np.median(boxes[mask, 3] * heights[mask])), 1)]
+        }
+
+    problems = {"unreadable_images": [], "missing_labels": [], "empty_labels": [],
+                "corrupt_labels": [], "out_of_range_boxes": [], "unknown_classes": []}
+    for key in keys:
+        row = rows[key]
+        if row["width"] <= 0:
+            problems["unreadable_images"].append(key)
+        if row["label_sig"][0] < 0:
+            problems["missing_labels"].append(key)
+        elif row["label_sig"][0] == 0 or (len(row["classes"]) == 0 and row["bad_lines"] == 0):
+            problems["empty_labels"].append(key)
+        if row["bad_lines"]:
+            problems["corrupt_labels"].append(key)
+        b = row["boxes"]
+        if len(b) and (np.any(b[:, :2] < 0) or np.any(b[:, :2] > 1)
+                       or np.any(b[:, 2:] <= 0) or np.any(b[:, 2:] > 1)):
+            problems["out_of_range_boxes"].append(key)
+        if len(row["classes"]) and (row["classes"].min() < 0 or row["classes"].max() >= len(class_names)):
+            problems["unknown_classes"].append(key)
+
+    by_hash = {}
+    for key in keys:
+        by_hash.setdefault(rows[key]["hash"], []).append(key)
+    problems["duplicate_images"] = [group for group in by_hash.values() if len(group) > 1]
+    # The same image in train and valid/test leaks into the validation metrics
+    problems["cross_split_duplicates"] = [
+        group for group in problems["duplicate_images"] if len({k.split('/')[0] for k in group}) > 1
+    ]
+    report["problems"] = problems
+    return report
+
+def print_report(report):
+    print(f"Images: {report['images']}  Boxes: {report['boxes']}")
+    print("\nClass counts:")
+    for split, counts in report["class_counts"].items():
+        print(f"  {split}: {counts}")
+    print("\nPer-class box statistics:")
+    for name, stats in report["per_class"].items():
+        print(f"  {name}: {stats['boxes']} boxes, median {stats['median_box_px'][0]}x{stats['median_box_px'][1]} px")
+        print(f"    size:   {stats['size_histogram']}")
+        print(f"    aspect: {stats['aspect_ratio_histogram']}")
+    print("\nIntegrity:")
+    for problem, items in report["problems"].items():
+        marker = "⚠️ " if items else "✅"
+        print(f"  {marker} {problem}: {len(items)}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index YOLO labels and report dataset statistics")
+    parser.add_argument("--dataset", default="datasets/vehicle_detection")
+    parser.add_argument("--splits", default=",".join(DEFAULT_SPLITS))
+    parser.add_argument("--report", help="Write the full report (including file lists) as JSON")
+    args = parser.parse_args(argv)
+
+    dataset_path = Path(args.dataset)
+    if not (dataset_path / 'data.yaml').exists():
+        print(f"❌ data.yaml not found in {dataset_path}")
+        return 1
+
+    splits = [s.strip() for s in args.splits.split(",") if s.strip()]
+    rows, reindexed = build_index(dataset_path, splits)
+    print(f"Indexed {len(rows)} images ({reindexed} re-read, {len(rows) - reindexed} from cache)\n")
+
+    report = dataset_report(rows, load_class_names(dataset_path))
+    print_report(report)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport saved to '{args.report}'")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Request Deadlines
+Cooperative cancellation for the ML entry points. A caller gives a time
+budget; the pipelines check it between stages (decode, detect, per-plate
+OCR, write) and, once it is spent, skip the remaining stages and return what
+they already have, e.g. plate detections without OCR, marked `partial`,
+instead of being killed by the caller's timeout with nothing.
+
+    python ml/license_plate_full_service.py frame.jpg 0.25 auto --deadline-ms=45000
+
+A stage already running is not interrupted, so the budget should leave room
+for the slowest single stage (model load, OCR of one plate). Nested calls
+share the caller's Deadline; a helper subprocess gets the remaining budget.
+
+A budget of 0, from --deadline-ms=0 or ML_DEADLINE_MS=0, means no deadline.
+
+Settings (environment):
+    ML_DEADLINE_MS  budget per request in milliseconds (default: none)
+"""
+
+import os
+import time
+
+DEADLINE_ENV_VAR = "ML_DEADLINE_MS"
+DEADLINE_ARG = "--deadline-ms="
+
+class Deadline:
+    """Time budget of one request, started when it is created (no budget: never expires)"""
+
+    def __init__(self, budget_ms=None):
+        self.budget_ms = budget_ms
+        self._expires_at = None if budget_ms is None else time.perf_counter() + budget_ms / 1000.0
+        self.skipped_stages = []
+
+    def remaining_ms(self):
+        """Milliseconds left, None without a budget"""
+        if self._expires_at is None:
+            return None
+        return max(0.0, (self._expires_at - time.perf_counter()) * 1000.0)
+
+    def expired(self):
+        return self._expires_at is not None and time.perf_counter() >= self._expires_at
+
+    def skip(self, stage):
+        """True, and `stage` is recorded as skipped, when the budget is spent"""
+        if not self.expired():
+            return False
+        if stage not in self.skipped_stages:
+            self.skipped_stages.append(stage)
+        return True
+
+    def merge(self, result):
+        """Take over the stages a helper subprocess reported as skipped in its result"""
+        for stage in (result.get("deadline") or {}).get("skipped_stages", []):
+            if stage not in self.skipped_stages:
+                self.skipped_stages.append(stage)
+
+    def child_args(self):
+        """CLI arguments passing the remaining budget to a helper subprocess"""
+        remaining = self.remaining_ms()
+        # At least 1 ms: a spent budget must not reach the child as 0, i.e. no deadline
+        return [] if remaining is None else [f"{DEADLINE_ARG}{max(1, int(remaining))}"]
+
+    def annotate(self, result):
+        """Mark a result `partial` and list the skipped stages when the deadline cut it short"""
+        if self.skipped_stages and isinstance(result, dict):
+            result["partial"] = True
+            result["deadline"] = {"budget_ms": self.budget_ms,
+                                  "skipped_stages": list(self.skipped_stages)}
+        return result
+
+def parse_budget(value):
+    """
+    Budget in milliseconds from a CLI or environment value
+
+    Returns:
+        float or None: None for an empty value; 0.0 for 0, no deadline
+            (unlike None, an explicit 0 is not replaced by ML_DEADLINE_MS)
+
+    Raises:
+        ValueError: For anything but a finite, non-negative number
+    """
+    if value is None or not str(value).strip():
+        return None
+    try:
+        budget_ms = float(value)
+    except ValueError:
+        budget_ms = float("nan")
+    if not 0 <= budget_ms < float("inf"):
+        raise ValueError(f"Invalid deadline: {value!r} (expected milliseconds, 0 for none)")
+    return budget_ms
+
+def resolve_deadline(deadline=None):
+    """
+    Deadline for an entry point call
+
+    Args:
+        deadline (Deadline | float): A caller's Deadline (shared as is), a
+            budget in milliseconds (0: none), or None for ML_DEADLINE_MS
+
+    Returns:
+        Deadline: Started now unless an existing one was given
+    """
+    if isinstance(deadline, Deadline):
+        return deadline
+    if deadline is None:
+        try:
+            deadline = parse_budget(os.environ.get(DEADLINE_ENV_VAR))
+        except ValueError:
+            deadline = None
+    # 0, from the argument or ML_DEADLINE_MS, means no deadline
+    return Deadline(deadline or None)
+
+def parse_deadline_args(args):
+    """
+    Strip `--deadline-ms=N` from CLI arguments
+
+    Returns:
+        tuple: (remaining arguments, budget in milliseconds or None)
+
+    Raises:
+        ValueError: When the value is not a valid budget (see parse_budget)
+    """
+    remaining, budget_ms = [], None
+    for arg in args:
+        if arg.startswith(DEADLINE_ARG):
+            budget_ms = parse_budget(arg[len(DEADLINE_ARG):])
+        else:
+            remaining.append(arg)
+    return remaining, budget_ms
+
+def deadline_skipped_result(stage):
+    """Result of a stage (e.g. one plate's OCR) not run because the deadline passed"""
+    return {"success": False, "error": f"Deadline exceeded before {stage}", "deadline_exceeded": True}
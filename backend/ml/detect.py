@@ -2,9 +2,19 @@
 import os
 import sys
 import cv2
-import json
+import numpy as np
 from ultralytics import YOLO
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from stage_timer import StageTimer, finalize_timings
+from ml_metrics import record_call, record_model_cache, track_in_flight
+from ml_profiling import parse_profile_args, run_with_profile
+from ml_core import crop_boxes, load_image_reduced, scale_boxes, write_result
+from result_protocol import serve_requests
+from hard_examples import capture_vehicle_result
+from vehicle_geometry import classify_vehicle_crop, fallback_confidence
+from deadline import parse_deadline_args, resolve_deadline
+
 # Map YOLO classes to wheel categories
 VEHICLE_CLASSES = {
     2: '4-wheeler',  # car
@@ -13,80 +23,241 @@ VEHICLE_CLASSES = {
     3: '2-wheeler'   # motorcycle/bike
 }
 
-def write_result(result):
-    """Write JSON result with markers for parsing"""
-    print("RESULT_START")
-    print(json.dumps(result))
-    print("RESULT_END")
-    sys.stdout.flush()
+# COCO classes that are the same physical object when their boxes overlap
+# (a van is often reported as both car and truck); merged by merge_classes
+MERGE_GROUPS = {2: 0, 5: 0, 7: 0, 3: 1}
+
+VEHICLE_MODES = ("best", "all")
+DEFAULT_NMS_IOU = 0.5
+DEFAULT_MERGE_IOU = 0.7
+DEFAULT_TOP_K = 20
+
+# Loaded once per process so long-lived workers skip the model load
+_vehicle_model = None
+
+def load_vehicle_model():
+    """Load the COCO YOLO model, reusing it across calls"""
+    global _vehicle_model
+    hit = _vehicle_model is not None
+    if not hit:
+        _vehicle_model = YOLO('yolov8n.pt')
+    record_model_cache("yolov8n", hit)
+    return _vehicle_model
+
+def detect_vehicles(image_path, include_timings=None, mode="best", top_k=DEFAULT_TOP_K,
+                    min_area=0, merge_classes=False, deadline=None):
+    """
+    Detect vehicles and classify as 2-wheeler or 4-wheeler
+
+    Args:
+        image_path (str): Path to the image file
+        include_timings (bool): Attach a `timings_ms` block (default: ML_INCLUDE_TIMINGS)
+        mode (str): 'best' returns the single most confident vehicle (the
+            original response); 'all' adds a `vehicles` list with every vehicle
+        top_k (int): Maximum vehicles returned in 'all' mode
+        min_area (float): Drop boxes smaller than this many pixels ('all' mode)
+        merge_classes (bool): Also merge overlapping boxes of different
+            classes of the same category, e.g. car and truck ('all' mode)
+        deadline (Deadline | float): Time budget (see deadline.py); detection
+            is not started once it is spent, the geometric opinion is skipped
+
+    Returns:
+        dict: Detection results
+    """
+    if mode not in VEHICLE_MODES:
+        raise ValueError(f"mode must be one of {VEHICLE_MODES}, got {mode!r}")
+    timer = StageTimer()
+    deadline = resolve_deadline(deadline)
+    with track_in_flight("detect_vehicles"):
+        result = _detect_vehicles(image_path, timer, mode, top_k, min_area, merge_classes, deadline)
+    deadline.annotate(result)
+    if "vehicles" in result:
+        detection_count = len(result["vehicles"])
+    else:
+        detection_count = 1 if result.get("success") else 0
+    record_call("detect_vehicles", result, timer, model="yolov8n", detection_count=detection_count)
+    capture_vehicle_result(image_path, result)
+    return finalize_timings(result, timer, "detect_vehicles", include_timings)
+
+def nms(boxes, scores, iou_threshold):
+    """
+    Greedy non-maximum suppression on arrays
+
+    Args:
+        boxes (np.ndarray): (N, 4) x1, y1, x2, y2
+        scores (np.ndarray): (N,) confidences
+        iou_threshold (float): Boxes overlapping a kept box above this are dropped
+
+    Returns:
+        np.ndarray: Indices of kept boxes, highest score first
+    """
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        inter = (np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+                 * np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None))
+        union = areas[i] + areas[rest] - inter
+        iou = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+def batched_nms(boxes, scores, groups, iou_threshold):
+    """NMS within each group only: boxes are shifted apart per group so one pass suffices"""
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    offsets = groups.astype(boxes.dtype)[:, None] * (boxes.max() + 1)
+    return nms(boxes + offsets, scores, iou_threshold)
+
+def filter_vehicle_boxes(xyxy, conf, cls, top_k=DEFAULT_TOP_K, min_area=0,
+                         merge_classes=False, iou_threshold=DEFAULT_NMS_IOU,
+                         merge_iou=DEFAULT_MERGE_IOU):
+    """
+    Vehicle boxes kept for 'all' mode
+
+    Keeps vehicle classes above `min_area`, applies class-aware NMS, then
+    optionally merges overlapping boxes across classes of the same group,
+    and returns at most `top_k` indices ordered by confidence.
+    """
+    cls = cls.astype(np.int64)
+    areas = (xyxy[:, 2] - xyxy[:, 0]) * (xyxy[:, 3] - xyxy[:, 1])
+    candidates = np.flatnonzero(np.isin(cls, list(VEHICLE_CLASSES)) & (areas >= min_area))
+    if candidates.size == 0:
+        return candidates
+
+    kept = candidates[batched_nms(xyxy[candidates], conf[candidates], cls[candidates], iou_threshold)]
+    if merge_classes and kept.size > 1:
+        groups = np.array([MERGE_GROUPS[c] for c in cls[kept]])
+        kept = kept[batched_nms(xyxy[kept], conf[kept], groups, merge_iou)]
+    return kept[:top_k] if top_k else kept
+
+def _geometry_second_opinion(vehicle, crop, threshold, timer, deadline):
+    """
+    Attach the geometric classifier's opinion to a low-confidence vehicle as
+    the advisory `geometry` field; `vehicle_type` stays YOLO's class
+    """
+    if vehicle["confidence"] >= threshold or crop.size == 0 or deadline.skip("geometry"):
+        return vehicle
+    with timer.stage("geometry"):
+        vehicle["geometry"] = classify_vehicle_crop(crop)
+    return vehicle
 
-def detect_vehicles(image_path):
-    """Detect vehicles and classify as 2-wheeler or 4-wheeler"""
+def _detect_vehicles(image_path, timer, mode="best", top_k=DEFAULT_TOP_K, min_area=0,
+                     merge_classes=False, deadline=None):
+    """Detection body; records each stage on `timer`"""
     try:
         # Validate image path
         if not os.path.exists(image_path):
             return {"success": False, "error": f"Image not found: {image_path}"}
 
-        # Load image
-        image = cv2.imread(image_path)
+        # Load image at reduced resolution; boxes are scaled back below
+        with timer.stage("imread"):
+            image, scale, _ = load_image_reduced(image_path)
         if image is None:
             return {"success": False, "error": "Failed to load image"}
+        if deadline.skip("detect"):
+            return {"success": False, "error": "Deadline exceeded before detection"}
 
         # Convert to RGB for YOLO
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        with timer.stage("preprocess"):
+            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
         
         # Load YOLO model
-        model = YOLO('yolov8n.pt')
+        with timer.stage("model_load"):
+            model = load_vehicle_model()
         
         # Run detection
-        results = model(image_rgb, conf=0.25)
+        with timer.stage("inference"):
+            results = model(image_rgb, conf=0.25)
+        if results:
+            timer.split("inference", "nms", getattr(results[0], "speed", {}).get("postprocess"))
         
         # Process results
-        if results and len(results[0].boxes) > 0:
-            # Get best detection
-            best_detection = None
-            best_confidence = 0
-            
+        if not results or len(results[0].boxes) == 0:
+            return {"success": False, "error": "No detections found"}
+
+        boxes = results[0].boxes
+        # Boxes in decoded pixels crop the reduced frame for the geometric opinion
+        decoded_xyxy = boxes.xyxy.cpu().numpy()
+        xyxy = scale_boxes(decoded_xyxy, *scale)
+        conf = boxes.conf.cpu().numpy()
+        cls = boxes.cls.cpu().numpy().astype(np.int64)
+        geometry_threshold = fallback_confidence()
+
+        if mode == "best":
             # Find best vehicle detection
-            for box in results[0].boxes:
-                class_id = int(box.cls[0])
-                if class_id in VEHICLE_CLASSES:
-                    confidence = float(box.conf[0])
-                    if confidence > best_confidence:
-                        best_confidence = confidence
-                        best_detection = (class_id, box)
-            
-            # If we found a valid vehicle
-            if best_detection:
-                class_id, box = best_detection
-                result = {
-                    "success": True,
-                    "vehicle_type": VEHICLE_CLASSES[class_id],
-                    "confidence": best_confidence,
-                    "bbox": box.xyxy[0].tolist()
-                }
-                return result
-            else:
+            is_vehicle = np.isin(cls, list(VEHICLE_CLASSES))
+            if not is_vehicle.any():
                 return {"success": False, "error": "No valid vehicle detected"}
-        else:
-            return {"success": False, "error": "No detections found"}
+            best = int(np.argmax(np.where(is_vehicle, conf, -1.0)))
+            vehicle = {
+                "vehicle_type": VEHICLE_CLASSES[int(cls[best])],
+                "confidence": float(conf[best]),
+                "bbox": xyxy[best].tolist()
+            }
+            vehicle = _geometry_second_opinion(vehicle, crop_boxes(image, decoded_xyxy[best])[0],
+                                               geometry_threshold, timer, deadline)
+            return {"success": True, **vehicle}
+
+        with timer.stage("filter"):
+            kept = filter_vehicle_boxes(xyxy, conf, cls, top_k, min_area, merge_classes)
+        if kept.size == 0:
+            return {"success": False, "error": "No valid vehicle detected"}
+        crops = crop_boxes(image, decoded_xyxy[kept])
+        vehicles = [_geometry_second_opinion({
+            "vehicle_type": VEHICLE_CLASSES[int(cls[i])],
+            "confidence": float(conf[i]),
+            "bbox": xyxy[i].tolist()
+        }, crop, geometry_threshold, timer, deadline) for i, crop in zip(kept, crops)]
+        # The best vehicle stays at the top level for callers of the single-best format
+        return {"success": True, **vehicles[0], "vehicles": vehicles, "vehicle_count": len(vehicles)}
         
     except Exception as e:
         return {"success": False, "error": str(e)}
 
-def main():
-    """Main function to handle CLI usage"""
-    if len(sys.argv) != 2:
-        write_result({"success": False, "error": "Image path is required"})
-        return 1
+def run_cli(args, profile_modes):
+    """Result for one set of CLI arguments (also used per request by --serve)"""
+    try:
+        args, deadline_ms = parse_deadline_args(args)
+        options = {"deadline": deadline_ms}
+        for arg in list(args):
+            if arg == "--all":
+                options["mode"] = "all"
+            elif arg == "--merge":
+                options["merge_classes"] = True
+            elif arg.startswith("--top-k="):
+                options["top_k"] = int(arg.split("=", 1)[1])
+            elif arg.startswith("--min-area="):
+                options["min_area"] = float(arg.split("=", 1)[1])
+            else:
+                continue
+            args.remove(arg)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    if len(args) != 1:
+        return {
+            "success": False,
+            "error": "Usage: python detect.py <image_path> [--all [--top-k=N] [--min-area=PX] [--merge]] [--deadline-ms=N] [--profile[=modes]] | --serve"
+        }
 
     try:
-        result = detect_vehicles(sys.argv[1])
-        write_result(result)
-        return 0 if result["success"] else 1
+        return run_with_profile(profile_modes, args[0], detect_vehicles, args[0], **options)
     except Exception as e:
-        write_result({"success": False, "error": str(e)})
-        return 1
+        return {"success": False, "error": str(e)}
+
+def main():
+    """Main function to handle CLI usage"""
+    args, profile_modes = parse_profile_args(sys.argv[1:])
+    if args[:1] == ["--serve"]:
+        # One JSON argument list per stdin line, one result written per request
+        return serve_requests(lambda request: run_cli(request, profile_modes), write_result)
+    result = run_cli(args, profile_modes)
+    write_result(result)
+    return 0 if result["success"] else 1
 
 if __name__ == "__main__":
     sys.exit(main())
\ No newline at end of file
@@ -3,167 +3,251 @@
 License Plate Detection and Cropping Service for Website
 This script detects license plates, creates annotated images, and crops license plates
 Similar to show_detected_plate.py but designed for web API usage
+
+--artifacts=none skips the annotated frame and the upscaled crops; they can be
+rendered later, only when needed, with
+    python ml/detect_and_crop_service.py --render <image_path> <detections_json> [artifacts]
+When artifacts are deferred, the source frame is kept in the artifact store
+and returned as `source_image`, so the render still works after the API has
+deleted its upload (POST /api/license-plate/render-artifacts).
 """
 
 import cv2
+import re
 import sys
 import json
 import os
 import subprocess
 from pathlib import Path
-import numpy as np
 
-def write_result(result):
-    """Write JSON result with markers for parsing"""
-    print("RESULT_START")
-    print(json.dumps(result, indent=2))
-    print("RESULT_END")
-    sys.stdout.flush()
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from stage_timer import StageTimer, TIMINGS_ENV_VAR, finalize_timings
+from ml_metrics import METRICS_PORT_ENV_VAR, record_call, track_in_flight
+from ml_profiling import parse_profile_args, run_with_profile
+from ml_core import GREEN, crop_boxes, clamp_boxes, load_image, render_annotations, write_result
+from result_protocol import FORMAT_ENV_VAR, decode_frames, serve_requests
+from artifact_store import encode_image, get_store
+from deadline import parse_deadline_args, resolve_deadline
+
+# Files written per request: one annotated frame with every plate drawn,
+# and per plate the padded crop and its upscaled copy for display
+ARTIFACT_KINDS = ("annotated", "cropped", "resized")
+PLATE_PADDING = 5
+# Long side of the upscaled display copy
+DISPLAY_SIZE = 300
+# Artifact store kind of the frames kept for deferred rendering
+SOURCE_KIND = "source"
+
+def keep_source_frame(image_path):
+    """Copy the frame into the artifact store for a later --render; returns its path"""
+    suffix = Path(image_path).suffix.lower()
+    ext = suffix if re.fullmatch(r"\.[a-z]+", suffix) else ".jpg"
+    return str(get_store().put_bytes(Path(image_path).read_bytes(), SOURCE_KIND, ext))
+
+def parse_artifacts(value):
+    """'all', 'none' or a comma-separated list of ARTIFACT_KINDS -> tuple of kinds"""
+    value = value.strip().lower()
+    if value == "all":
+        return ARTIFACT_KINDS
+    kinds = tuple(k.strip() for k in value.split(",") if k.strip() and k.strip() != "none")
+    unknown = [k for k in kinds if k not in ARTIFACT_KINDS]
+    if unknown:
+        raise ValueError(f"Unknown artifacts {unknown}; choose from {', '.join(ARTIFACT_KINDS)}, all or none")
+    return kinds
+
+def upscale_plate(plate_crop):
+    """
+    Scale a small plate crop up to ~300px (long side) for viewing; returns
+    (image, factor). Crops already that large are returned as they are.
+    """
+    crop_height, crop_width = plate_crop.shape[:2]
+    scale_factor = DISPLAY_SIZE // max(crop_width, crop_height)
+    if scale_factor <= 1:
+        return plate_crop, 1
+    resized = cv2.resize(plate_crop, (crop_width * scale_factor, crop_height * scale_factor),
+                         interpolation=cv2.INTER_CUBIC)
+    return resized, scale_factor
+
+def render_plate_artifacts(image, detections, artifacts=ARTIFACT_KINDS, timer=None, persist=True):
+    """
+    Render the requested artifacts for a frame's plate detections
+    
+    All plates are drawn on a single copy of the frame, which is encoded
+    once; crops are views of the frame and only upscaled when 'resized' is
+    requested. Also called on its own (`--render`) to produce deferred
+    artifacts after a detection run that skipped them.
+    
+    Args:
+        image (str | numpy.ndarray): Frame path or decoded frame
+        detections (list): Detections in the detect_license_plates() format
+        artifacts (tuple): Artifact kinds to render (see ARTIFACT_KINDS)
+        timer (StageTimer): Records crop/annotate/resize/encode/store stages
+        persist (bool): Write to the artifact store and return paths; False
+            returns the encoded JPEG bytes instead (in-process callers,
+            msgpack result frames; JSON output carries them as base64)
+        
+    Returns:
+        dict: `annotated_image` and one `plates` entry per non-empty crop,
+            with `saved_files` holding paths (or bytes when not persisted)
+    """
+    timer = timer or StageTimer()
+    store = get_store()
+    image = load_image(image)
+    if image is None:
+        raise ValueError("Could not load image for rendering")
+    h, w = image.shape[:2]
+    # Boxes inside the image bounds, and padded crops (views, no copies) for all plates
+    boxes = clamp_boxes([d['bbox'] for d in detections], w - 1, h - 1)
+    with timer.stage("crop"):
+        plate_crops = crop_boxes(image, boxes, padding=PLATE_PADDING)
+    
+    def output(picture, kind):
+        with timer.stage("encode"):
+            data = encode_image(picture)
+        if not persist:
+            return data
+        with timer.stage("store"):
+            return str(store.put_bytes(data, kind))
+    
+    annotated_image = None
+    if "annotated" in artifacts and detections:
+        with timer.stage("annotate"):
+            annotated = render_annotations(
+                image, [(box, f"License Plate ({d['confidence']:.1%})", GREEN)
+                        for box, d in zip(boxes, detections)],
+                font_scale=0.7, thickness=3, label_background=False)
+        annotated_image = output(annotated, "annotated")
+    
+    plates = []
+    for i, (detection, plate_crop) in enumerate(zip(detections, plate_crops)):
+        if plate_crop.size == 0:
+            continue
+        crop_height, crop_width = plate_crop.shape[:2]
+        saved_files = {}
+        if annotated_image is not None:
+            saved_files["annotated_image"] = annotated_image
+        crop_info = {"original_size": f"{crop_width}x{crop_height}"}
+        
+        if "cropped" in artifacts:
+            saved_files["cropped_plate"] = output(plate_crop, "cropped_plate")
+        if "resized" in artifacts:
+            with timer.stage("resize"):
+                plate_resized, scale_factor = upscale_plate(plate_crop)
+            saved_files["resized_plate"] = output(plate_resized, "resized_plate")
+            crop_info["resized_size"] = f"{plate_resized.shape[1]}x{plate_resized.shape[0]}"
+            crop_info["scale_factor"] = scale_factor
+        
+        plates.append({
+            "plate_id": i + 1,
+            "detection": detection,
+            "saved_files": saved_files,
+            "crop_info": crop_info
+        })
+    
+    return {"annotated_image": annotated_image, "plates": plates}
+
+def _load_detections(source):
+    """Detections from inline JSON, a JSON file, or a saved result holding them"""
+    data = json.loads(source) if source.lstrip().startswith(("[", "{")) else json.loads(Path(source).read_text())
+    if isinstance(data, dict):
+        data = data.get("detection_summary", data).get("detections", [])
+    return data
 
-def detect_and_crop_license_plates(image_path, confidence_threshold=0.25):
+def detect_and_crop_license_plates(image_path, confidence_threshold=0.25, include_timings=None,
+                                   artifacts=ARTIFACT_KINDS, deadline=None):
     """
     Detect license plates, create annotated image, and crop license plates
     
     Args:
         image_path (str): Path to the image file
         confidence_threshold (float): Minimum confidence for detection
+        include_timings (bool): Attach a `timings_ms` block (default: ML_INCLUDE_TIMINGS)
+        artifacts (tuple): Artifact kinds to write now (see ARTIFACT_KINDS); the
+            rest are listed under `deferred_artifacts` for render_plate_artifacts()
+        deadline (Deadline | float): Time budget (see deadline.py), passed on to
+            the detection subprocess; when it is spent after detection, the
+            detections are returned with every artifact deferred
         
     Returns:
         dict: Detection and cropping results
     """
+    timer = StageTimer()
+    deadline = resolve_deadline(deadline)
+    with track_in_flight("detect_and_crop_license_plates"):
+        result = _detect_and_crop_license_plates(image_path, confidence_threshold, artifacts, timer,
+                                                 deadline)
+    deadline.annotate(result)
+    record_call("detect_and_crop_license_plates", result, timer,
+                detection_count=result.get("total_plates", 0))
+    return finalize_timings(result, timer, "detect_and_crop_license_plates", include_timings)
+
+def _detect_and_crop_license_plates(image_path, confidence_threshold, artifacts, timer, deadline):
+    """Detection and cropping body; records each stage on `timer`"""
     try:
         # Step 1: Run license plate detection
+        if deadline.skip("detect"):
+            return {"success": False, "error": "Deadline exceeded before detection",
+                    "detection_result": None}
         script_dir = os.path.dirname(__file__)
         detect_script = os.path.join(script_dir, 'detect_license_plate.py')
-        result = subprocess.run([
-            'python', detect_script, image_path, str(confidence_threshold)
-        ], capture_output=True, text=True)
+        with timer.stage("detection"):
+            # Framed output: the result is located by length, not by scanning for markers;
+            # the child must not bind this worker's metrics port
+            child_env = {key: value for key, value in os.environ.items() if key != METRICS_PORT_ENV_VAR}
+            result = subprocess.run([
+                'python', detect_script, image_path, str(confidence_threshold),
+                *deadline.child_args()
+            ], capture_output=True, env={**child_env, TIMINGS_ENV_VAR: "1", FORMAT_ENV_VAR: "json"})
         
-        if result.returncode != 0:
+        # Parse detection results; the script also exits 1 with a result frame
+        # (no plates, deadline-partial), so only a missing frame is a crash
+        with timer.stage("parse"):
+            frames = decode_frames(result.stdout)
+        if not frames:
+            error = (f"Detection script failed: {result.stderr.decode('utf-8', 'replace')}"
+                     if result.returncode != 0 else "Could not find detection results in output")
             return {
                 "success": False,
-                "error": f"Detection script failed: {result.stderr}",
+                "error": error,
                 "detection_result": None
             }
-        
-        # Parse detection results
-        output = result.stdout
-        start_marker = "RESULT_START"
-        end_marker = "RESULT_END"
-        
-        start_idx = output.find(start_marker)
-        end_idx = output.find(end_marker)
-        
-        if start_idx == -1 or end_idx == -1:
-            return {
-                "success": False,
-                "error": "Could not find detection results in output",
-                "detection_result": None
-            }
-        
-        json_str = output[start_idx + len(start_marker):end_idx].strip()
-        detection_data = json.loads(json_str)
+        detection_data = frames[-1]
+        # Child-side stages (model load, inference, NMS) are reported separately
+        timer.absorb(detection_data, prefix="detection.")
+        deadline.merge(detection_data)
         
         if not detection_data.get('success') or detection_data.get('license_plates_detected', 0) == 0:
             return {
                 "success": False,
-                "error": "No license plates detected",
+                "error": detection_data.get("error") if detection_data.get("partial") else "No license plates detected",
                 "detection_result": detection_data
             }
         
-        # Step 2: Load the original image
-        image = cv2.imread(image_path)
-        if image is None:
-            return {
-                "success": False,
-                "error": f"Could not load image: {image_path}",
-                "detection_result": detection_data
-            }
-        
-        # Step 3: Process each detection
-        processed_plates = []
-        
-        for i, detection in enumerate(detection_data['detections']):
-            bbox = detection['bbox']
-            confidence = detection['confidence']
-            
-            # Extract coordinates
-            x1, y1 = int(bbox['x1']), int(bbox['y1'])
-            x2, y2 = int(bbox['x2']), int(bbox['y2'])
-            
-            # Ensure coordinates are within image bounds
-            h, w = image.shape[:2]
-            x1 = max(0, min(x1, w-1))
-            y1 = max(0, min(y1, h-1))
-            x2 = max(0, min(x2, w-1))
-            y2 = max(0, min(y2, h-1))
-            
-            # Draw bounding box on original image (for annotation)
-            image_with_box = image.copy()
-            cv2.rectangle(image_with_box, (x1, y1), (x2, y2), (0, 255, 0), 3)
-            cv2.putText(image_with_box, f'License Plate ({confidence:.1%})', 
-                       (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-            
-            # Crop the license plate region with small padding
-            padding = 5
-            crop_x1 = max(0, x1 - padding)
-            crop_y1 = max(0, y1 - padding)
-            crop_x2 = min(w, x2 + padding)
-            crop_y2 = min(h, y2 + padding)
-            
-            license_plate_crop = image[crop_y1:crop_y2, crop_x1:crop_x2]
-            
-            if license_plate_crop.size == 0:
-                continue
-            
-            # Scale up small license plates for better viewing
-            crop_height, crop_width = license_plate_crop.shape[:2]
-            if crop_width > 0 and crop_height > 0:
-                scale_factor = max(2, 300 // max(crop_width, crop_height))
-                new_width = crop_width * scale_factor
-                new_height = crop_height * scale_factor
-                license_plate_resized = cv2.resize(license_plate_crop, (new_width, new_height), 
-                                                 interpolation=cv2.INTER_CUBIC)
-            else:
-                license_plate_resized = license_plate_crop
-            
-            # Save images to temp directory
-            temp_dir = Path('temp')
-            temp_dir.mkdir(exist_ok=True)
-            
-            # Generate unique filenames with timestamp
-            from datetime import datetime
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
-            
-            annotated_filename = f'annotated_{timestamp}_{i+1}.jpg'
-            cropped_filename = f'cropped_plate_{timestamp}_{i+1}.jpg'
-            resized_filename = f'resized_plate_{timestamp}_{i+1}.jpg'
-            
-            annotated_path = temp_dir / annotated_filename
-            cropped_path = temp_dir / cropped_filename
-            resized_path = temp_dir / resized_filename
-            
-            # Save all versions
-            cv2.imwrite(str(annotated_path), image_with_box)
-            cv2.imwrite(str(cropped_path), license_plate_crop)
-            cv2.imwrite(str(resized_path), license_plate_resized)
-            
-            # Add to results
-            plate_info = {
-                "plate_id": i + 1,
-                "detection": detection,
-                "saved_files": {
-                    "annotated_image": str(annotated_path),
-                    "cropped_plate": str(cropped_path),
-                    "resized_plate": str(resized_path)
-                },
-                "crop_info": {
-                    "original_size": f"{crop_width}x{crop_height}",
-                    "resized_size": f"{new_width}x{new_height}",
-                    "scale_factor": scale_factor
+        if deadline.skip("render"):
+            # Out of time: return the detections and defer every artifact
+            artifacts = ()
+            output = {"annotated_image": None,
+                      "plates": [{"plate_id": i + 1, "detection": detection, "saved_files": {},
+                                  "crop_info": {}}
+                                 for i, detection in enumerate(detection_data['detections'])]}
+        else:
+            # Step 2: Load the original image
+            with timer.stage("imread"):
+                image = load_image(image_path)
+            if image is None:
+                return {
+                    "success": False,
+                    "error": f"Could not load image: {image_path}",
+                    "detection_result": detection_data
                 }
-            }
-            processed_plates.append(plate_info)
+            
+            # Step 3: Render the requested artifacts for every detection
+            output = render_plate_artifacts(image, detection_data['detections'], artifacts, timer)
+        processed_plates = output["plates"]
+        deferred = [kind for kind in ARTIFACT_KINDS if kind not in artifacts]
+        if deferred:
+            with timer.stage("store"):
+                source_image = keep_source_frame(image_path)
         
         # Compile final results
         result = {
@@ -173,15 +257,18 @@ def detect_and_crop_license_plates(image_path, confidence_threshold=0.25):
             "plates_processed": processed_plates,
             "total_plates": len(processed_plates),
             "files_saved": {
-                "annotated_images": len([p for p in processed_plates]),
-                "cropped_plates": len([p for p in processed_plates]),
-                "temp_directory": str(temp_dir)
+                "annotated_images": 1 if output["annotated_image"] else 0,
+                "cropped_plates": sum(1 for p in processed_plates if "cropped_plate" in p["saved_files"]),
+                "temp_directory": str(get_store().root)
             },
+            "annotated_image": output["annotated_image"],
+            "deferred_artifacts": deferred,
+            "source_image": source_image if deferred else None,
             "processing_info": {
                 "confidence_threshold": confidence_threshold,
                 "image_dimensions": detection_data.get('image_dimensions', {}),
-                "cropping_enabled": True,
-                "annotation_enabled": True
+                "cropping_enabled": "cropped" in artifacts,
+                "annotation_enabled": "annotated" in artifacts
             }
         }
         
@@ -200,16 +287,39 @@ def detect_and_crop_license_plates(image_path, confidence_threshold=0.25):
             "detection_result": None
         }
 
-def main():
-    if len(sys.argv) < 2:
-        write_result({
+def run_cli(args, profile_modes):
+    """Result for one set of CLI arguments (also used per request by --serve)"""
+    usage = ("Usage: python detect_and_crop_service.py <image_path> [confidence_threshold] "
+             "[--artifacts=all|none|annotated,cropped,resized] [--deadline-ms=N] [--profile[=modes]] "
+             "| --render <image_path> <detections_json> [artifacts] | --serve")
+    try:
+        args, deadline_ms = parse_deadline_args(args)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    options = {"deadline": deadline_ms}
+    try:
+        for arg in list(args):
+            if arg.startswith("--artifacts="):
+                options["artifacts"] = parse_artifacts(arg.split("=", 1)[1])
+                args.remove(arg)
+        if args[:1] == ["--render"]:
+            # Deferred artifacts for detections returned by an earlier run
+            if len(args) < 3:
+                return {"success": False, "error": usage}
+            artifacts = parse_artifacts(args[3]) if len(args) > 3 else ARTIFACT_KINDS
+            rendered = render_plate_artifacts(args[1], _load_detections(args[2]), artifacts)
+            return {"success": True, "image_path": args[1], **rendered}
+    except (ValueError, OSError) as e:
+        return {"success": False, "error": str(e)}
+    
+    if len(args) < 1:
+        return {
             "success": False,
-            "error": "Usage: python detect_and_crop_service.py <image_path> [confidence_threshold]"
-        })
-        return 1
+            "error": usage
+        }
     
-    image_path = sys.argv[1]
-    confidence_threshold = float(sys.argv[2]) if len(sys.argv) > 2 else 0.25
+    image_path = args[0]
+    confidence_threshold = float(args[1]) if len(args) > 1 else 0.25
     
     # Debug logging
     print(f"DEBUG: Starting detection with image_path='{image_path}', confidence={confidence_threshold}", file=sys.stderr)
@@ -218,19 +328,24 @@ def main():
     print(f"DEBUG: Full image path: {os.path.abspath(image_path)}", file=sys.stderr)
     
     if not Path(image_path).exists():
-        write_result({
+        return {
             "success": False,
             "error": f"Image file not found: {image_path}"
-        })
-        return 1
+        }
     
     # Process the image
-    result = detect_and_crop_license_plates(image_path, confidence_threshold)
-    
-    # Output result
+    return run_with_profile(profile_modes, image_path, detect_and_crop_license_plates,
+                            image_path, confidence_threshold, **options)
+
+def main():
+    """Main function for CLI usage"""
+    args, profile_modes = parse_profile_args(sys.argv[1:])
+    if args[:1] == ["--serve"]:
+        # One JSON argument list per stdin line, one result written per request
+        return serve_requests(lambda request: run_cli(request, profile_modes), write_result)
+    result = run_cli(args, profile_modes)
     write_result(result)
-    
-    return 0 if result['success'] else 1
+    return 0 if result["success"] else 1
 
 if __name__ == '__main__':
     exit(main())
\ No newline at end of file
@@ -7,32 +7,52 @@ This script detects license plates in images using a trained YOLOv8 model.
 import os
 import sys
 import cv2
-import json
-import numpy as np
 from ultralytics import YOLO
-from pathlib import Path
 
-def write_result(result):
-    """Write JSON result with markers for parsing"""
-    print("RESULT_START")
-    print(json.dumps(result))
-    print("RESULT_END")
-    sys.stdout.flush()
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from stage_timer import StageTimer, finalize_timings
+from ml_metrics import record_call, record_model_cache, track_in_flight
+from ml_profiling import parse_profile_args, run_with_profile
+from deadline import parse_deadline_args, resolve_deadline
+from ml_core import (confidence_color, crop_boxes, load_image, load_image_reduced, render_annotations,
+                     scale_boxes, write_result)
+from result_protocol import serve_requests
+from hard_examples import capture_plate_result
+
+# Loaded once per process so long-lived workers skip the model load
+_license_plate_model = None
+
+# Path of the model to use instead of the defaults, e.g. the distilled
+# models/license_plate_detector_tiny.pt for low-power gates
+MODEL_ENV_VAR = "ML_LICENSE_PLATE_MODEL"
 
 def load_license_plate_model():
-    """Load the trained license plate detection model"""
+    """Load the trained license plate detection model, reusing it across calls"""
+    global _license_plate_model
+    if _license_plate_model is not None:
+        record_model_cache("license_plate_detector", True)
+        return _license_plate_model
+    record_model_cache("license_plate_detector", False)
+
     # Check for trained model
     model_paths = [
         'models/license_plate_detector.pt',
         'models/license_plate/license_plate_detector/weights/best.pt',
         'models/license_plate/license_plate_detector/weights/last.pt'
     ]
+    configured_path = os.environ.get(MODEL_ENV_VAR)
+    if configured_path:
+        # An explicitly configured model must not silently fall back to another one
+        model_paths = [configured_path]
+        if not os.path.exists(configured_path):
+            print(f"Warning: {MODEL_ENV_VAR} model not found: {configured_path}")
     
     for model_path in model_paths:
         if os.path.exists(model_path):
             try:
                 model = YOLO(model_path)
                 print(f"Loaded license plate model from: {model_path}")
+                _license_plate_model = model
                 return model
             except Exception as e:
                 print(f"Failed to load model from {model_path}: {e}")
@@ -43,102 +63,138 @@ def load_license_plate_model():
     print("Please train the license plate model first using: python ml/train_license_plate_model.py")
     return None
 
-def detect_license_plates(image_path, confidence_threshold=0.25):
+def plate_detection(x1, y1, x2, y2, confidence):
+    """
+    Detection record for one plate box, or None if its shape is not plate-like
+
+    Args:
+        x1, y1, x2, y2 (float): Box corners in pixels
+        confidence (float): Detection confidence
+
+    Returns:
+        dict or None: Entry of the `detections` list
+    """
+    # Calculate box dimensions
+    box_width = x2 - x1
+    box_height = y2 - y1
+    box_area = box_width * box_height
+
+    # License plate specific filtering
+    aspect_ratio = box_width / box_height if box_height > 0 else 0
+
+    # License plates typically have aspect ratio between 2:1 and 6:1
+    if not 1.5 <= aspect_ratio <= 8.0:
+        return None
+    return {
+        "confidence": confidence,
+        "bbox": {
+            "x1": int(x1),
+            "y1": int(y1),
+            "x2": int(x2),
+            "y2": int(y2),
+            "width": int(box_width),
+            "height": int(box_height)
+        },
+        "aspect_ratio": round(aspect_ratio, 2),
+        "area": int(box_area),
+        "center": {
+            "x": int((x1 + x2) / 2),
+            "y": int((y1 + y2) / 2)
+        }
+    }
+
+def plate_result(detections, width, height):
+    """detect_license_plates() response for a list of plate_detection() records"""
+    # Sort detections by confidence
+    detections = sorted(detections, key=lambda x: x["confidence"], reverse=True)
+
+    if detections:
+        return {
+            "success": True,
+            "license_plates_detected": len(detections),
+            "detections": detections,
+            "image_dimensions": {
+                "width": width,
+                "height": height
+            }
+        }
+    return {
+        "success": False,
+        "error": "No license plates detected",
+        "image_dimensions": {
+            "width": width,
+            "height": height
+        }
+    }
+
+def detect_license_plates(image_path, confidence_threshold=0.25, include_timings=None,
+                          deadline=None):
     """
     Detect license plates in an image
     
     Args:
         image_path (str): Path to the image file
         confidence_threshold (float): Minimum confidence for detection
+        include_timings (bool): Attach a `timings_ms` block (default: ML_INCLUDE_TIMINGS)
+        deadline (Deadline | float): Time budget (see deadline.py); detection
+            is not started once it is spent
         
     Returns:
         dict: Detection results
     """
+    timer = StageTimer()
+    deadline = resolve_deadline(deadline)
+    with track_in_flight("detect_license_plates"):
+        result = _detect_license_plates(image_path, confidence_threshold, timer, deadline)
+    deadline.annotate(result)
+    record_call("detect_license_plates", result, timer, model="license_plate_detector",
+                detection_count=result.get("license_plates_detected", 0))
+    capture_plate_result(image_path, result)
+    return finalize_timings(result, timer, "detect_license_plates", include_timings)
+
+def _detect_license_plates(image_path, confidence_threshold, timer, deadline):
+    """Detection body; records each stage on `timer`"""
     try:
         # Validate image path
         if not os.path.exists(image_path):
             return {"success": False, "error": f"Image not found: {image_path}"}
 
-        # Load image
-        image = cv2.imread(image_path)
+        # Load image at reduced resolution; dimensions are the full frame's
+        with timer.stage("imread"):
+            image, scale, (width, height) = load_image_reduced(image_path)
         if image is None:
             return {"success": False, "error": "Failed to load image"}
-
-        # Get image dimensions
-        height, width = image.shape[:2]
+        if deadline.skip("detect"):
+            return {"success": False, "error": "Deadline exceeded before detection"}
         
         # Load license plate detection model
-        model = load_license_plate_model()
+        with timer.stage("model_load"):
+            model = load_license_plate_model()
         if model is None:
             return {"success": False, "error": "License plate detection model not available"}
 
         # Convert to RGB for YOLO
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        with timer.stage("preprocess"):
+            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
         
         # Run detection
-        results = model(image_rgb, conf=confidence_threshold)
+        with timer.stage("inference"):
+            results = model(image_rgb, conf=confidence_threshold)
+        if results:
+            timer.split("inference", "nms", getattr(results[0], "speed", {}).get("postprocess"))
         
         # Process results
         detections = []
         if results and len(results[0].boxes) > 0:
-            for box in results[0].boxes:
-                confidence = float(box.conf[0])
-                
-                # Get bounding box coordinates
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                
-                # Calculate box dimensions
-                box_width = x2 - x1
-                box_height = y2 - y1
-                box_area = box_width * box_height
-                
-                # License plate specific filtering
-                aspect_ratio = box_width / box_height if box_height > 0 else 0
-                
-                # License plates typically have aspect ratio between 2:1 and 6:1
-                if 1.5 <= aspect_ratio <= 8.0:
-                    detection = {
-                        "confidence": confidence,
-                        "bbox": {
-                            "x1": int(x1),
-                            "y1": int(y1),
-                            "x2": int(x2),
-                            "y2": int(y2),
-                            "width": int(box_width),
-                            "height": int(box_height)
-                        },
-                        "aspect_ratio": round(aspect_ratio, 2),
-                        "area": int(box_area),
-                        "center": {
-                            "x": int((x1 + x2) / 2),
-                            "y": int((y1 + y2) / 2)
-                        }
-                    }
+            boxes = results[0].boxes
+            # Boxes in full-resolution coordinates
+            xyxy = scale_boxes(boxes.xyxy.cpu().numpy(), *scale)
+            for (x1, y1, x2, y2), confidence in zip(xyxy.tolist(), boxes.conf.cpu().numpy().tolist()):
+                detection = plate_detection(x1, y1, x2, y2, confidence)
+                if detection is not None:
                     detections.append(detection)
-        
-        # Sort detections by confidence
-        detections.sort(key=lambda x: x["confidence"], reverse=True)
-        
-        if detections:
-            result = {
-                "success": True,
-                "license_plates_detected": len(detections),
-                "detections": detections,
-                "image_dimensions": {
-                    "width": width,
-                    "height": height
-                }
-            }
-        else:
-            result = {
-                "success": False,
-                "error": "No license plates detected",
-                "image_dimensions": {
-                    "width": width,
-                    "height": height
-                }
-            }
-        
+
+        result = plate_result(detections, width, height)
         return result
         
     except Exception as e:
@@ -149,7 +205,7 @@ def extract_license_plate_image(image_path, bbox, output_path=None):
     Extract license plate region from image
     
     Args:
-        image_path (str): Path to the original image
+        image_path (str | bytes | numpy.ndarray): Original image, or the already decoded frame
         bbox (dict): Bounding box coordinates
         output_path (str): Optional path to save extracted plate
         
@@ -158,22 +214,12 @@ def extract_license_plate_image(image_path, bbox, output_path=None):
     """
     try:
         # Load original image
-        image = cv2.imread(image_path)
+        image = load_image(image_path)
         if image is None:
             return None
         
-        # Extract coordinates
-        x1, y1, x2, y2 = bbox["x1"], bbox["y1"], bbox["x2"], bbox["y2"]
-        
-        # Add small padding around the license plate
-        padding = 5
-        x1 = max(0, x1 - padding)
-        y1 = max(0, y1 - padding)
-        x2 = min(image.shape[1], x2 + padding)
-        y2 = min(image.shape[0], y2 + padding)
-        
-        # Extract license plate region
-        plate_image = image[y1:y2, x1:x2]
+        # Extract license plate region with small padding around it
+        plate_image = crop_boxes(image, bbox, padding=5)[0]
         
         # Save if output path provided
         if output_path:
@@ -190,7 +236,7 @@ def draw_detections(image_path, detections, output_path=None):
     Draw bounding boxes around detected license plates
     
     Args:
-        image_path (str): Path to the original image
+        image_path (str | bytes | numpy.ndarray): Original image
         detections (list): List of detection results
         output_path (str): Optional path to save annotated image
         
@@ -199,43 +245,16 @@ def draw_detections(image_path, detections, output_path=None):
     """
     try:
         # Load image
-        image = cv2.imread(image_path)
+        image = load_image(image_path)
         if image is None:
             return None
         
-        # Draw bounding boxes
-        for i, detection in enumerate(detections):
-            bbox = detection["bbox"]
-            confidence = detection["confidence"]
-            
-            # Colors: Green for high confidence, Yellow for medium, Red for low
-            if confidence > 0.7:
-                color = (0, 255, 0)  # Green
-            elif confidence > 0.5:
-                color = (0, 255, 255)  # Yellow
-            else:
-                color = (0, 0, 255)  # Red
-            
-            # Draw rectangle
-            cv2.rectangle(image, 
-                         (bbox["x1"], bbox["y1"]), 
-                         (bbox["x2"], bbox["y2"]), 
-                         color, 2)
-            
-            # Draw label
-            label = f"License Plate {i+1}: {confidence:.2f}"
-            label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)[0]
-            
-            # Background for text
-            cv2.rectangle(image,
-                         (bbox["x1"], bbox["y1"] - label_size[1] - 10),
-                         (bbox["x1"] + label_size[0], bbox["y1"]),
-                         color, -1)
-            
-            # Text
-            cv2.putText(image, label,
-                       (bbox["x1"], bbox["y1"] - 5),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+        # Colors: Green for high confidence, Yellow for medium, Red for low
+        image = render_annotations(image, [
+            (detection["bbox"], f"License Plate {i+1}: {detection['confidence']:.2f}",
+             confidence_color(detection["confidence"]))
+            for i, detection in enumerate(detections)
+        ])
         
         # Save if output path provided
         if output_path:
@@ -247,31 +266,45 @@ def draw_detections(image_path, detections, output_path=None):
         print(f"Error drawing detections: {e}")
         return None
 
-def main():
-    """Main function for CLI usage"""
-    if len(sys.argv) < 2:
-        write_result({"success": False, "error": "Image path is required"})
-        return 1
+def run_cli(args, profile_modes):
+    """Result for one set of CLI arguments (also used per request by --serve)"""
+    try:
+        args, deadline_ms = parse_deadline_args(args)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    # Started here so the annotated image write is covered by the same budget
+    deadline = resolve_deadline(deadline_ms)
+    if len(args) < 1:
+        return {"success": False, "error": "Image path is required"}
     
-    image_path = sys.argv[1]
-    confidence_threshold = float(sys.argv[2]) if len(sys.argv) > 2 else 0.25
+    image_path = args[0]
+    confidence_threshold = float(args[1]) if len(args) > 1 else 0.25
     
     try:
-        result = detect_license_plates(image_path, confidence_threshold)
+        result = run_with_profile(profile_modes, image_path, detect_license_plates,
+                                  image_path, confidence_threshold, deadline=deadline)
         
         # If detection successful and user wants to save annotated image
-        if result["success"] and len(sys.argv) > 3:
-            output_path = sys.argv[3]
+        if result["success"] and len(args) > 2 and not deadline.skip("write"):
+            output_path = args[2]
             annotated_image = draw_detections(image_path, result["detections"], output_path)
             if annotated_image is not None:
                 result["annotated_image_saved"] = output_path
         
-        write_result(result)
-        return 0 if result["success"] else 1
+        return deadline.annotate(result)
         
     except Exception as e:
-        write_result({"success": False, "error": str(e)})
-        return 1
+        return {"success": False, "error": str(e)}
+
+def main():
+    """Main function for CLI usage"""
+    args, profile_modes = parse_profile_args(sys.argv[1:])
+    if args[:1] == ["--serve"]:
+        # One JSON argument list per stdin line, one result written per request
+        return serve_requests(lambda request: run_cli(request, profile_modes), write_result)
+    result = run_cli(args, profile_modes)
+    write_result(result)
+    return 0 if result["success"] else 1
 
 if __name__ == "__main__":
     sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+License Plate Detector Distillation
+Trains a narrow, low-resolution student detector for low-power gates from the
+trained license_plate_detector.pt (the teacher).
+
+The teacher labels the training images (offline distillation): its confident
+boxes are merged with the ground truth into <project>/<name>_dataset, the
+student from ml/configs/yolov8-plate-tiny.yaml is trained on that at the
+reduced imgsz, and both models are then compared on the validation split for
+accuracy and CPU latency.
+
+    cd backend
+    python ml/distill_license_plate_model.py [ml/configs/license_plate_distill.yaml] [--set train.epochs=50]
+    python ml/distill_license_plate_model.py --report-only
+
+Select the student at inference with
+ML_LICENSE_PLATE_MODEL=models/license_plate_detector_tiny.pt
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+from pathlib import Path
+
+import yaml
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from stage_timer import summarize_samples
+from evaluate_models import box_iou, class_metrics
+from training_runner import CONFIG_DIR, load_config, resolve_split, train_from_config, verify_dataset
+from yolo_dataset import label_path_for, list_images, load_class_names, read_yolo_labels, to_pixel_xyxy
+
+CONFIG_PATH = CONFIG_DIR / 'license_plate_distill.yaml'
+DISTILL_META = '.distill_meta.json'
+LATENCY_WARMUP_RUNS = 3
+
+def _dataset_splits(data_yaml):
+    """data.yaml contents plus absolute train/val/test directories"""
+    data_yaml = Path(data_yaml).absolute()
+    with open(data_yaml, 'r') as f:
+        data = yaml.safe_load(f)
+    dataset_path = Path(data.get('path') or data_yaml.parent)
+    if not dataset_path.is_absolute():
+        dataset_path = data_yaml.parent / dataset_path
+    splits = {}
+    for split in ('train', 'val', 'test'):
+        entry = data.get(split)
+        if entry:
+            entries = entry if isinstance(entry, list) else [entry]
+            splits[split] = [resolve_split(dataset_path, e) for e in entries]
+    return data, splits
+
+def _predict_boxes(model, image, conf, **kwargs):
+    """(class_id, confidence, (x1, y1, x2, y2)) for every box the model finds"""
+    results = model(image, conf=conf, verbose=False, **kwargs)
+    if not results or results[0].boxes is None:
+        return []
+    boxes = results[0].boxes
+    return [(int(c), float(s), tuple(b)) for c, s, b in
+            zip(boxes.cls.tolist(), boxes.conf.tolist(), boxes.xyxy.tolist())]
+
+def distill_labels(ground_truth, teacher_boxes, label_mode, match_iou):
+    """
+    Pixel boxes the student trains on for one image
+
+    Args:
+        ground_truth (list): (class_id, x1, y1, x2, y2) from the label file
+        teacher_boxes (list): (class_id, confidence, box) teacher predictions
+        label_mode (str): 'merge' or 'teacher'
+        match_iou (float): IoU at which a teacher box duplicates a label
+
+    Returns:
+        list: (class_id, x1, y1, x2, y2)
+    """
+    teacher = [(class_id, *box) for class_id, _, box in teacher_boxes]
+    if label_mode == 'teacher':
+        return teacher
+    merged = list(ground_truth)
+    for class_id, *box in teacher:
+        if all(gt[0] != class_id or box_iou(box, gt[1:]) < match_iou for gt in ground_truth):
+            merged.append((class_id, *box))
+    return merged
+
+def _yolo_line(box, width, height):
+    class_id, x1, y1, x2, y2 = box
+    x1, x2 = max(0.0, x1), min(float(width), x2)
+    y1, y2 = max(0.0, y1), min(float(height), y2)
+    return (f"{class_id} {(x1 + x2) / 2 / width:.6f} {(y1 + y2) / 2 / height:.6f} "
+            f"{(x2 - x1) / width:.6f} {(y2 - y1) / height:.6f}")
+
+def _link_image(source, target):
+    """Symlink the original image into the distillation split (copy where unsupported)"""
+    if target.exists() or target.is_symlink():
+        return
+    try:
+        os.symlink(source.resolve(), target)
+    except OSError:
+        shutil.copy2(source, target)
+
+def build_distill_dataset(config, data_yaml=None):
+    """
+    Write teacher-labelled training data and its data.yaml
+
+    Labels are only regenerated for images newer than their label, or for
+    every image when the teacher or the distill settings changed.
+
+    Returns:
+        str: Path of the data.yaml for the student (validation stays on ground truth)
+    """
+    import cv2
+    from ultralytics import YOLO
+
+    settings = config.get('distill', {})
+    label_mode = settings.get('label_mode', 'merge')
+    conf = float(settings.get('conf', 0.35))
+    match_iou = float(settings.get('match_iou', 0.5))
+    if label_mode not in ('merge', 'teacher'):
+        raise ValueError(f"distill.label_mode must be 'merge' or 'teacher', got {label_mode!r}")
+
+    teacher_path = Path(config['teacher'])
+    data, splits = _dataset_splits(data_yaml or config['data'])
+    out_dir = Path(config['project']).absolute() / f"{config['name']}_dataset"
+    images_dir = out_dir / 'train' / 'images'
+    labels_dir = out_dir / 'train' / 'labels'
+    images_dir.mkdir(parents=True, exist_ok=True)
+    labels_dir.mkdir(parents=True, exist_ok=True)
+
+    meta = {"teacher": str(teacher_path.resolve()), "teacher_mtime_ns": teacher_path.stat().st_mtime_ns,
+            "label_mode": label_mode, "conf": conf, "match_iou": match_iou}
+    meta_path = out_dir / DISTILL_META
+    try:
+        with open(meta_path, 'r') as f:
+            stale_all = json.load(f) != meta
+    except (OSError, ValueError):
+        stale_all = True
+
+    teacher = None
+    relabelled = reused = 0
+    for source_dir in splits.get('train', []):
+        for image_path in list_images(source_dir):
+            # Prefix with the split directory so two train sources cannot collide
+            target_name = f"{source_dir.parent.name}_{image_path.name}"
+            target_label = labels_dir / f"{Path(target_name).stem}.txt"
+            _link_image(image_path, images_dir / target_name)
+            if (not stale_all and target_label.exists()
+                    and target_label.stat().st_mtime_ns >= image_path.stat().st_mtime_ns):
+                reused += 1
+                continue
+
+            image = cv2.imread(str(image_path))
+            if image is None:
+                print(f"⚠️  Skipping unreadable image: {image_path}")
+                continue
+            if teacher is None:
+                teacher = YOLO(str(teacher_path))
+            height, width = image.shape[:2]
+            ground_truth = [to_pixel_xyxy(box, width, height)
+                            for box in read_yolo_labels(label_path_for(image_path))]
+            boxes = distill_labels(ground_truth, _predict_boxes(teacher, image, conf),
+                                   label_mode, match_iou)
+            lines = [_yolo_line(box, width, height) for box in boxes]
+            with open(target_label, 'w') as f:
+                f.write("\n".join(lines) + ("\n" if lines else ""))
+            relabelled += 1
+
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    distill_data = {key: value for key, value in data.items() if key not in ('path', 'train', 'val', 'test')}
+    distill_data['train'] = str(images_dir)
+    for split in ('val', 'test'):
+        if split in splits:
+            distill_data[split] = [str(p) for p in splits[split]] if len(splits[split]) > 1 else str(splits[split][0])
+    distill_yaml = out_dir / 'data.yaml'
+    with open(distill_yaml, 'w') as f:
+        yaml.safe_dump(distill_data, f, sort_keys=False)
+
+    print(f"✅ Teacher labels: {relabelled} generated, {reused} reused ({label_mode}, conf >= {conf})")
+    return str(distill_yaml)
+
+def _model_summary(model, model_path):
+    return {
+        "path": str(model_path),
+        "size_mb": round(os.path.getsize(model_path) / (1024 * 1024), 2),
+        "parameters": sum(p.numel() for p in model.model.parameters()),
+        "imgsz": model.overrides.get('imgsz'),
+    }
+
+def compare_models(config):
+    """
+    Accuracy and CPU latency of the teacher and the student on one split
+
+    Both models run at the imgsz they were trained with, on the CPU.
+
+    Returns:
+        dict: {"teacher": {...}, "student": {...}, "delta": {...}}
+    """
+    import cv2
+    import torch
+    from ultralytics import YOLO
+
+    settings = config.get('report', {})
+    conf = float(settings.get('conf', 0.25))
+    threads = int(settings.get('threads', 0))
+    if threads > 0:
+        torch.set_num_threads(threads)
+
+    data_yaml = Path(config['data'])
+    class_names = load_class_names(data_yaml.parent)
+    _, splits = _dataset_splits(data_yaml)
+    split_key = 'val' if settings.get('split', 'valid') in ('val', 'valid') else settings['split']
+    image_paths = [p for d in splits.get(split_key, []) for p in list_images(d)]
+    if not image_paths:
+        raise ValueError(f"No images found for split '{split_key}'")
+
+    ground_truth = {}
+    for image_id, image_path in enumerate(image_paths):
+        ground_truth[image_id] = read_yolo_labels(label_path_for(image_path))
+    latency_ids = set(range(min(len(image_paths), int(settings.get('latency_images', 50)))))
+
+    report = {"split": split_key, "images": len(image_paths), "conf": conf,
+              "cpu_threads": torch.get_num_threads()}
+    for role, model_path in (("teacher", config['teacher']), ("student", config['final_model'])):
+        model = YOLO(str(model_path))
+        predictions = {class_id: [] for class_id in range(len(class_names))}
+        gt_by_class = {class_id: {} for class_id in range(len(class_names))}
+        latencies = []
+        warmed_up = False
+        for image_id, image_path in enumerate(image_paths):
+            image = cv2.imread(str(image_path))
+            if image is None:
+                continue
+            height, width = image.shape[:2]
+            if not warmed_up:
+                for _ in range(LATENCY_WARMUP_RUNS):
+                    _predict_boxes(model, image, conf, device='cpu')
+                warmed_up = True
+
+            start = time.perf_counter()
+            boxes = _predict_boxes(model, image, conf, device='cpu')
+            if image_id in latency_ids:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+            for class_id, confidence, box in boxes:
+                predictions.setdefault(class_id, []).append((image_id, confidence, box))
+            for class_id, *box in (to_pixel_xyxy(b, width, height) for b in ground_truth[image_id]):
+                gt_by_class.setdefault(class_id, {}).setdefault(image_id, []).append(tuple(box))
+
+        per_class = {}
+        for class_id in sorted(set(predictions) | set(gt_by_class)):
+            name = class_names[class_id] if class_id < len(class_names) else f"unknown_{class_id}"
+            per_class[name] = class_metrics(predictions.get(class_id, []), gt_by_class.get(class_id, {}))
+        report[role] = {
+            **_model_summary(model, model_path),
+            "per_class": per_class,
+            "latency_ms": summarize_samples(latencies),
+        }
+
+    required_class = config.get('required_class')
+    teacher, student = report["teacher"], report["student"]
+    delta = {}
+    if required_class in teacher["per_class"]:
+        for metric in ("ap50", "ap50_95", "recall"):
+            t, s = teacher["per_class"][required_class][metric], student["per_class"][required_class][metric]
+            delta[f"{required_class}_{metric}"] = round(s - t, 4) if t is not None and s is not None else None
+    if teacher["latency_ms"].get("p50") and student["latency_ms"].get("p50"):
+        delta["speedup_p50"] = round(teacher["latency_ms"]["p50"] / student["latency_ms"]["p50"], 2)
+    delta["parameter_ratio"] = round(student["parameters"] / teacher["parameters"], 3)
+    report["delta"] = delta
+    return report
+
+def print_report(report, required_class=None):
+    print(f"\n📊 Teacher vs student on '{report['split']}' ({report['images']} images, "
+          f"{report['cpu_threads']} CPU threads)")
+    print(f"{'':10} {'params':>10} {'imgsz':>6} {'AP50':>7} {'AP50-95':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for role in ("teacher", "student"):
+        entry = report[role]
+        plate = entry["per_class"].get(required_class, {})
+        print(f"{role:10} {entry['parameters']:>10,} {str(entry['imgsz']):>6} "
+              f"{str(plate.get('ap50')):>7} {str(plate.get('ap50_95')):>8} "
+              f"{str(entry['latency_ms'].get('p50')):>8} {str(entry['latency_ms'].get('p95')):>8}")
+    print(f"Delta: {report['delta']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distil the license plate detector into a tiny student")
+    parser.add_argument("config", nargs="?", default=str(CONFIG_PATH))
+    parser.add_argument("--set", dest="overrides", action="append", default=[],
+                        help="Override a config value, e.g. train.imgsz=224 (repeatable)")
+    resume_group = parser.add_mutually_exclusive_group()
+    resume_group.add_argument("--resume", dest="resume", action="store_true", default=None)
+    resume_group.add_argument("--no-resume", dest="resume", action="store_false")
+    parser.add_argument("--report-only", action="store_true",
+                        help="Skip training and compare the existing teacher and student")
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config, args.overrides)
+    if not Path(config['teacher']).exists():
+        print(f"❌ Teacher model not found: {config['teacher']}")
+        print("Train it first using: python ml/train_license_plate_model.py")
+        return 1
+
+    if not args.report_only:
+        print("Step 1: Verifying dataset...")
+        if not verify_dataset(config):
+            print("❌ Dataset verification failed.")
+            return 1
+
+        print("\nStep 2: Labelling training images with the teacher...")
+        try:
+            student_config = dict(config, data=build_distill_dataset(config))
+            print("\nStep 3: Training student model...")
+            if not train_from_config(student_config, args.resume):
+                print("❌ Training failed.")
+                return 1
+        except Exception as e:
+            print(f"❌ Distillation error: {e}")
+            return 1
+
+    print("\nStep 4: Comparing teacher and student...")
+    try:
+        report = compare_models(config)
+    except Exception as e:
+        print(f"❌ Comparison error: {e}")
+        return 1
+    report_path = Path(config['project']) / config['name'] / 'distill_report.json'
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print_report(report, config.get('required_class'))
+    print(f"\nReport saved to '{report_path}'")
+    print(f"Use the student with ML_LICENSE_PLATE_MODEL={config['final_model']}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
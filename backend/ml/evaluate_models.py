@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Parallel Model Evaluation
+Runs detect_vehicles and detect_license_plates over the validation/test splits
+of datasets/vehicle_detection in batches across a process pool, compares the
+predictions with the YOLO label files and reports precision, recall, mAP and
+the per-image latency distribution of each model.
+
+    cd backend
+    python ml/evaluate_models.py --splits valid,test --workers 4 --batch-size 8
+
+The output keeps the test_results.json fields (type_counts, confidence_ranges)
+and adds accuracy and speed metrics side by side.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(ML_DIR)
+from stage_timer import summarize_samples
+from yolo_dataset import (category_for_name, label_path_for, list_images, load_class_names,
+                          read_yolo_labels, to_pixel_xyxy)
+
+IOU_THRESHOLDS = [0.5 + 0.05 * i for i in range(10)]
+MODELS = ("vehicle", "plate")
+
+def box_iou(a, b):
+    """IoU of two (x1, y1, x2, y2) boxes"""
+    inter_w = min(a[2], b[2]) - max(a[0], b[0])
+    inter_h = min(a[3], b[3]) - max(a[1], b[1])
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+    inter = inter_w * inter_h
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def average_precision(predictions, ground_truth, iou_threshold):
+    """
+    All-point interpolated AP for one class
+
+    Args:
+        predictions (list): (image_id, confidence, box) tuples
+        ground_truth (dict): image_id -> list of boxes
+        iou_threshold (float): Minimum IoU for a true positive
+
+    Returns:
+        dict: ap, precision, recall, tp, fp, fn at this threshold
+    """
+    total_gt = sum(len(boxes) for boxes in ground_truth.values())
+    matched = {image_id: [False] * len(boxes) for image_id, boxes in ground_truth.items()}
+    tp_flags = []
+    for image_id, _, box in sorted(predictions, key=lambda p: p[1], reverse=True):
+        best_iou, best_idx = 0.0, -1
+        for idx, gt_box in enumerate(ground_truth.get(image_id, [])):
+            iou = box_iou(box, gt_box)
+            if iou > best_iou:
+                best_iou, best_idx = iou, idx
+        if best_iou >= iou_threshold and not matched[image_id][best_idx]:
+            matched[image_id][best_idx] = True
+            tp_flags.append(1)
+        else:
+            tp_flags.append(0)
+
+    tp = sum(tp_flags)
+    fp = len(tp_flags) - tp
+    if total_gt == 0:
+        return {"ap": None, "precision": None, "recall": None, "tp": tp, "fp": fp, "fn": 0}
+
+    precisions, recalls = [], []
+    running_tp = 0
+    for rank, flag in enumerate(tp_flags, start=1):
+        running_tp += flag
+        precisions.append(running_tp / rank)
+        recalls.append(running_tp / total_gt)
+
+    # Precision envelope, then integrate over recall steps
+    for i in range(len(precisions) - 2, -1, -1):
+        precisions[i] = max(precisions[i], precisions[i + 1])
+    ap, previous_recall = 0.0, 0.0
+    for precision, recall in zip(precisions, recalls):
+        ap += (recall - previous_recall) * precision
+        previous_recall = recall
+
+    return {
+        "ap": round(ap, 4),
+        "precision": round(tp / len(tp_flags), 4) if tp_flags else 0.0,
+        "recall": round(tp / total_gt, 4),
+        "tp": tp, "fp": fp, "fn": total_gt - tp
+    }
+
+def class_metrics(predictions, ground_truth):
+    """AP50, AP50-95, precision and recall at IoU 0.5 for one class"""
+    at_50 = average_precision(predictions, ground_truth, 0.5)
+    aps = [average_precision(predictions, ground_truth, t)["ap"] for t in IOU_THRESHOLDS]
+    aps = [ap for ap in aps if ap is not None]
+    return {
+        "ap50": at_50["ap"],
+        "ap50_95": round(sum(aps) / len(aps), 4) if aps else None,
+        "precision": at_50["precision"],
+        "recall": at_50["recall"],
+        "tp": at_50["tp"], "fp": at_50["fp"], "fn": at_50["fn"],
+        "ground_truth": sum(len(b) for b in ground_truth.values()),
+        "predictions": len(predictions)
+    }
+
+def _image_size(image_path):
+    """Width and height from the image header without decoding pixels"""
+    from PIL import Image
+    with Image.open(image_path) as img:
+        return img.size
+
+_detect_vehicles = None
+_detect_license_plates = None
+
+def _init_worker(confidence_threshold, vehicle_mode="all"):
+    """Load both models once per worker"""
+    global _detect_vehicles, _detect_license_plates
+    from detect import detect_vehicles, load_vehicle_model
+    from detect_license_plate import detect_license_plates, load_license_plate_model
+    load_vehicle_model()
+    load_license_plate_model()
+    _detect_vehicles = lambda path: detect_vehicles(path, mode=vehicle_mode)
+    _detect_license_plates = lambda path: detect_license_plates(path, confidence_threshold)
+
+def _evaluate_batch(image_paths):
+    """Run both models over a batch; returns one record per image"""
+    records = []
+    for image_path in image_paths:
+        record = {"image": image_path, "size": _image_size(image_path)}
+
+        start = time.perf_counter()
+        vehicle = _detect_vehicles(image_path)
+        record["vehicle_latency_ms"] = (time.perf_counter() - start) * 1000.0
+        record["vehicles"] = []
+        if vehicle.get("success"):
+            for v in vehicle.get("vehicles") or [vehicle]:
+                record["vehicles"].append({"vehicle_type": v["vehicle_type"],
+                                           "confidence": v["confidence"],
+                                           "bbox": v["bbox"]})
+
+        start = time.perf_counter()
+        plates = _detect_license_plates(image_path)
+        record["plate_latency_ms"] = (time.perf_counter() - start) * 1000.0
+        record["plates"] = [
+            {"confidence": d["confidence"],
+             "bbox": [d["bbox"]["x1"], d["bbox"]["y1"], d["bbox"]["x2"], d["bbox"]["y2"]]}
+            for d in plates.get("detections", [])
+        ]
+        records.append(record)
+    return records
+
+def _confidence_bucket(confidence):
+    if confidence >= 0.9:
+        return '0.9-1.0'
+    if confidence >= 0.8:
+        return '0.8-0.9'
+    if confidence >= 0.7:
+        return '0.7-0.8'
+    if confidence >= 0.6:
+        return '0.6-0.7'
+    return '<0.6'
+
+def summarize(records, class_names):
+    """Accuracy, test_results.json-style counts and latency for all records"""
+    categories = {class_id: category_for_name(name) for class_id, name in enumerate(class_names)}
+    gt = {"2-wheeler": {}, "4-wheeler": {}, "number_plate": {}}
+    preds = {"2-wheeler": [], "4-wheeler": [], "number_plate": []}
+    type_counts = {'2-wheeler': 0, '4-wheeler': 0, 'failed': 0}
+    confidence_ranges = {'0.9-1.0': 0, '0.8-0.9': 0, '0.7-0.8': 0, '0.6-0.7': 0, '<0.6': 0}
+    confusion = {}
+
+    for image_id, record in enumerate(records):
+        width, height = record["size"]
+        gt_types = []
+        for key in gt:
+            gt[key][image_id] = []
+        for box in read_yolo_labels(label_path_for(record["image"])):
+            category = categories.get(box[0])
+            if category is None:
+                continue
+            gt[category][image_id].append(to_pixel_xyxy(box, width, height)[1:])
+            if category != "number_plate":
+                gt_types.append((box[3] * box[4], category))
+
+        for vehicle in record["vehicles"]:
+            preds[vehicle["vehicle_type"]].append((image_id, vehicle["confidence"], vehicle["bbox"]))
+        for plate in record["plates"]:
+            preds["number_plate"].append((image_id, plate["confidence"], plate["bbox"]))
+
+        # Image-level type: the largest labelled vehicle vs the best prediction
+        expected = max(gt_types)[1] if gt_types else "none"
+        if record["vehicles"]:
+            best = max(record["vehicles"], key=lambda v: v["confidence"])
+            predicted = best["vehicle_type"]
+            type_counts[predicted] += 1
+            confidence_ranges[_confidence_bucket(best["confidence"])] += 1
+        else:
+            predicted = "none"
+            type_counts['failed'] += 1
+        confusion.setdefault(expected, {}).setdefault(predicted, 0)
+        confusion[expected][predicted] += 1
+
+    per_class = {name: class_metrics(preds[name], gt[name]) for name in gt}
+    vehicle_aps = [per_class[c]["ap50"] for c in ("2-wheeler", "4-wheeler") if per_class[c]["ap50"] is not None]
+    vehicle_aps_95 = [per_class[c]["ap50_95"] for c in ("2-wheeler", "4-wheeler")
+                      if per_class[c]["ap50_95"] is not None]
+    correct = sum(confusion.get(t, {}).get(t, 0) for t in ("2-wheeler", "4-wheeler"))
+    labelled = sum(sum(row.values()) for t, row in confusion.items() if t != "none")
+
+    return {
+        "total_images": len(records),
+        "successful_detections": type_counts['2-wheeler'] + type_counts['4-wheeler'],
+        "type_counts": type_counts,
+        "confidence_ranges": confidence_ranges,
+        "accuracy": {
+            "vehicle_map50": round(sum(vehicle_aps) / len(vehicle_aps), 4) if vehicle_aps else None,
+            "vehicle_map50_95": round(sum(vehicle_aps_95) / len(vehicle_aps_95), 4) if vehicle_aps_95 else None,
+            "vehicle_type_accuracy": round(correct / labelled, 4) if labelled else None,
+            "per_class": per_class,
+            "vehicle_type_confusion": confusion
+        },
+        "latency_ms": {
+            "vehicle": summarize_samples([r["vehicle_latency_ms"] for r in records]),
+            "plate": summarize_samples([r["plate_latency_ms"] for r in records])
+        }
+    }
+
+def evaluate(image_paths, workers, batch_size, confidence_threshold, vehicle_mode="all"):
+    """Run both models over all images across a process pool"""
+    batches = [image_paths[i:i + batch_size] for i in range(0, len(image_paths), batch_size)]
+    records = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(confidence_threshold, vehicle_mode)) as executor:
+        for batch_records in executor.map(_evaluate_batch, batches):
+            records.extend(batch_records)
+            print(f"Processed {len(records)}/{len(image_paths)} images...")
+    return records, time.perf_counter() - start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate vehicle and plate models for accuracy and speed")
+    parser.add_argument("--dataset", default="datasets/vehicle_detection")
+    parser.add_argument("--splits", default="valid,test", help="Comma list of splits to evaluate")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--batch-size", type=int, default=8, help="Images per pool task")
+    parser.add_argument("--confidence", type=float, default=0.25, help="Plate detection threshold")
+    parser.add_argument("--vehicle-mode", choices=("all", "best"), default="all",
+                        help="Score every vehicle box, or only the single best one per image")
+    parser.add_argument("--limit", type=int, default=0, help="Maximum images per split (0 = all)")
+    parser.add_argument("--output", default="evaluation_results.json")
+    args = parser.parse_args(argv)
+
+    dataset_path = Path(args.dataset)
+    if not (dataset_path / 'data.yaml').exists():
+        print(f"❌ data.yaml not found in {dataset_path}")
+        return 1
+    class_names = load_class_names(dataset_path)
+    unmapped = [name for name in class_names if category_for_name(name) is None]
+    if unmapped:
+        print(f"⚠️  Ignoring unmapped classes: {unmapped}")
+
+    results = {"dataset": str(dataset_path), "class_names": class_names, "splits": {}}
+    for split in [s.strip() for s in args.splits.split(",") if s.strip()]:
+        image_paths = [str(p) for p in list_images(dataset_path / split / 'images')]
+        if args.limit:
+            image_paths = image_paths[:args.limit]
+        if not image_paths:
+            print(f"⚠️  No images in {split}, skipping")
+            continue
+
+        print(f"\nEvaluating {split}: {len(image_paths)} images, {args.workers} workers, batch {args.batch_size}")
+        records, wall_s = evaluate(image_paths, args.workers, args.batch_size, args.confidence,
+                                   args.vehicle_mode)
+        summary = summarize(records, class_names)
+        summary["throughput"] = {"wall_s": round(wall_s, 3),
+                                 "images_per_sec": round(len(records) / wall_s, 3) if wall_s else None,
+                                 "workers": args.workers, "batch_size": args.batch_size}
+        summary["detections"] = [
+            {"image": r["image"], "vehicles": r["vehicles"], "plates": r["plates"],
+             "vehicle_latency_ms": round(r["vehicle_latency_ms"], 3),
+             "plate_latency_ms": round(r["plate_latency_ms"], 3)}
+            for r in records
+        ]
+        results["splits"][split] = summary
+
+        accuracy = summary["accuracy"]
+        print(f"\n{split} results:")
+        print(f"  Vehicle mAP50: {accuracy['vehicle_map50']}  mAP50-95: {accuracy['vehicle_map50_95']}")
+        print(f"  Vehicle type accuracy: {accuracy['vehicle_type_accuracy']}")
+        for name, metrics in accuracy["per_class"].items():
+            print(f"  {name}: P={metrics['precision']} R={metrics['recall']} AP50={metrics['ap50']}")
+        print(f"  Type counts: {summary['type_counts']}")
+        print(f"  Latency p50/p95 (ms): vehicle {summary['latency_ms']['vehicle'].get('p50')}/"
+              f"{summary['latency_ms']['vehicle'].get('p95')}, plate "
+              f"{summary['latency_ms']['plate'].get('p50')}/{summary['latency_ms']['plate'].get('p95')}")
+        print(f"  Throughput: {summary['throughput']['images_per_sec']} images/s")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nDetailed results saved to '{args.output}'")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Plate Crop Quality Scoring
+Cheap checks run on each plate crop before OCR, the slowest stage, so
+motion-blurred, underexposed or glare-washed crops can be skipped and the
+caller can wait for a better frame.
+
+Each crop is resized to a fixed height first so the measures are comparable
+across plate sizes:
+    sharpness   variance of the Laplacian (low = blurred)
+    contrast    spread between the 5th and 95th brightness percentile, 0..1
+    brightness  mean brightness, 0..1
+    glare       fraction of near-white (overexposed) pixels
+    score       0..1 combination used to rank crops of the same plate
+
+Settings (environment):
+    ML_QUALITY_GATE            off | report (default) | skip
+                               report adds the scores only; skip also skips
+                               OCR on crops that fail a threshold
+    ML_QUALITY_MIN_SHARPNESS   default 60
+    ML_QUALITY_MIN_CONTRAST    default 0.2
+    ML_QUALITY_MIN_BRIGHTNESS  default 0.12
+    ML_QUALITY_MAX_GLARE       default 0.3
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+GATE_ENV_VAR = "ML_QUALITY_GATE"
+GATE_MODES = ("off", "report", "skip")
+THRESHOLD_ENV_VARS = {
+    "min_sharpness": "ML_QUALITY_MIN_SHARPNESS",
+    "min_contrast": "ML_QUALITY_MIN_CONTRAST",
+    "min_brightness": "ML_QUALITY_MIN_BRIGHTNESS",
+    "max_glare": "ML_QUALITY_MAX_GLARE",
+}
+DEFAULT_THRESHOLDS = {
+    "min_sharpness": 60.0,
+    "min_contrast": 0.2,
+    "min_brightness": 0.12,
+    "max_glare": 0.3,
+}
+
+SCORE_HEIGHT = 64
+GLARE_LEVEL = 250
+
+def gate_mode(mode=None):
+    """Quality gate mode from the argument or ML_QUALITY_GATE ('report' when unset or unknown)"""
+    mode = (mode or os.environ.get(GATE_ENV_VAR, "report")).strip().lower()
+    return mode if mode in GATE_MODES else "report"
+
+def quality_thresholds(overrides=None):
+    """Thresholds from the environment, with `overrides` taking precedence"""
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    for key, env_var in THRESHOLD_ENV_VARS.items():
+        try:
+            thresholds[key] = float(os.environ[env_var])
+        except (KeyError, ValueError):
+            pass
+    thresholds.update(overrides or {})
+    return thresholds
+
+def score_crop(crop):
+    """
+    Quality measures of one plate crop
+
+    Args:
+        crop (numpy.ndarray): BGR or grayscale crop
+
+    Returns:
+        dict: sharpness, contrast, brightness, glare and the combined score
+    """
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    height, width = gray.shape[:2]
+    scaled_width = max(1, round(width * SCORE_HEIGHT / height))
+    interpolation = cv2.INTER_AREA if height > SCORE_HEIGHT else cv2.INTER_LINEAR
+    gray = cv2.resize(gray, (scaled_width, SCORE_HEIGHT), interpolation=interpolation)
+
+    sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+    low, high = np.percentile(gray, (5, 95))
+    contrast = float(high - low) / 255.0
+    brightness = float(gray.mean()) / 255.0
+    glare = float(np.count_nonzero(gray >= GLARE_LEVEL)) / gray.size
+
+    defaults = DEFAULT_THRESHOLDS
+    score = (min(1.0, sharpness / (2 * defaults["min_sharpness"]))
+             * min(1.0, contrast / (2 * defaults["min_contrast"]))
+             * (1.0 - glare))
+    return {
+        "sharpness": round(sharpness, 1),
+        "contrast": round(contrast, 3),
+        "brightness": round(brightness, 3),
+        "glare": round(glare, 3),
+        "score": round(score, 3)
+    }
+
+def assess_crop(crop, thresholds=None):
+    """
+    Score a crop and check it against the thresholds
+
+    Returns:
+        dict: score_crop() measures plus `passed` and the failed `reasons`
+            ('blurred', 'low_contrast', 'dark', 'glare')
+    """
+    thresholds = thresholds or quality_thresholds()
+    quality = score_crop(crop)
+    reasons = []
+    if quality["sharpness"] < thresholds["min_sharpness"]:
+        reasons.append("blurred")
+    if quality["contrast"] < thresholds["min_contrast"]:
+        reasons.append("low_contrast")
+    if quality["brightness"] < thresholds["min_brightness"]:
+        reasons.append("dark")
+    if quality["glare"] > thresholds["max_glare"]:
+        reasons.append("glare")
+    quality["passed"] = not reasons
+    quality["reasons"] = reasons
+    return quality
+
+def skipped_ocr_result(quality):
+    """OCR result recorded for a crop the gate skipped"""
+    return {
+        "success": False,
+        "skipped": True,
+        "error": f"Skipped low quality crop ({', '.join(quality['reasons'])})"
+    }
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Hard Example Capture
+Opt-in stage that keeps production frames the models were unsure about, so
+they can be reviewed and added to the next training run.
+
+Enable by setting ML_HARD_EXAMPLES=1 (or ML_HARD_EXAMPLES_DIR). Frames whose
+detection confidence falls inside the configured band, or whose plate OCR
+failed or was low-confidence, are copied into a deduplicated, size-capped
+queue laid out as a YOLO dataset:
+
+    <queue>/data.yaml
+    <queue>/train/images/<sha1>.jpg
+    <queue>/train/labels/<sha1>.txt     pseudo-labels from the detections
+    <queue>/meta/<sha1>.json            why the frame was captured
+
+The pseudo-labels only cover what the capturing stage detected (vehicles or
+plates), so training_runner leaves the queue out until its labels have been
+reviewed and the config sets include_hard_examples: true.
+
+Settings (environment):
+    ML_HARD_EXAMPLES_DIR       queue root (default: <repo>/datasets/hard_examples)
+    ML_HARD_EXAMPLES_BAND      detection confidence band, default "0.25,0.7"
+    ML_HARD_EXAMPLES_OCR_BAND  OCR confidence band, default "0.0,0.6"
+    ML_HARD_EXAMPLES_MAX_MB    queue size cap, oldest frames evicted first (default 500)
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+ML_DIR = Path(__file__).resolve().parent
+sys.path.append(str(ML_DIR))
+from yolo_dataset import category_for_name, load_class_names
+
+ENABLE_ENV_VAR = "ML_HARD_EXAMPLES"
+DIR_ENV_VAR = "ML_HARD_EXAMPLES_DIR"
+BAND_ENV_VAR = "ML_HARD_EXAMPLES_BAND"
+OCR_BAND_ENV_VAR = "ML_HARD_EXAMPLES_OCR_BAND"
+MAX_MB_ENV_VAR = "ML_HARD_EXAMPLES_MAX_MB"
+
+DEFAULT_QUEUE_DIR = ML_DIR.parent.parent / 'datasets' / 'hard_examples'
+DEFAULT_DATASET_DIR = ML_DIR.parent.parent / 'datasets' / 'vehicle_detection'
+DEFAULT_BAND = (0.25, 0.7)
+DEFAULT_OCR_BAND = (0.0, 0.6)
+DEFAULT_MAX_MB = 500
+FALLBACK_CLASS_NAMES = ['2-wheeler', '4-wheeler', 'number_plate']
+
+def capture_enabled():
+    return bool(os.environ.get(DIR_ENV_VAR)) or \
+        os.environ.get(ENABLE_ENV_VAR, "").strip().lower() in ("1", "true", "yes")
+
+def queue_dir():
+    return Path(os.environ.get(DIR_ENV_VAR) or DEFAULT_QUEUE_DIR)
+
+def _band(env_var, default):
+    try:
+        low, high = (float(v) for v in os.environ[env_var].split(","))
+        return low, high
+    except (KeyError, ValueError):
+        return default
+
+def in_band(confidence, band):
+    return confidence is not None and band[0] <= confidence < band[1]
+
+_class_names = None
+
+def class_names():
+    """Class names of the training dataset so pseudo-labels use the same ids"""
+    global _class_names
+    if _class_names is None:
+        try:
+            _class_names = load_class_names(DEFAULT_DATASET_DIR)
+        except Exception:
+            _class_names = list(FALLBACK_CLASS_NAMES)
+    return _class_names
+
+def class_id_for(category):
+    """First dataset class id whose name maps to `category` (e.g. '4-wheeler')"""
+    for class_id, name in enumerate(class_names()):
+        if name == category or category_for_name(name) == category:
+            return class_id
+    return None
+
+def _ensure_layout(root):
+    for sub in ('train/images', 'train/labels', 'meta'):
+        (root / sub).mkdir(parents=True, exist_ok=True)
+    data_yaml = root / 'data.yaml'
+    if not data_yaml.exists():
+        names = class_names()
+        _atomic_write(data_yaml, "# Hard examples captured from production; review labels before training\n"
+                                 f"path: {root.as_posix()}\ntrain: train/images\nval: train/images\n"
+                                 f"nc: {len(names)}\nnames: {json.dumps(names)}\n")
+
+def _atomic_write(path, content):
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp_')
+    with os.fdopen(fd, 'w') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+def _hash_file(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _yolo_line(class_id, box, width, height):
+    x1, y1, x2, y2 = box
+    cx = (x1 + x2) / 2 / width
+    cy = (y1 + y2) / 2 / height
+    return f"{class_id} {cx:.6f} {cy:.6f} {(x2 - x1) / width:.6f} {(y2 - y1) / height:.6f}"
+
+def enforce_size_cap(root, max_bytes):
+    """Evict the oldest captured frames until the queue fits in `max_bytes`"""
+    frames = []
+    total = 0
+    for meta_path in (root / 'meta').glob('*.json'):
+        key = meta_path.stem
+        files = [meta_path, root / 'train' / 'labels' / f"{key}.txt"]
+        files += list((root / 'train' / 'images').glob(f"{key}.*"))
+        size = sum(p.stat().st_size for p in files if p.exists())
+        frames.append((meta_path.stat().st_mtime, files, size))
+        total += size
+    for _, files, size in sorted(frames, key=lambda f: f[0]):
+        if total <= max_bytes:
+            break
+        for path in files:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        total -= size
+    return total
+
+def capture(image_path, reason, boxes, image_size, details=None):
+    """
+    Copy a frame and its pseudo-labels into the queue
+
+    Args:
+        image_path (str): Frame to keep
+        reason (str): Why it was captured, e.g. 'plate_confidence'
+        boxes (list): (category, (x1, y1, x2, y2)) pixel boxes
+        image_size (tuple): (width, height) of the frame as decoded, or None
+            to read it from the file
+        details (dict): Extra metadata (confidences, OCR text)
+
+    Returns:
+        str or None: Queue key (content hash) of the frame
+    """
+    try:
+        # Before anything is written, so an unreadable frame leaves no orphan files
+        width, height = image_size or _image_size(image_path)
+        root = queue_dir()
+        _ensure_layout(root)
+        key = _hash_file(image_path)
+        meta_path = root / 'meta' / f"{key}.json"
+
+        meta = {"reasons": [], "captured_at": datetime.now().isoformat(timespec="seconds"),
+                "source": os.path.basename(image_path)}
+        if meta_path.exists():
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+        else:
+            suffix = Path(image_path).suffix.lower() or '.jpg'
+            image_target = root / 'train' / 'images' / f"{key}{suffix}"
+            fd, tmp_path = tempfile.mkstemp(dir=image_target.parent, prefix='.tmp_')
+            os.close(fd)
+            shutil.copyfile(image_path, tmp_path)
+            os.replace(tmp_path, image_target)
+
+        # Merge labels from every stage that looked at this frame
+        label_path = root / 'train' / 'labels' / f"{key}.txt"
+        lines = set(label_path.read_text().splitlines()) if label_path.exists() else set()
+        for category, box in boxes:
+            class_id = class_id_for(category)
+            if class_id is not None and width > 0 and height > 0:
+                lines.add(_yolo_line(class_id, box, width, height))
+        _atomic_write(label_path, "\n".join(sorted(lines)) + ("\n" if lines else ""))
+
+        meta["reasons"].append({"reason": reason, **(details or {})})
+        _atomic_write(meta_path, json.dumps(meta, indent=2))
+
+        max_mb = float(os.environ.get(MAX_MB_ENV_VAR, DEFAULT_MAX_MB))
+        enforce_size_cap(root, int(max_mb * 1024 * 1024))
+        return key
+    except Exception as e:
+        # Capturing must never break a gate response
+        print(f"Warning: hard example capture failed: {e}", file=sys.stderr)
+        return None
+
+# EXIF orientations that rotate by 90 degrees (cv2.imread applies them, so the boxes are rotated)
+_TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+_EXIF_ORIENTATION = 0x0112
+
+def _result_size(result):
+    """(width, height) reported by the detector, None when the result has none"""
+    dims = result.get("image_dimensions") or {}
+    if dims.get("width") and dims.get("height"):
+        return dims["width"], dims["height"]
+    return None
+
+def _image_size(image_path):
+    """(width, height) of the frame as decoded, from the header and EXIF orientation"""
+    from PIL import Image
+    with Image.open(image_path) as img:
+        width, height = img.size
+        if img.getexif().get(_EXIF_ORIENTATION) in _TRANSPOSED_ORIENTATIONS:
+            return height, width
+        return width, height
+
+def capture_vehicle_result(image_path, result):
+    """Capture a detect_vehicles frame whose best (or any, with mode='all') confidence is in the band"""
+    if not capture_enabled() or not result.get("success"):
+        return None
+    band = _band(BAND_ENV_VAR, DEFAULT_BAND)
+    vehicles = result.get("vehicles") or [result]
+    uncertain = [v for v in vehicles if in_band(v.get("confidence"), band)]
+    if not uncertain:
+        return None
+    return capture(image_path, "vehicle_confidence",
+                   [(v["vehicle_type"], v["bbox"]) for v in vehicles],
+                   _result_size(result),
+                   {"vehicles": [{"vehicle_type": v["vehicle_type"], "confidence": v["confidence"]}
+                                 for v in uncertain]})
+
+def capture_plate_result(image_path, result):
+    """Capture a detect_license_plates frame with any plate in the band"""
+    if not capture_enabled() or not result.get("success"):
+        return None
+    band = _band(BAND_ENV_VAR, DEFAULT_BAND)
+    detections = result.get("detections", [])
+    uncertain = [d["confidence"] for d in detections if in_band(d["confidence"], band)]
+    if not uncertain:
+        return None
+    boxes = [("number_plate", (d["bbox"]["x1"], d["bbox"]["y1"], d["bbox"]["x2"], d["bbox"]["y2"]))
+             for d in detections]
+    return capture(image_path, "plate_confidence", boxes, _result_size(result),
+                   {"confidences": uncertain})
+
+def capture_ocr_result(image_path, result):
+    """Capture a process_license_plate_full frame whose OCR failed or was unsure"""
+    if not capture_enabled() or not result.get("success"):
+        return None
+    band = _band(OCR_BAND_ENV_VAR, DEFAULT_OCR_BAND)
+    flagged = []
+    for plate in result.get("processed_plates", []):
+        ocr = plate.get("ocr_result") or {}
+        if ocr.get("skipped") or ocr.get("deadline_exceeded"):
+            # Blurred or badly exposed crops make poor training labels, and
+            # plates cut by the deadline were never read
+            continue
+        if not ocr.get("success") or not ocr.get("license_plate_text"):
+            flagged.append({"plate_id": plate["plate_id"], "ocr": "failed"})
+        elif in_band(ocr.get("confidence"), band):
+            flagged.append({"plate_id": plate["plate_id"], "ocr": ocr["license_plate_text"],
+                            "ocr_confidence": ocr["confidence"]})
+    if not flagged:
+        return None
+    boxes = [("number_plate", (p["detection"]["bbox"]["x1"], p["detection"]["bbox"]["y1"],
+                               p["detection"]["bbox"]["x2"], p["detection"]["bbox"]["y2"]))
+             for p in result["processed_plates"]]
+    return capture(image_path, "ocr_confidence", boxes, _result_size(result),
+                   {"plates": flagged})
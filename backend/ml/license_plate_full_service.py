@@ -7,23 +7,24 @@ This script combines license plate detection and text extraction in one service.
 import os
 import sys
 import cv2
-import json
-import tempfile
-from pathlib import Path
 
 # Import our custom modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from detect_license_plate import detect_license_plates, extract_license_plate_image
-from license_plate_ocr import extract_license_plate_text
+from stage_timer import StageTimer, finalize_timings
+from ml_metrics import record_call, track_in_flight
+from ml_profiling import parse_profile_args, run_with_profile
+from ml_core import GREEN, YELLOW, load_image, render_annotations, write_result
+from result_protocol import serve_requests
+from hard_examples import capture_ocr_result
+from artifact_store import get_store
+from frame_quality import gate_mode
+from plate_reading import read_plates
+from deadline import parse_deadline_args, resolve_deadline
 
-def write_result(result):
-    """Write JSON result with markers for parsing"""
-    print("RESULT_START")
-    print(json.dumps(result, indent=2))
-    print("RESULT_END")
-    sys.stdout.flush()
-
-def process_license_plate_full(image_path, confidence_threshold=0.25, ocr_method="auto"):
+def process_license_plate_full(image_path, confidence_threshold=0.25, ocr_method="auto",
+                               include_timings=None, keep_plate_images=False, quality_gate=None,
+                               deadline=None):
     """
     Complete license plate processing: detection + OCR
     
@@ -31,13 +32,38 @@ def process_license_plate_full(image_path, confidence_threshold=0.25, ocr_method
         image_path (str): Path to the image file
         confidence_threshold (float): Minimum confidence for detection
         ocr_method (str): OCR method to use
+        include_timings (bool): Attach a `timings_ms` block (default: ML_INCLUDE_TIMINGS)
+        keep_plate_images (bool): Save each plate crop in the artifact store and
+            report it as `extracted_image_path` (OCR itself works in memory)
+        quality_gate (str): 'off', 'report' or 'skip' (default: ML_QUALITY_GATE);
+            'skip' does not run OCR on blurred, dark or glare-washed crops
+        deadline (Deadline | float): Time budget (see deadline.py); plates
+            still waiting for OCR when it is spent are returned as detections
+            only and the result is marked `partial`
         
     Returns:
         dict: Complete processing results
     """
+    timer = StageTimer()
+    deadline = resolve_deadline(deadline)
+    with track_in_flight("process_license_plate_full"):
+        result = _process_license_plate_full(image_path, confidence_threshold, ocr_method,
+                                             keep_plate_images, gate_mode(quality_gate), timer,
+                                             deadline)
+    deadline.annotate(result)
+    record_call("process_license_plate_full", result, timer,
+                detection_count=len(result.get("processed_plates", [])))
+    capture_ocr_result(image_path, result)
+    return finalize_timings(result, timer, "process_license_plate_full", include_timings)
+
+def _process_license_plate_full(image_path, confidence_threshold, ocr_method, keep_plate_images,
+                                quality_gate, timer, deadline):
+    """Pipeline body; records each stage on `timer`"""
     try:
         # Step 1: Detect license plates
-        detection_result = detect_license_plates(image_path, confidence_threshold)
+        detection_result = detect_license_plates(image_path, confidence_threshold,
+                                                 include_timings=True, deadline=deadline)
+        timer.absorb(detection_result, prefix="detection.")
         
         if not detection_result["success"]:
             return {
@@ -46,8 +72,15 @@ def process_license_plate_full(image_path, confidence_threshold=0.25, ocr_method
                 "detection_result": detection_result
             }
         
-        # Step 2: Process each detected license plate
+        # Step 2: Process each detected license plate from a single decode of the frame
+        image = None
+        if not deadline.skip("decode"):
+            with timer.stage("imread"):
+                image = load_image(image_path)
+            if image is None:
+                return {"success": False, "error": f"Could not load image: {image_path}"}
         processed_plates = []
+        plate_images = []
         
         for i, detection in enumerate(detection_result["detections"]):
             plate_info = {
@@ -56,40 +89,24 @@ def process_license_plate_full(image_path, confidence_threshold=0.25, ocr_method
                 "ocr_result": None,
                 "extracted_image_path": None
             }
-            
-            try:
-                # Extract license plate image
-                plate_image = extract_license_plate_image(image_path, detection["bbox"])
-                
-                if plate_image is not None:
-                    # Save extracted plate image temporarily for OCR
-                    with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as temp_file:
-                        temp_path = temp_file.name
-                        cv2.imwrite(temp_path, plate_image)
-                        plate_info["extracted_image_path"] = temp_path
-                    
-                    # Perform OCR on extracted plate
-                    ocr_result = extract_license_plate_text(plate_image, ocr_method)
-                    plate_info["ocr_result"] = ocr_result
-                    
-                    # Clean up temporary file
-                    try:
-                        os.unlink(temp_path)
-                    except:
-                        pass
-                else:
-                    plate_info["ocr_result"] = {
-                        "success": False,
-                        "error": "Failed to extract license plate image"
-                    }
-                
-            except Exception as e:
-                plate_info["ocr_result"] = {
-                    "success": False,
-                    "error": f"OCR processing error: {str(e)}"
-                }
-            
+            plate_image = None
+            # Out of time: not cropped, and read_plates() reports it as a detection without OCR
+            if image is not None and not deadline.skip("ocr"):
+                with timer.stage("crop"):
+                    plate_image = extract_license_plate_image(image, detection["bbox"])
+                if plate_image is not None and keep_plate_images and not deadline.skip("store"):
+                    with timer.stage("store"):
+                        plate_info["extracted_image_path"] = str(
+                            get_store().put_image(plate_image, "plate"))
             processed_plates.append(plate_info)
+            plate_images.append(plate_image)
+        
+        # All crops are read together (one batched pass for the CRNN method)
+        readings = read_plates(plate_images, ocr_method, timer, deadline, quality_gate)
+        for plate_info, (ocr_result, quality) in zip(processed_plates, readings):
+            plate_info["ocr_result"] = ocr_result
+            if quality is not None:
+                plate_info["quality"] = quality
         
         # Compile results
         successful_ocr = [p for p in processed_plates if p["ocr_result"] and p["ocr_result"]["success"]]
@@ -105,10 +122,21 @@ def process_license_plate_full(image_path, confidence_threshold=0.25, ocr_method
             "best_results": []
         }
         
-        # Add best results (highest confidence OCR)
+        skipped = [p for p in processed_plates if (p["ocr_result"] or {}).get("skipped")]
+        if skipped:
+            result["detection_summary"]["plates_skipped_low_quality"] = len(skipped)
+            # Nothing was read because of crop quality: a later frame should be tried
+            result["retry_next_frame"] = not successful_ocr
+        
+        out_of_time = [p for p in processed_plates if (p["ocr_result"] or {}).get("deadline_exceeded")]
+        if out_of_time:
+            result["detection_summary"]["plates_skipped_deadline"] = len(out_of_time)
+        
+        # Add best results (valid plate format first, then highest confidence OCR)
         if successful_ocr:
             best_plates = sorted(successful_ocr, 
-                                key=lambda x: x["ocr_result"].get("confidence", 0), 
+                                key=lambda x: (x["ocr_result"].get("format_valid", False),
+                                               x["ocr_result"].get("confidence", 0)), 
                                 reverse=True)
             
             for plate in best_plates:
@@ -116,9 +144,12 @@ def process_license_plate_full(image_path, confidence_threshold=0.25, ocr_method
                     result["best_results"].append({
                         "plate_id": plate["plate_id"],
                         "license_plate_text": plate["ocr_result"]["license_plate_text"],
+                        "raw_text": plate["ocr_result"].get("raw_text"),
+                        "format_valid": plate["ocr_result"].get("format_valid", False),
                         "detection_confidence": plate["detection"]["confidence"],
                         "ocr_confidence": plate["ocr_result"]["confidence"],
-                        "bbox": plate["detection"]["bbox"]
+                        "bbox": plate["detection"]["bbox"],
+                        "quality_score": (plate.get("quality") or {}).get("score")
                     })
         
         return result
@@ -140,41 +171,24 @@ def save_annotated_result(image_path, result, output_path):
     """
     try:
         # Load original image
-        image = cv2.imread(image_path)
+        image = load_image(image_path)
         if image is None:
             return False
         
         # Draw detections and OCR results
+        annotations = []
         for plate in result.get("processed_plates", []):
-            detection = plate["detection"]
-            bbox = detection["bbox"]
-            ocr_result = plate.get("ocr_result", {})
+            ocr_result = plate.get("ocr_result") or {}
             
             # Color based on OCR success
             if ocr_result.get("success", False) and ocr_result.get("license_plate_text"):
-                color = (0, 255, 0)  # Green for successful OCR
+                color = GREEN  # Green for successful OCR
                 label = f"Plate {plate['plate_id']}: {ocr_result['license_plate_text']}"
             else:
-                color = (0, 255, 255)  # Yellow for detection only
+                color = YELLOW  # Yellow for detection only
                 label = f"Plate {plate['plate_id']}: Detection Only"
-            
-            # Draw rectangle
-            cv2.rectangle(image, 
-                         (bbox["x1"], bbox["y1"]), 
-                         (bbox["x2"], bbox["y2"]), 
-                         color, 2)
-            
-            # Draw label background
-            label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
-            cv2.rectangle(image,
-                         (bbox["x1"], bbox["y1"] - label_size[1] - 10),
-                         (bbox["x1"] + label_size[0], bbox["y1"]),
-                         color, -1)
-            
-            # Draw label text
-            cv2.putText(image, label,
-                       (bbox["x1"], bbox["y1"] - 5),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+            annotations.append((plate["detection"]["bbox"], label, color))
+        image = render_annotations(image, annotations, font_scale=0.6, copy=False)
         
         # Save annotated image
         cv2.imwrite(output_path, image)
@@ -184,37 +198,55 @@ def save_annotated_result(image_path, result, output_path):
         print(f"Error saving annotated image: {e}")
         return False
 
-def main():
-    """Main function for CLI usage"""
-    if len(sys.argv) < 2:
-        write_result({
+def run_cli(args, profile_modes):
+    """Result for one set of CLI arguments (also used per request by --serve)"""
+    try:
+        args, deadline_ms = parse_deadline_args(args)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    # Started here so the annotated image write is covered by the same budget
+    deadline = resolve_deadline(deadline_ms)
+    keep_plate_images = "--keep-plates" in args
+    if keep_plate_images:
+        args.remove("--keep-plates")
+    if len(args) < 1:
+        return {
             "success": False, 
-            "error": "Usage: python license_plate_full_service.py <image_path> [confidence_threshold] [ocr_method] [output_path]"
-        })
-        return 1
+            "error": "Usage: python license_plate_full_service.py <image_path> [confidence_threshold] [ocr_method] [output_path] [--keep-plates] [--deadline-ms=N] [--profile[=modes]] | --serve"
+        }
     
-    image_path = sys.argv[1]
-    confidence_threshold = float(sys.argv[2]) if len(sys.argv) > 2 else 0.25
-    ocr_method = sys.argv[3] if len(sys.argv) > 3 else "auto"
-    output_path = sys.argv[4] if len(sys.argv) > 4 else None
+    image_path = args[0]
+    confidence_threshold = float(args[1]) if len(args) > 1 else 0.25
+    ocr_method = args[2] if len(args) > 2 else "auto"
+    output_path = args[3] if len(args) > 3 else None
     
     try:
         # Process license plate
-        result = process_license_plate_full(image_path, confidence_threshold, ocr_method)
+        result = run_with_profile(profile_modes, image_path, process_license_plate_full,
+                                  image_path, confidence_threshold, ocr_method,
+                                  keep_plate_images=keep_plate_images, deadline=deadline)
         
         # Save annotated image if requested
-        if output_path and result["success"]:
+        if output_path and result["success"] and not deadline.skip("write"):
             if save_annotated_result(image_path, result, output_path):
                 result["annotated_image_saved"] = output_path
             else:
                 result["annotation_error"] = "Failed to save annotated image"
         
-        write_result(result)
-        return 0 if result["success"] else 1
+        return deadline.annotate(result)
         
     except Exception as e:
-        write_result({"success": False, "error": str(e)})
-        return 1
+        return {"success": False, "error": str(e)}
+
+def main():
+    """Main function for CLI usage"""
+    args, profile_modes = parse_profile_args(sys.argv[1:])
+    if args[:1] == ["--serve"]:
+        # One JSON argument list per stdin line, one result written per request
+        return serve_requests(lambda request: run_cli(request, profile_modes), write_result)
+    result = run_cli(args, profile_modes)
+    write_result(result)
+    return 0 if result["success"] else 1
 
 if __name__ == "__main__":
     sys.exit(main())
\ No newline at end of file
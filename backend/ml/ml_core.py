@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+ML Core Helpers
+Shared by every backend/ml entry point: result emission, image loading,
+vectorized bounding-box arithmetic and the annotation renderer, so an
+improvement to any of them reaches all scripts at once.
+
+Boxes are (N, 4) float arrays of x1, y1, x2, y2 in pixels; as_boxes()
+converts the dict ({"x1": ...}) and list forms used in the JSON results.
+
+Detection passes decode JPEGs at a reduced DCT scale (load_image_reduced):
+a 12 MP upload is decoded at 1/4 size for a 640 px model, and boxes are
+mapped back to full-resolution coordinates with scale_boxes(). Full pixels
+are only decoded when plate regions are cropped for OCR.
+"""
+
+import io
+import os
+import sys
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from result_protocol import emit_result
+
+# BGR colors used by the annotation renderer
+GREEN = (0, 255, 0)
+YELLOW = (0, 255, 255)
+RED = (0, 0, 255)
+WHITE = (255, 255, 255)
+
+# Long side the detection models work at; reduced decoding never goes below it.
+# ML_DECODE_SIZE=0 always decodes at full resolution.
+DECODE_SIZE_ENV_VAR = "ML_DECODE_SIZE"
+DEFAULT_DECODE_SIZE = 640
+REDUCED_COLOR_FLAGS = {8: cv2.IMREAD_REDUCED_COLOR_8, 4: cv2.IMREAD_REDUCED_COLOR_4,
+                       2: cv2.IMREAD_REDUCED_COLOR_2}
+
+def write_result(result, indent=None):
+    """Write the result in the configured output format (see result_protocol.py)"""
+    emit_result(result, indent=indent)
+
+def load_image(source, flags=cv2.IMREAD_COLOR):
+    """
+    Decode an image from a path, encoded bytes or an already decoded array
+
+    Args:
+        source (str | Path | bytes | numpy.ndarray): Image to load
+        flags (int): cv2.IMREAD_* flags for paths and bytes
+
+    Returns:
+        numpy.ndarray or None: BGR image, None when it cannot be decoded
+    """
+    if isinstance(source, np.ndarray):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        buffer = np.frombuffer(source, dtype=np.uint8)
+        return cv2.imdecode(buffer, flags) if buffer.size else None
+    return cv2.imread(str(source), flags)
+
+def decode_size():
+    try:
+        return int(os.environ.get(DECODE_SIZE_ENV_VAR, DEFAULT_DECODE_SIZE))
+    except ValueError:
+        return DEFAULT_DECODE_SIZE
+
+def jpeg_size(source):
+    """(width, height) from a JPEG header without decoding pixels; None for other formats"""
+    from PIL import Image
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    elif not isinstance(source, (str, os.PathLike)):
+        return None
+    try:
+        with Image.open(source) as img:
+            return img.size if img.format == "JPEG" else None
+    except Exception:
+        return None
+
+def load_image_reduced(source, target_size=None):
+    """
+    Decode an image for a detection pass at the smallest JPEG DCT scale
+    (1/2, 1/4 or 1/8) whose long side still covers `target_size`
+
+    libjpeg scales during the inverse DCT, so both decode time and memory
+    drop with the factor; the model's own resize then starts from a frame
+    that is already close to its input size. Non-JPEG sources, and frames
+    too small to reduce, are decoded at full resolution.
+
+    Args:
+        source (str | Path | bytes | numpy.ndarray): Image to load
+        target_size (int): Minimum long side (default: ML_DECODE_SIZE, 640)
+
+    Returns:
+        tuple: (image, (scale_x, scale_y), (full_width, full_height)); the
+            scales map coordinates on `image` to the full-resolution frame.
+            image is None when it cannot be decoded.
+    """
+    target_size = decode_size() if target_size is None else target_size
+    factor = 1
+    header_size = jpeg_size(source) if target_size > 0 else None
+    if header_size:
+        long_side = max(header_size)
+        factor = next((f for f in REDUCED_COLOR_FLAGS if long_side // f >= target_size), 1)
+
+    image = load_image(source, REDUCED_COLOR_FLAGS[factor] if factor > 1 else cv2.IMREAD_COLOR)
+    if image is None:
+        return None, (1.0, 1.0), (0, 0)
+    height, width = image.shape[:2]
+    if factor == 1:
+        return image, (1.0, 1.0), (width, height)
+
+    full_width, full_height = header_size
+    if (width > height) != (full_width > full_height):
+        # EXIF orientation was applied while decoding
+        full_width, full_height = full_height, full_width
+    return image, (full_width / width, full_height / height), (full_width, full_height)
+
+def as_boxes(boxes):
+    """(N, 4) float array from bbox dicts, [x1, y1, x2, y2] lists or an array"""
+    if isinstance(boxes, dict):
+        boxes = [boxes]
+    rows = [(b["x1"], b["y1"], b["x2"], b["y2"]) if isinstance(b, dict) else b for b in boxes]
+    return np.asarray(rows, dtype=np.float64).reshape(-1, 4)
+
+def clamp_boxes(boxes, width, height):
+    """Clip boxes to the image; corners stay inside [0, width] x [0, height]"""
+    boxes = as_boxes(boxes).copy()
+    np.clip(boxes[:, 0::2], 0, width, out=boxes[:, 0::2])
+    np.clip(boxes[:, 1::2], 0, height, out=boxes[:, 1::2])
+    return boxes
+
+def pad_boxes(boxes, padding, width, height):
+    """Grow boxes by `padding` pixels on every side, clipped to the image"""
+    boxes = as_boxes(boxes) + np.array([-padding, -padding, padding, padding], dtype=np.float64)
+    return clamp_boxes(boxes, width, height)
+
+def scale_boxes(boxes, scale_x, scale_y=None):
+    """Scale box coordinates, e.g. from a downscaled frame back to full size"""
+    scale_y = scale_x if scale_y is None else scale_y
+    return as_boxes(boxes) * np.array([scale_x, scale_y, scale_x, scale_y], dtype=np.float64)
+
+def box_areas(boxes):
+    boxes = as_boxes(boxes)
+    return np.clip(boxes[:, 2] - boxes[:, 0], 0, None) * np.clip(boxes[:, 3] - boxes[:, 1], 0, None)
+
+def crop_boxes(image, boxes, padding=0):
+    """
+    Views of `image` inside each box (padded and clipped), no pixel copies
+
+    Returns:
+        list: One numpy.ndarray per box; empty arrays for degenerate boxes
+    """
+    height, width = image.shape[:2]
+    boxes = pad_boxes(boxes, padding, width, height) if padding else clamp_boxes(boxes, width, height)
+    crops = []
+    for x1, y1, x2, y2 in boxes.astype(np.int64):
+        crops.append(image[y1:y2, x1:x2])
+    return crops
+
+def confidence_color(confidence):
+    """Green for high confidence, yellow for medium, red for low"""
+    if confidence > 0.7:
+        return GREEN
+    if confidence > 0.5:
+        return YELLOW
+    return RED
+
+def render_annotations(image, annotations, font_scale=0.5, thickness=2, label_background=True,
+                       copy=True):
+    """
+    Draw labelled boxes on an image
+
+    Args:
+        image (numpy.ndarray): BGR frame
+        annotations (list): (bbox, label, color) tuples; bbox in any as_boxes() form
+        font_scale (float): Label font scale
+        thickness (int): Box and text line thickness
+        label_background (bool): Fill a box-colored band behind white label text;
+            otherwise the label is drawn in the box color
+        copy (bool): Draw on a copy instead of the given frame
+
+    Returns:
+        numpy.ndarray: The annotated frame
+    """
+    canvas = image.copy() if copy else image
+    for bbox, label, color in annotations:
+        x1, y1, x2, y2 = (int(v) for v in as_boxes(bbox)[0])
+        cv2.rectangle(canvas, (x1, y1), (x2, y2), color, thickness)
+        if not label:
+            continue
+        if label_background:
+            label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)[0]
+            cv2.rectangle(canvas, (x1, y1 - label_size[1] - 10), (x1 + label_size[0], y1), color, -1)
+            cv2.putText(canvas, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, font_scale, WHITE, thickness)
+        else:
+            cv2.putText(canvas, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, font_scale, color, thickness)
+    return canvas
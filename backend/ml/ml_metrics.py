@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Inference Metrics Registry
+Counters, gauges and histograms updated by the detection and OCR functions,
+rendered in the Prometheus text exposition format.
+
+Long-lived workers (the scripts' --serve mode) listen on ML_METRICS_PORT via
+start_worker_http_server() and are scraped directly; importing this module
+never opens a port, so one-shot scripts and their subprocesses can share it.
+The Node routes start the one-shot CLI scripts with ML_METRICS_FILE set
+(backend/utils/mlMetrics.js, default backend/temp/ml_metrics.prom); each
+process merges its samples into that file on exit, and
+`python ml/ml_metrics.py --serve 9108` exposes the accumulated file to Prometheus.
+"""
+
+import os
+import sys
+import json
+import atexit
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import fcntl
+except ImportError:  # Windows: merge without an advisory lock
+    fcntl = None
+
+METRICS_FILE_ENV_VAR = "ML_METRICS_FILE"
+METRICS_PORT_ENV_VAR = "ML_METRICS_PORT"
+
+# Latency buckets in seconds, covering CPU-only gate PCs up to the 60 s route timeout
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20)
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in pairs
+    )
+    return "{" + body + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class Counter:
+    """Monotonically increasing value per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in items]
+
+    def state(self):
+        with self._lock:
+            return [[list(map(list, key)), value] for key, value in self._values.items()]
+
+    def merge_state(self, state):
+        with self._lock:
+            for key, value in state:
+                key = tuple(tuple(pair) for pair in key)
+                self._values[key] = self._values.get(key, 0.0) + value
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+class Gauge(Counter):
+    """Value that can go up and down; not accumulated across processes"""
+
+    kind = "gauge"
+
+    def dec(self, amount=1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = float(value)
+
+    def state(self):
+        return []
+
+    def merge_state(self, state):
+        pass
+
+    def reset(self):
+        pass  # live values, never persisted
+
+class Histogram:
+    """Cumulative bucket counts plus sum and count per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _get_series(self, key):
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+        return series
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._get_series(key)
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = []
+        with self._lock:
+            items = sorted((key, dict(series, buckets=list(series["buckets"])))
+                           for key, series in self._series.items())
+        for key, series in items:
+            for upper, count in zip(self.buckets, series["buckets"]):
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', _format_value(upper))])} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {series['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+    def state(self):
+        with self._lock:
+            return [[list(map(list, key)), series] for key, series in self._series.items()]
+
+    def merge_state(self, state):
+        with self._lock:
+            for key, other in state:
+                if len(other["buckets"]) != len(self.buckets):
+                    continue  # bucket layout changed between versions
+                series = self._get_series(tuple(tuple(pair) for pair in key))
+                series["buckets"] = [a + b for a, b in zip(series["buckets"], other["buckets"])]
+                series["sum"] += other["sum"]
+                series["count"] += other["count"]
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+class MetricsRegistry:
+    """Named collection of metrics that renders as one exposition document"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text):
+        return self.register(Counter(name, help_text))
+
+    def gauge(self, name, help_text):
+        return self.register(Gauge(name, help_text))
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help_text, buckets))
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def state(self):
+        return {name: metric.state() for name, metric in self._metrics.items()}
+
+    def merge_state(self, state):
+        for name, metric_state in state.items():
+            if name in self._metrics:
+                self._metrics[name].merge_state(metric_state)
+
+    def reset(self):
+        """Drop persisted samples (gauges keep their live values)"""
+        for metric in self._metrics.values():
+            metric.reset()
+
+REGISTRY = MetricsRegistry()
+
+REQUESTS_TOTAL = REGISTRY.counter(
+    "ml_requests_total", "Entry point calls by operation and outcome")
+IN_FLIGHT = REGISTRY.gauge(
+    "ml_requests_in_flight", "Calls currently being processed (queue depth) by operation")
+REQUEST_SECONDS = REGISTRY.histogram(
+    "ml_request_seconds", "End-to-end entry point latency")
+INFERENCE_SECONDS = REGISTRY.histogram(
+    "ml_inference_seconds", "Model forward pass latency by model")
+MODEL_CACHE_TOTAL = REGISTRY.counter(
+    "ml_model_cache_requests_total", "Model loads served from the in-process cache (hit) or disk (miss)")
+OCR_REQUESTS_TOTAL = REGISTRY.counter(
+    "ml_ocr_requests_total", "OCR attempts by requested method and outcome")
+OCR_FALLBACK_TOTAL = REGISTRY.counter(
+    "ml_ocr_fallback_total", "Detected plates that fell back to detection-only output")
+DETECTIONS_PER_IMAGE = REGISTRY.histogram(
+    "ml_detections_per_image", "Objects returned per image", COUNT_BUCKETS)
+
+@contextmanager
+def track_in_flight(operation):
+    """Count a call as in flight for the duration of the block"""
+    IN_FLIGHT.inc(operation=operation)
+    try:
+        yield
+    finally:
+        IN_FLIGHT.dec(operation=operation)
+
+def record_call(operation, result, timer, model=None, detection_count=None):
+    """
+    Update request, latency and detection metrics for one finished call
+
+    Args:
+        operation (str): Entry point name
+        result (dict): Result returned by the entry point
+        timer (StageTimer): Timer used during the call
+        model (str): Model label for the inference histogram
+        detection_count (int): Number of objects returned, if applicable
+    """
+    status = "success" if isinstance(result, dict) and result.get("success") else "error"
+    REQUESTS_TOTAL.inc(operation=operation, status=status)
+    REQUEST_SECONDS.observe(timer.elapsed_ms() / 1000.0, operation=operation)
+    if model and "inference" in timer.stages:
+        INFERENCE_SECONDS.observe(timer.stages["inference"] / 1000.0, model=model)
+    if detection_count is not None:
+        DETECTIONS_PER_IMAGE.observe(detection_count, operation=operation)
+
+def record_model_cache(model, hit):
+    """Count a model lookup as a cache hit or miss"""
+    MODEL_CACHE_TOTAL.inc(model=model, result="hit" if hit else "miss")
+
+def record_ocr(ocr_method, ocr_result):
+    """Count one OCR attempt and whether it fell back to detection-only"""
+    if ocr_result and ocr_result.get("skipped"):
+        # The quality gate skipped OCR (see frame_quality.py)
+        OCR_FALLBACK_TOTAL.inc(reason="low_quality")
+        return
+    if ocr_result and ocr_result.get("deadline_exceeded"):
+        # The request's deadline passed before OCR (see deadline.py)
+        OCR_FALLBACK_TOTAL.inc(reason="deadline")
+        return
+    success = bool(ocr_result and ocr_result.get("success"))
+    OCR_REQUESTS_TOTAL.inc(method=ocr_method, status="success" if success else "error")
+    if not success:
+        OCR_FALLBACK_TOTAL.inc(reason="ocr_failed")
+    elif not ocr_result.get("license_plate_text"):
+        OCR_FALLBACK_TOTAL.inc(reason="no_text")
+
+@contextmanager
+def _locked(path):
+    lock_file = open(f"{path}.lock", "a")
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+    finally:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+def _state_path(path):
+    return f"{path}.state.json"
+
+def _load_state(path):
+    try:
+        with open(_state_path(path), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _file_registry(path):
+    registry = MetricsRegistry()
+    for metric in REGISTRY._metrics.values():
+        if isinstance(metric, Histogram):
+            registry.register(Histogram(metric.name, metric.help_text, metric.buckets))
+        else:
+            registry.register(metric.__class__(metric.name, metric.help_text))
+    registry.merge_state(_load_state(path))
+    return registry
+
+def dump_to_file(path, registry=REGISTRY):
+    """
+    Merge this process's samples into `path` (text) and its JSON state sidecar
+
+    Counters and histograms accumulate across CLI invocations; gauges only
+    describe the current process and are not persisted. Dumped samples are
+    cleared from `registry` so a second dump does not count them twice.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with _locked(path):
+        merged = _file_registry(path)
+        merged.merge_state(registry.state())
+
+        for target, content in ((_state_path(path), json.dumps(merged.state())),
+                                (path, merged.render())):
+            tmp_path = f"{target}.tmp{os.getpid()}"
+            with open(tmp_path, 'w') as f:
+                f.write(content)
+            os.replace(tmp_path, target)
+        registry.reset()
+
+def start_http_server(port, addr="", metrics_file=None):
+    """
+    Serve /metrics from a daemon thread
+
+    Args:
+        port (int): TCP port to listen on
+        addr (str): Bind address
+        metrics_file (str): Serve the accumulated CLI-mode file instead of
+            this process's registry
+
+    Returns:
+        ThreadingHTTPServer: The running server
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            registry = _file_registry(metrics_file) if metrics_file else REGISTRY
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((addr, int(port)), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+def start_worker_http_server():
+    """start_http_server() on ML_METRICS_PORT for a long-lived worker; None when it is unset"""
+    port = os.environ.get(METRICS_PORT_ENV_VAR)
+    return start_http_server(int(port)) if port else None
+
+if os.environ.get(METRICS_FILE_ENV_VAR):
+    atexit.register(dump_to_file, os.environ[METRICS_FILE_ENV_VAR])
+
+def main():
+    """Serve or print the metrics accumulated in ML_METRICS_FILE"""
+    metrics_file = os.environ.get(METRICS_FILE_ENV_VAR)
+    if len(sys.argv) >= 3 and sys.argv[1] == "--serve":
+        if not metrics_file:
+            print(f"{METRICS_FILE_ENV_VAR} must point at the metrics file written by the CLI scripts")
+            return 1
+        server = start_http_server(int(sys.argv[2]), metrics_file=metrics_file)
+        print(f"Serving {metrics_file} on :{server.server_address[1]}/metrics")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+        return 0
+
+    registry = _file_registry(metrics_file) if metrics_file else REGISTRY
+    sys.stdout.write(registry.render())
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
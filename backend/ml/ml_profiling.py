@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Profiling Hooks for the ML Entry Points
+Runs a detection call under cProfile, a sampling profiler and/or tracemalloc
+without editing the scripts.
+
+Enable with `--profile` (cProfile), `--profile=sample`, `--profile=tracemalloc`,
+`--profile=all` or a comma list, or set ML_PROFILE to the same values. Output
+files are written next to the input image (or into ML_PROFILE_DIR):
+
+    <image>.<operation>.prof      cProfile stats (snakeviz, flameprof, pstats)
+    <image>.<operation>.folded    collapsed stacks (flamegraph.pl, speedscope)
+
+A `profile` block listing the files, and with tracemalloc the peak
+allocation per stage, is added to the result.
+"""
+
+import os
+import sys
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from collections import Counter
+
+from stage_timer import reset_traced_peak, traced_peak_kb
+
+PROFILE_ENV_VAR = "ML_PROFILE"
+PROFILE_DIR_ENV_VAR = "ML_PROFILE_DIR"
+PROFILE_MODES = ("cprofile", "sample", "tracemalloc")
+
+def _parse_modes(value):
+    """Turn 'cprofile,sample' / 'all' / '1' into a set of modes"""
+    modes = set()
+    for mode in (value or "").lower().split(","):
+        mode = mode.strip()
+        if not mode or mode in ("0", "false", "no"):
+            continue
+        if mode == "all":
+            modes.update(PROFILE_MODES)
+        elif mode in ("1", "true", "yes"):
+            modes.add("cprofile")
+        elif mode in PROFILE_MODES:
+            modes.add(mode)
+        else:
+            print(f"Warning: unknown profile mode '{mode}' (expected {', '.join(PROFILE_MODES)})",
+                  file=sys.stderr)
+    return modes
+
+def parse_profile_args(argv):
+    """
+    Strip `--profile[=modes]` from CLI arguments
+
+    The resolved modes are exported through ML_PROFILE so helper processes
+    (e.g. the detection subprocess of detect_and_crop_service) are profiled too.
+
+    Args:
+        argv (list): Arguments without the script name
+
+    Returns:
+        tuple: (remaining positional arguments, set of profile modes)
+    """
+    modes = _parse_modes(os.environ.get(PROFILE_ENV_VAR))
+    remaining = []
+    for arg in argv:
+        if arg == "--profile":
+            modes = {"cprofile"}
+        elif arg.startswith("--profile="):
+            modes = _parse_modes(arg.split("=", 1)[1])
+        else:
+            remaining.append(arg)
+    if modes:
+        os.environ[PROFILE_ENV_VAR] = ",".join(sorted(modes))
+    return remaining, modes
+
+class SamplingProfiler:
+    """
+    Low-overhead wall-clock sampler for the calling thread
+
+    Stacks are captured every `interval` seconds from a background thread
+    and aggregated in collapsed ("folded") format.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self._target_id = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._target_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def write_folded(self, output_path):
+        with open(output_path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+def profile_output_base(anchor_path, operation):
+    """Path prefix for profile files belonging to `anchor_path`"""
+    output_dir = os.environ.get(PROFILE_DIR_ENV_VAR) or os.path.dirname(os.path.abspath(anchor_path))
+    os.makedirs(output_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(anchor_path))[0] or "profile"
+    return os.path.join(output_dir, f"{stem}.{operation}")
+
+def run_with_profile(modes, anchor_path, func, *args, **kwargs):
+    """
+    Call `func(*args, **kwargs)` under the requested profilers
+
+    Args:
+        modes (set): Profile modes from parse_profile_args (empty = plain call)
+        anchor_path (str): Input path the profile files are written next to
+        func (callable): Entry point returning a result dict
+
+    Returns:
+        dict: The entry point result, with a `profile` block when profiling
+    """
+    if not modes:
+        return func(*args, **kwargs)
+
+    operation = func.__name__
+    output_base = profile_output_base(anchor_path, operation)
+    report = {"modes": sorted(modes), "files": {}}
+
+    profiler = cProfile.Profile() if "cprofile" in modes else None
+    sampler = SamplingProfiler() if "sample" in modes else None
+    if "tracemalloc" in modes:
+        tracemalloc.start()
+        reset_traced_peak()
+    if sampler:
+        sampler.start()
+
+    start = time.perf_counter()
+    try:
+        if profiler:
+            result = profiler.runcall(func, *args, **kwargs)
+        else:
+            result = func(*args, **kwargs)
+    finally:
+        report["wall_ms"] = round((time.perf_counter() - start) * 1000.0, 3)
+        if sampler:
+            sampler.stop()
+        if tracemalloc.is_tracing():
+            report["peak_memory_kb"] = round(traced_peak_kb(), 1)
+            tracemalloc.stop()
+
+    if profiler:
+        prof_path = f"{output_base}.prof"
+        profiler.dump_stats(prof_path)
+        report["files"]["cprofile"] = prof_path
+        # Top functions to stderr; stdout is reserved for the result markers
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(25)
+    if sampler:
+        folded_path = f"{output_base}.folded"
+        sampler.write_folded(folded_path)
+        report["files"]["sample"] = folded_path
+        report["samples"] = sum(sampler.samples.values())
+
+    if isinstance(result, dict):
+        if "memory_peak_kb" in result:
+            report["stage_peak_memory_kb"] = result.pop("memory_peak_kb")
+        result["profile"] = report
+    return result
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+OCR Preprocessing
+Turns plate crops of any size into small, uniform OCR inputs: scaled to a
+fixed height, deskewed with the minimum-area rectangle around the characters
+and, optionally, binarized with an adaptive threshold. batch_plates() packs
+several prepared crops into one padded array for engines that take batches.
+
+Settings (environment):
+    ML_OCR_PREPROCESS  off (default: crops go to the existing OCR engines
+                       unchanged) | normalize (height + deskew, color kept)
+                       | binarize (normalize, then grayscale adaptive threshold)
+                       The CRNN recognizer always uses normalize, its input format.
+    ML_OCR_HEIGHT      target crop height in pixels (default 64)
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+MODE_ENV_VAR = "ML_OCR_PREPROCESS"
+HEIGHT_ENV_VAR = "ML_OCR_HEIGHT"
+PREPROCESS_MODES = ("off", "normalize", "binarize")
+DEFAULT_HEIGHT = 64
+
+# Angles outside this range come from noise (or a misdetected box), not plate tilt
+MIN_SKEW_DEGREES = 0.5
+MAX_SKEW_DEGREES = 15.0
+BINARIZE_BLOCK_SIZE = 25
+BINARIZE_OFFSET = 10
+
+def preprocess_mode(mode=None):
+    """Preprocessing mode from the argument or ML_OCR_PREPROCESS ('off' when unset or unknown)"""
+    mode = (mode or os.environ.get(MODE_ENV_VAR, "off")).strip().lower()
+    return mode if mode in PREPROCESS_MODES else "off"
+
+def target_height():
+    try:
+        return max(8, int(os.environ.get(HEIGHT_ENV_VAR, DEFAULT_HEIGHT)))
+    except ValueError:
+        return DEFAULT_HEIGHT
+
+def normalize_height(image, height=None):
+    """Resize to `height` keeping the aspect ratio (area averaging when shrinking)"""
+    height = height or target_height()
+    h, w = image.shape[:2]
+    if h == height:
+        return image
+    width = max(1, round(w * height / h))
+    interpolation = cv2.INTER_AREA if h > height else cv2.INTER_LINEAR
+    return cv2.resize(image, (width, height), interpolation=interpolation)
+
+def skew_angle(gray):
+    """
+    Text line tilt in degrees from the minimum-area rectangle around the
+    dark (character) pixels; 0 when no reliable angle is found
+    """
+    _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    points = cv2.findNonZero(mask)
+    if points is None or len(points) < 10:
+        return 0.0
+    angle = cv2.minAreaRect(points)[2]
+    # The reported angle range differs between OpenCV versions and the
+    # rectangle's width may be its short side; the tilt is the angle modulo 90
+    angle = (angle + 45) % 90 - 45
+    if not MIN_SKEW_DEGREES <= abs(angle) <= MAX_SKEW_DEGREES:
+        return 0.0
+    return float(angle)
+
+def deskew(image, gray=None):
+    """Rotate a crop so its text line is horizontal; returns (image, angle)"""
+    gray = gray if gray is not None else _gray(image)
+    angle = skew_angle(gray)
+    if angle == 0.0:
+        return image, 0.0
+    h, w = image.shape[:2]
+    matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    rotated = cv2.warpAffine(image, matrix, (w, h), flags=cv2.INTER_LINEAR,
+                             borderMode=cv2.BORDER_REPLICATE)
+    return rotated, angle
+
+def binarize(gray):
+    """Adaptive (local mean) threshold: dark characters on white, robust to uneven light"""
+    return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY,
+                                 BINARIZE_BLOCK_SIZE, BINARIZE_OFFSET)
+
+def _gray(image):
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+def preprocess_plate(crop, mode=None, height=None):
+    """
+    Prepare one plate crop for OCR
+
+    Args:
+        crop (numpy.ndarray): BGR plate crop
+        mode (str): 'off', 'normalize' or 'binarize' (default: ML_OCR_PREPROCESS)
+        height (int): Target height (default: ML_OCR_HEIGHT)
+
+    Returns:
+        numpy.ndarray: BGR crop ('off', 'normalize') or single-channel binary image ('binarize')
+    """
+    mode = preprocess_mode(mode)
+    if mode == "off" or crop is None or crop.size == 0:
+        return crop
+    # Resize first: deskew and thresholding then work on the small image
+    image = normalize_height(crop, height)
+    gray = _gray(image)
+    image, _ = deskew(image, gray)
+    if mode == "binarize":
+        return binarize(_gray(image))
+    return image
+
+def batch_plates(images, pad_value=255):
+    """
+    Pack prepared crops of equal height into one right-padded array
+
+    Args:
+        images (list): Crops from preprocess_plate() with the same mode and height
+        pad_value (int): Fill for the padding (white background)
+
+    Returns:
+        tuple: (array of shape (N, H, W_max[, C]), widths of the crops)
+    """
+    if not images:
+        return np.zeros((0, target_height(), 0), dtype=np.uint8), []
+    height = images[0].shape[0]
+    if any(image.shape[0] != height for image in images):
+        raise ValueError("batch_plates needs crops of equal height (use normalize_height)")
+    widths = [image.shape[1] for image in images]
+    batch = np.full((len(images), height, max(widths)) + images[0].shape[2:], pad_value,
+                    dtype=images[0].dtype)
+    for i, image in enumerate(images):
+        batch[i, :, :widths[i]] = image
+    return batch, widths
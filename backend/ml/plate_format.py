@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+License Plate Format
+Validates OCR text against the Indian registration grammar and corrects
+characters OCR engines confuse (O/0, I/1, B/8, S/5, ...) using the position
+they appear in: a '0' where the grammar expects a series letter becomes 'O',
+a 'B' in the 4-digit number becomes '8'.
+
+Formats:
+    standard  state code, 1-2 digit district, 0-3 series letters, 4-digit
+              number: MH12AB1234, DL3CAB1234, KA051234
+    bh        Bharat series: 2-digit year, BH, 4 digits, 1-2 letters: 22BH1234AA
+
+A text is only `valid` when it fits a format without an unissued series
+letter, and corrections are not trusted to make a truncated read valid:
+MH12AB123 reads literally as a plate with a short number, so turning its B
+into the missing digit (MH12A8123) does not make it a valid plate.
+"""
+
+import re
+
+STATE_CODES = [
+    "AP", "AR", "AS", "BR", "CG", "CH", "DL", "GA", "GJ", "HP", "HR", "JH", "JK", "KA",
+    "KL", "LA", "MH", "ML", "MN", "MP", "MZ", "NL", "OD", "PB", "PY", "RJ", "SK", "TN",
+    "TR", "TS", "UK", "UP", "WB"
+]
+_STATE_SET = frozenset(STATE_CODES)
+# I and O are not issued in series letters (they read as 1 and 0)
+SERIES_LETTERS = "ABCDEFGHJKLMNPQRSTUVWXYZ"
+
+# Corrections applied only where the grammar expects the other character class
+TO_LETTER = {"0": "O", "1": "I", "2": "Z", "4": "A", "5": "S", "6": "G", "7": "T", "8": "B"}
+TO_DIGIT = {"O": "0", "Q": "0", "D": "0", "U": "0", "I": "1", "L": "1", "J": "1", "Z": "2",
+            "A": "4", "S": "5", "G": "6", "T": "7", "B": "8"}
+
+_NON_ALNUM = re.compile(r"[^A-Z0-9]")
+# A standard plate whose number lost digits, read without any correction
+_SHORT_NUMBER = re.compile(r"[A-Z]{2}[0-9]{1,2}[" + SERIES_LETTERS + r"]{0,3}[0-9]{1,3}")
+
+def clean_plate_text(text):
+    """Uppercase alphanumerics only ('mh 12-ab 1234' -> 'MH12AB1234')"""
+    return _NON_ALNUM.sub("", (text or "").upper())
+
+def _layouts(length):
+    """
+    (format, character classes) candidates for a cleaned text of `length`,
+    most common layouts first; 'L' is a letter, 'S' a series letter and 'D' a digit
+    """
+    layouts = []
+    for district in (2, 1):
+        for series in (2, 1, 3, 0):
+            if 2 + district + series + 4 == length:
+                layouts.append(("standard", "LL" + "D" * district + "S" * series + "DDDD"))
+    if length in (9, 10):
+        layouts.append(("bh", "DDLLDDDD" + "L" * (length - 8)))
+    return layouts
+
+def _fit(text, classes):
+    """Text corrected to the character classes and the number of corrections (None if impossible)"""
+    corrected = []
+    corrections = 0
+    for char, expected in zip(text, classes):
+        is_digit = char.isdigit()
+        if (expected == "D") == is_digit:
+            corrected.append(char)
+            continue
+        swap = TO_DIGIT.get(char) if expected == "D" else TO_LETTER.get(char)
+        if swap is None:
+            return None, None
+        corrected.append(swap)
+        corrections += 1
+    return "".join(corrected), corrections
+
+def normalize_plate(text):
+    """
+    Validate and correct OCR text
+
+    The layout needing the fewest corrections wins, a series letter that is
+    never issued (I, O) counting as one; among equals the common layouts
+    (2-digit district, 2 series letters) are preferred. A best fit that
+    still has an unissued series letter, or that needed corrections although
+    the text reads literally as a plate with a short number, is corrected but
+    not `valid`.
+
+    Args:
+        text (str): Raw OCR text
+
+    Returns:
+        dict: `text` (corrected, or cleaned when no format fits), `raw`,
+            `valid`, `format` ('standard', 'bh' or None) and `corrections`
+    """
+    cleaned = clean_plate_text(text)
+    best = None
+    for rank, (plate_format, classes) in enumerate(_layouts(len(cleaned))):
+        corrected, corrections = _fit(cleaned, classes)
+        if corrected is None:
+            continue
+        if plate_format == "standard" and corrected[:2] not in _STATE_SET:
+            continue
+        if plate_format == "bh" and corrected[2:4] != "BH":
+            continue
+        unissued = sum(1 for char, expected in zip(corrected, classes)
+                       if expected == "S" and char not in SERIES_LETTERS)
+        if best is None or (corrections + unissued, rank) < best[0]:
+            best = ((corrections + unissued, rank), plate_format, corrected, corrections, unissued)
+    if best is None:
+        return {"text": cleaned, "raw": text, "valid": False, "format": None, "corrections": 0}
+    _, plate_format, corrected, corrections, unissued = best
+    truncated = corrections and _SHORT_NUMBER.fullmatch(cleaned)
+    return {"text": corrected, "raw": text, "valid": not unissued and not truncated,
+            "format": plate_format, "corrections": corrections}
+
+def apply_plate_format(ocr_result):
+    """
+    Replace the OCR text of a successful extract_license_plate_text() result
+    with its normalized form; the engine's text is kept as `raw_text`
+
+    Returns:
+        dict: The same result, updated in place
+    """
+    if not ocr_result or not ocr_result.get("success") or not ocr_result.get("license_plate_text"):
+        return ocr_result
+    normalized = normalize_plate(ocr_result["license_plate_text"])
+    ocr_result["raw_text"] = ocr_result["license_plate_text"]
+    ocr_result["license_plate_text"] = normalized["text"]
+    ocr_result["plate_format"] = normalized["format"]
+    ocr_result["format_valid"] = normalized["valid"]
+    if normalized["corrections"]:
+        ocr_result["format_corrections"] = normalized["corrections"]
+    return ocr_result
+
+def edit_distance(a, b, max_distance=None):
+    """
+    Levenshtein distance between two strings
+
+    Args:
+        a (str), b (str): Strings to compare
+        max_distance (int): Stop early once the distance must exceed this;
+            max_distance + 1 is returned then
+
+    Returns:
+        int: Number of insertions, deletions and substitutions
+    """
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    if max_distance is not None and len(a) - len(b) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (char_a != char_b)))
+        if max_distance is not None and min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
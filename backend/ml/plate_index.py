@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Active Plate Index
+In-memory fuzzy index over the plates of vehicles currently parked, so an
+exit read with one or two wrong characters still finds its entry record.
+
+Plates are normalized (plate_format.py) and filed under every string left
+after deleting up to two of their characters. A lookup lists the query's own
+deletion variants, so it only computes edit distances for the few plates
+sharing one, which keeps it well under a millisecond for a full lot. Entries
+and exits update the index in place.
+
+    cd backend
+    python ml/plate_index.py match MH12A81234 --plates=MH12AB1234,KA05MN4321
+    python ml/plate_index.py --serve
+
+With --serve each stdin line is one JSON command against a long-lived index:
+    ["enter", "MH12AB1234", "<record id>"]   add a parked plate
+    ["exit", "MH12AB1234"]                    remove it
+    ["load", "MH12AB1234", "KA05MN4321"]      replace the whole index
+    ["match", "MH12A81234", "2"]              best match within a distance
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from ml_core import write_result
+from plate_format import edit_distance, normalize_plate
+from result_protocol import serve_requests
+
+DEFAULT_MAX_DISTANCE = 2
+
+def deletion_variants(text, max_deletions):
+    """`text` with every combination of up to `max_deletions` characters removed"""
+    variants = {text}
+    frontier = {text}
+    for _ in range(max_deletions):
+        frontier = {variant[:i] + variant[i + 1:] for variant in frontier
+                    for i in range(len(variant))}
+        variants |= frontier
+    return variants
+
+class PlateIndex:
+    """
+    Deletion-neighbourhood index of normalized plate texts with a payload per plate
+
+    Two strings within k edits share a string reachable from both by at most
+    k deletions, so every plate is filed under all of its deletion variants
+    and a lookup only verifies the plates filed under the query's variants.
+    add() and remove() update the index in place.
+    """
+
+    def __init__(self, plates=None, max_distance=DEFAULT_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.load(plates or [])
+
+    def load(self, plates):
+        """Replace the index with `plates` (texts or (text, key) pairs)"""
+        self._keys = {}
+        self._variants = {}
+        for plate in plates:
+            if isinstance(plate, str):
+                self.add(plate)
+            else:
+                self.add(*plate)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, plate):
+        return normalize_plate(plate)["text"] in self._keys
+
+    def add(self, plate, key=None):
+        """Index a parked plate; `key` (e.g. the entry record id) is returned by match()"""
+        text = normalize_plate(plate)["text"]
+        if not text:
+            return None
+        if text not in self._keys:
+            for variant in deletion_variants(text, self.max_distance):
+                self._variants.setdefault(variant, set()).add(text)
+        self._keys[text] = key
+        return text
+
+    def remove(self, plate):
+        """Drop a plate on exit; True when it was indexed"""
+        text = normalize_plate(plate)["text"]
+        if text not in self._keys:
+            return False
+        del self._keys[text]
+        for variant in deletion_variants(text, self.max_distance):
+            plates = self._variants[variant]
+            plates.discard(text)
+            if not plates:
+                del self._variants[variant]
+        return True
+
+    def match(self, plate, max_distance=DEFAULT_MAX_DISTANCE):
+        """
+        Closest indexed plate
+
+        Args:
+            plate (str): OCR text (normalized before the lookup)
+            max_distance (int): Largest edit distance accepted (at most the
+                index's max_distance)
+
+        Returns:
+            dict: `plate`, `key`, `distance` and `ambiguous` (another plate is
+                as close), or None when nothing is within `max_distance`
+        """
+        text = normalize_plate(plate)["text"]
+        if text in self._keys:
+            return {"plate": text, "key": self._keys[text], "distance": 0, "ambiguous": False}
+        if not text:
+            return None
+        max_distance = min(max_distance, self.max_distance)
+
+        candidates = set()
+        for variant in deletion_variants(text, max_distance):
+            candidates.update(self._variants.get(variant, ()))
+        best, best_distance, ties = None, max_distance, 0
+        for candidate in sorted(candidates):
+            distance = edit_distance(text, candidate, best_distance)
+            if distance > best_distance:
+                continue
+            if best is not None and distance == best_distance:
+                ties += 1
+            else:
+                best, best_distance, ties = candidate, distance, 0
+        if best is None:
+            return None
+        return {"plate": best, "key": self._keys[best], "distance": best_distance,
+                "ambiguous": ties > 0}
+
+_index = PlateIndex()
+
+def run_command(args, index=None):
+    """Result of one index command (see the module docstring)"""
+    index = index if index is not None else _index
+    if not args:
+        return {"success": False, "error": "Usage: python plate_index.py <enter|exit|load|match> ... | --serve"}
+    command, values = args[0], args[1:]
+    if command == "enter":
+        if not values:
+            return {"success": False, "error": "enter needs a plate"}
+        plate = index.add(values[0], values[1] if len(values) > 1 else None)
+        return {"success": plate is not None, "plate": plate, "active_plates": len(index),
+                **({} if plate else {"error": "Empty plate text"})}
+    if command == "exit":
+        if not values:
+            return {"success": False, "error": "exit needs a plate"}
+        return {"success": True, "removed": index.remove(values[0]), "active_plates": len(index)}
+    if command == "load":
+        index.load(values)
+        return {"success": True, "active_plates": len(index)}
+    if command == "match":
+        if not values:
+            return {"success": False, "error": "match needs a plate"}
+        max_distance = int(values[1]) if len(values) > 1 else DEFAULT_MAX_DISTANCE
+        start = time.perf_counter()
+        match = index.match(values[0], max_distance)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        return {"success": True, "query": normalize_plate(values[0])["text"], "match": match,
+                "active_plates": len(index), "lookup_ms": round(elapsed_ms, 4)}
+    return {"success": False, "error": f"Unknown command: {command}"}
+
+def main():
+    """Main function for CLI usage"""
+    args = sys.argv[1:]
+    if args[:1] == ["--serve"]:
+        return serve_requests(run_command, write_result)
+    plates = [a for a in args if a.startswith("--plates=")]
+    for option in plates:
+        args.remove(option)
+        run_command(["load"] + [p for p in option.split("=", 1)[1].split(",") if p])
+    result = run_command(args)
+    write_result(result)
+    return 0 if result["success"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Plate Reading
+The per-plate OCR step shared by the services that read plate text
+(license_plate_full_service.py, vehicle_plate_service.py): the crop quality
+gate, OCR preprocessing, the OCR engine and plate-format correction, with
+every outcome recorded in the OCR metrics.
+
+The CRNN method reads all crops of a frame in one batched pass; the other
+engines read crop by crop.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from license_plate_ocr import extract_license_plate_text
+from ml_metrics import record_ocr
+from frame_quality import assess_crop, gate_mode, quality_thresholds, skipped_ocr_result
+from ocr_preprocess import preprocess_plate
+from plate_recognizer import OCR_METHOD as CRNN_METHOD, recognize_plates
+from plate_format import apply_plate_format
+from deadline import deadline_skipped_result
+
+def read_plates(crops, ocr_method, timer, deadline, quality_gate=None):
+    """
+    Read the text of several plate crops from one frame
+
+    Args:
+        crops (list): BGR plate crops; None where no crop could be extracted
+        ocr_method (str): OCR method to use
+        timer (StageTimer): Records the quality, ocr_preprocess and ocr stages
+        deadline (Deadline): Crops not read before it is spent get a
+            deadline_skipped_result()
+        quality_gate (str): 'off', 'report' or 'skip' (default: ML_QUALITY_GATE)
+
+    Returns:
+        list: (ocr_result, crop quality or None) per crop, results in the
+            extract_license_plate_text() format after apply_plate_format()
+    """
+    quality_gate = gate_mode(quality_gate)
+    thresholds = quality_thresholds()
+    readings = []
+    # Indices of crops read together in one batched CRNN pass after the loop
+    crnn_pending = []
+
+    for crop in crops:
+        quality = None
+        if deadline.skip("ocr"):
+            ocr_result = deadline_skipped_result("ocr")
+        elif crop is None:
+            ocr_result = {"success": False, "error": "Failed to extract license plate image"}
+        elif crop.size == 0:
+            ocr_result = {"success": False, "error": "Empty license plate crop"}
+        else:
+            if quality_gate != "off":
+                with timer.stage("quality"):
+                    quality = assess_crop(crop, thresholds)
+            if quality_gate == "skip" and not quality["passed"]:
+                ocr_result = skipped_ocr_result(quality)
+            elif ocr_method == CRNN_METHOD:
+                crnn_pending.append(len(readings))
+                ocr_result = None
+            else:
+                ocr_result = _read_crop(crop, ocr_method, timer)
+        readings.append([ocr_result, quality])
+
+    if crnn_pending:
+        try:
+            if deadline.skip("ocr"):
+                ocr_results = [deadline_skipped_result("ocr") for _ in crnn_pending]
+            else:
+                with timer.stage("ocr"):
+                    ocr_results = recognize_plates([crops[i] for i in crnn_pending], timer)
+        except Exception as e:
+            ocr_results = [{"success": False, "error": f"OCR processing error: {str(e)}"}
+                           for _ in crnn_pending]
+        for i, ocr_result in zip(crnn_pending, ocr_results):
+            readings[i][0] = ocr_result
+
+    for reading in readings:
+        record_ocr(ocr_method, reading[0])
+        apply_plate_format(reading[0])
+    return [tuple(reading) for reading in readings]
+
+def _read_crop(crop, ocr_method, timer):
+    """OCR of one crop with a per-crop engine (preprocessed only when ML_OCR_PREPROCESS is set)"""
+    try:
+        with timer.stage("ocr_preprocess"):
+            ocr_input = preprocess_plate(crop)
+        with timer.stage("ocr"):
+            return extract_license_plate_text(ocr_input, ocr_method)
+    except Exception as e:
+        return {"success": False, "error": f"OCR processing error: {str(e)}"}
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+CRNN License Plate Recognizer
+Small CNN + BiGRU model trained with CTC on the fixed alphabet of Indian
+number plates, exported to ONNX and run on CPU with onnxruntime. Selected
+with ocr_method "crnn" in the plate services; every plate of a frame goes
+through one batched forward pass.
+
+Train and export the model with ml/train_plate_recognizer.py. The model
+takes (N, 1, 32, W) float input (grayscale, scaled to [-1, 1]) and returns
+(N, W/4, len(ALPHABET) + 1) log-probabilities, class 0 being the CTC blank.
+
+Settings (environment):
+    ML_PLATE_OCR_MODEL  ONNX model path (default: models/plate_crnn.onnx)
+"""
+
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from ml_metrics import record_model_cache
+from ocr_preprocess import batch_plates, preprocess_plate
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+OCR_METHOD = "crnn"
+MODEL_ENV_VAR = "ML_PLATE_OCR_MODEL"
+DEFAULT_MODEL_PATH = 'models/plate_crnn.onnx'
+
+ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+BLANK = 0
+INPUT_HEIGHT = 32
+# Narrow crops are padded to this width so the sequence has room for 10 characters
+MIN_INPUT_WIDTH = 96
+
+_session = None
+
+def load_recognizer():
+    """ONNX Runtime session for the CRNN model, reused across calls (None if unavailable)"""
+    global _session
+    if _session is not None:
+        record_model_cache("plate_crnn", True)
+        return _session
+    record_model_cache("plate_crnn", False)
+    if onnxruntime is None:
+        print("Warning: onnxruntime is not installed; the crnn OCR method is unavailable")
+        return None
+    model_path = os.environ.get(MODEL_ENV_VAR) or DEFAULT_MODEL_PATH
+    if not os.path.exists(model_path):
+        print(f"Warning: CRNN plate model not found: {model_path}")
+        print("Train it first using: python ml/train_plate_recognizer.py train")
+        return None
+    _session = onnxruntime.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+    print(f"Loaded CRNN plate model from: {model_path}")
+    return _session
+
+def encode_text(text):
+    """Class ids for a plate string (characters outside ALPHABET are dropped)"""
+    return [ALPHABET.index(c) + 1 for c in text.upper() if c in ALPHABET]
+
+def prepare_batch(crops):
+    """
+    One (N, 1, INPUT_HEIGHT, W) float32 batch from BGR plate crops
+
+    Crops are height-normalized and deskewed (ocr_preprocess), converted to
+    grayscale and right-padded with white to the widest crop.
+    """
+    images = []
+    for crop in crops:
+        image = preprocess_plate(crop, "normalize", INPUT_HEIGHT)
+        images.append(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image)
+    if images and max(image.shape[1] for image in images) < MIN_INPUT_WIDTH:
+        images[0] = np.pad(images[0], ((0, 0), (0, MIN_INPUT_WIDTH - images[0].shape[1])),
+                           constant_values=255)
+    batch, _ = batch_plates(images)
+    return (batch.astype(np.float32)[:, None] / 127.5 - 1.0).astype(np.float32)
+
+def ctc_greedy_decode(log_probs):
+    """
+    Best-path CTC decoding of a batch
+
+    Args:
+        log_probs (numpy.ndarray): (N, T, C) log-probabilities
+
+    Returns:
+        list: (text, confidence) per row; confidence is the mean probability
+            of the emitted characters
+    """
+    best = log_probs.argmax(axis=2)
+    best_prob = np.exp(log_probs.max(axis=2))
+    # A step emits a character when it is not blank and differs from the previous step
+    repeated = np.zeros_like(best, dtype=bool)
+    repeated[:, 1:] = best[:, 1:] == best[:, :-1]
+    emit = (best != BLANK) & ~repeated
+
+    decoded = []
+    for row_classes, row_probs, row_emit in zip(best, best_prob, emit):
+        classes = row_classes[row_emit]
+        text = "".join(ALPHABET[c - 1] for c in classes)
+        confidence = float(row_probs[row_emit].mean()) if classes.size else 0.0
+        decoded.append((text, confidence))
+    return decoded
+
+def recognize_plates(crops, timer=None):
+    """
+    Read several plate crops in one batched CRNN pass
+
+    Args:
+        crops (list): BGR plate crops
+        timer (StageTimer): Records the ocr_preprocess stage
+
+    Returns:
+        list: One result per crop in the extract_license_plate_text() format
+    """
+    if not crops:
+        return []
+    session = load_recognizer()
+    if session is None:
+        return [{"success": False, "error": "CRNN plate model not available", "method": OCR_METHOD}
+                for _ in crops]
+
+    if timer is not None:
+        with timer.stage("ocr_preprocess"):
+            batch = prepare_batch(crops)
+    else:
+        batch = prepare_batch(crops)
+    log_probs = session.run(None, {session.get_inputs()[0].name: batch})[0]
+
+    results = []
+    for text, confidence in ctc_greedy_decode(log_probs):
+        results.append({
+            "success": bool(text),
+            "license_plate_text": text,
+            "confidence": round(confidence, 4),
+            "method": OCR_METHOD,
+            **({} if text else {"error": "No text recognized"})
+        })
+    return results
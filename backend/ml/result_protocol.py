@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Result Output Protocol
+Shared encoder for the result dict every ML entry point hands to its caller.
+
+ML_RESULT_FORMAT selects the encoding:
+    markers  (default) JSON between RESULT_START / RESULT_END lines
+    json     length-prefixed frame holding compact JSON
+    msgpack  length-prefixed frame holding MessagePack (needs the optional
+             msgpack package; falls back to json frames without it)
+
+A frame is
+
+    b"\\x1eMLR" | format byte (b"J" or b"M") | payload length (uint32, big endian) | payload
+
+Frames are self-delimiting: a reader finds the 4-byte magic, reads the length
+and knows exactly where the result ends, so log lines printed before it are
+skipped and one long-lived process (`--serve`) can write a frame per request.
+ML_RESULT_FD=3 writes frames to file descriptor 3 and leaves stdout to logs.
+
+Bytes in a result (e.g. artifacts rendered with persist=False) stay binary in
+MessagePack and are base64 strings in the JSON formats.
+"""
+
+import os
+import sys
+import json
+import base64
+import struct
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from stage_timer import timed_serialize
+from ml_metrics import start_worker_http_server
+
+FORMAT_ENV_VAR = "ML_RESULT_FORMAT"
+FD_ENV_VAR = "ML_RESULT_FD"
+RESULT_FORMATS = ("markers", "json", "msgpack")
+
+FRAME_MAGIC = b"\x1eMLR"
+FRAME_HEADER = struct.Struct(">4scI")
+FORMAT_CODES = {"json": b"J", "msgpack": b"M"}
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+_frame_stream = None
+
+def result_format():
+    """Output format from ML_RESULT_FORMAT ('markers' when unset or unknown)"""
+    value = os.environ.get(FORMAT_ENV_VAR, "markers").strip().lower() or "markers"
+    if value not in RESULT_FORMATS:
+        print(f"Warning: unknown {FORMAT_ENV_VAR} '{value}', using markers", file=sys.stderr)
+        return "markers"
+    if value == "msgpack" and msgpack is None:
+        return "json"
+    return value
+
+def _json_default(value):
+    """JSON form of values json cannot encode: bytes become base64 strings"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(value).decode("ascii")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def encode_payload(result, fmt):
+    """Result dict -> payload bytes for a frame of format `fmt`"""
+    if fmt == "msgpack":
+        return msgpack.packb(result, use_bin_type=True)
+    return json.dumps(result, separators=(",", ":"), ensure_ascii=False,
+                      default=_json_default).encode("utf-8")
+
+def decode_payload(code, payload):
+    """Payload bytes of a frame with format byte `code` -> result dict"""
+    if code == FORMAT_CODES["msgpack"]:
+        if msgpack is None:
+            raise RuntimeError("MessagePack frame received but msgpack is not installed")
+        return msgpack.unpackb(payload, raw=False)
+    return json.loads(payload.decode("utf-8"))
+
+def encode_frame(result, fmt="json"):
+    """
+    One complete frame for a result
+
+    Args:
+        result (dict): Result to encode
+        fmt (str): 'json' or 'msgpack'
+
+    Returns:
+        bytes: Header followed by the payload
+    """
+    payload = timed_serialize(lambda r: encode_payload(r, fmt), result)
+    return FRAME_HEADER.pack(FRAME_MAGIC, FORMAT_CODES[fmt], len(payload)) + payload
+
+class FrameDecoder:
+    """
+    Incremental frame reader for chunked output
+
+    feed() accepts bytes as they arrive and returns every result completed
+    by them; bytes outside frames (log lines) are discarded.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        self._buffer.extend(data)
+        results = []
+        while True:
+            start = self._buffer.find(FRAME_MAGIC)
+            if start == -1:
+                # Keep a partial magic that may complete with the next chunk
+                del self._buffer[:max(0, len(self._buffer) - len(FRAME_MAGIC) + 1)]
+                return results
+            if len(self._buffer) - start < FRAME_HEADER.size:
+                del self._buffer[:start]
+                return results
+            _, code, length = FRAME_HEADER.unpack_from(self._buffer, start)
+            end = start + FRAME_HEADER.size + length
+            if len(self._buffer) < end:
+                del self._buffer[:start]
+                return results
+            results.append(decode_payload(code, bytes(self._buffer[start + FRAME_HEADER.size:end])))
+            del self._buffer[:end]
+
+def decode_frames(data):
+    """All results framed in a complete byte string"""
+    return FrameDecoder().feed(data)
+
+def _output_stream():
+    global _frame_stream
+    if _frame_stream is None:
+        fd = os.environ.get(FD_ENV_VAR)
+        _frame_stream = os.fdopen(int(fd), "wb", closefd=False) if fd else sys.stdout.buffer
+    return _frame_stream
+
+def emit_result(result, indent=None):
+    """
+    Write a result in the configured format
+
+    Args:
+        result (dict): Result to write
+        indent (int): JSON indent for the markers format (frames are always compact)
+    """
+    fmt = result_format()
+    if fmt == "markers":
+        payload = timed_serialize(lambda r: json.dumps(r, indent=indent, default=_json_default), result)
+        print("RESULT_START")
+        print(payload)
+        print("RESULT_END")
+        sys.stdout.flush()
+        return
+
+    frame = encode_frame(result, fmt)
+    # Log lines already printed must reach the pipe before the frame
+    sys.stdout.flush()
+    stream = _output_stream()
+    stream.write(frame)
+    stream.flush()
+
+def serve_requests(handler, emit=emit_result, requests=None):
+    """
+    Answer one request per input line from a long-lived process
+
+    Each line is a JSON list of the script's CLI arguments, e.g.
+    ["uploads/frame.jpg", "0.3"]; each answer is written with `emit`, so
+    with a framed ML_RESULT_FORMAT the caller gets one frame per line.
+    Models stay loaded between requests, and the process serves its
+    metrics on ML_METRICS_PORT when that is set.
+
+    Args:
+        handler (callable): CLI arguments -> result dict
+        emit (callable): Writes one result (the script's write_result)
+        requests (iterable): Input lines (default: stdin)
+
+    Returns:
+        int: Process exit code
+    """
+    start_worker_http_server()
+    for line in requests if requests is not None else sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            args = json.loads(line)
+            if not isinstance(args, list):
+                raise ValueError("request must be a JSON list of arguments")
+            result = handler([str(a) for a in args])
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+        emit(result)
+    return 0
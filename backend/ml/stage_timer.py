@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Stage Timing Utilities
+Monotonic per-stage timers for the ML entry points, plus an in-process
+collector that aggregates timings into p50/p95/p99 per stage for long-lived workers.
+
+Set ML_INCLUDE_TIMINGS=1 to add a `timings_ms` block to every result dict
+without changing the CLI arguments used by the Node routes.
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+TIMINGS_ENV_VAR = "ML_INCLUDE_TIMINGS"
+
+def timings_enabled(include_timings=None):
+    """Resolve whether results should carry a `timings_ms` block"""
+    if include_timings is not None:
+        return bool(include_timings)
+    return os.environ.get(TIMINGS_ENV_VAR, "").strip().lower() in ("1", "true", "yes")
+
+# tracemalloc has one global peak, so stages reset it and fold each reading into the
+# running peak (bytes) of every stage still open and into the peak of the whole traced call
+_open_stage_peaks = []
+_traced_peak = 0
+
+def _fold_traced_peak():
+    """Fold the peak since the last reset into the open stages and the overall peak, then reset it"""
+    global _traced_peak
+    peak = tracemalloc.get_traced_memory()[1]
+    _traced_peak = max(_traced_peak, peak)
+    for i, stage_peak in enumerate(_open_stage_peaks):
+        _open_stage_peaks[i] = max(stage_peak, peak)
+    tracemalloc.reset_peak()
+
+def reset_traced_peak():
+    """Start a new overall peak (call right after tracemalloc.start())"""
+    global _traced_peak
+    _traced_peak = 0
+
+def traced_peak_kb():
+    """Peak traced memory since reset_traced_peak(), unaffected by the stages' resets"""
+    return max(_traced_peak, tracemalloc.get_traced_memory()[1]) / 1024.0
+
+class StageTimer:
+    """Accumulates wall-clock milliseconds per named stage using a monotonic clock"""
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self.stages = {}
+        self.memory_peaks = {}
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time the enclosed block and add it to `name` (repeated stages accumulate)
+
+        While tracemalloc is tracing (profile mode) the peak traced memory of
+        the block is kept as well; nested stages do not hide it from the outer
+        stage, nor from traced_peak_kb().
+        """
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            _fold_traced_peak()
+            _open_stage_peaks.append(0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000.0)
+            if tracing:
+                if tracemalloc.is_tracing():
+                    _fold_traced_peak()
+                peak_kb = _open_stage_peaks.pop() / 1024.0
+                self.memory_peaks[name] = max(self.memory_peaks.get(name, 0.0), peak_kb)
+
+    def add(self, name, elapsed_ms):
+        """Add an externally measured duration to a stage"""
+        if elapsed_ms is None:
+            return
+        self.stages[name] = self.stages.get(name, 0.0) + float(elapsed_ms)
+
+    def split(self, name, part, elapsed_ms):
+        """
+        Move an externally measured part of stage `name` (e.g. the NMS time
+        ultralytics reports inside "inference") into its own stage `part`,
+        so the stages still add up to the wall-clock time
+        """
+        if elapsed_ms is None or name not in self.stages:
+            return
+        elapsed_ms = min(float(elapsed_ms), self.stages[name])
+        self.stages[name] -= elapsed_ms
+        self.add(part, elapsed_ms)
+
+    def merge(self, timings_ms, prefix=""):
+        """Fold a `timings_ms` block from a nested call into this timer"""
+        for name, elapsed_ms in (timings_ms or {}).items():
+            if name == "total":
+                continue
+            self.add(f"{prefix}{name}", elapsed_ms)
+
+    def absorb(self, result, prefix=""):
+        """Move the timing and memory blocks of a nested call's result into this timer"""
+        self.merge(result.pop("timings_ms", None), prefix)
+        for name, peak_kb in (result.pop("memory_peak_kb", None) or {}).items():
+            self.memory_peaks[f"{prefix}{name}"] = peak_kb
+
+    def elapsed_ms(self):
+        """Milliseconds since the timer was created"""
+        return (time.perf_counter() - self._start) * 1000.0
+
+    def as_dict(self):
+        """Rounded per-stage timings with a `total` entry"""
+        timings = {name: round(ms, 3) for name, ms in self.stages.items()}
+        timings["total"] = round(self.elapsed_ms(), 3)
+        return timings
+
+def _percentile(sorted_values, pct):
+    """Linear-interpolated percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    rank = (len(sorted_values) - 1) * (pct / 100.0)
+    lower = int(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    weight = rank - lower
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * weight
+
+def summarize_samples(values):
+    """Return {count, mean, min, p50, p95, p99, max} for a list of millisecond samples"""
+    values = sorted(values)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3),
+        "min": round(values[0], 3),
+        "p50": round(_percentile(values, 50), 3),
+        "p95": round(_percentile(values, 95), 3),
+        "p99": round(_percentile(values, 99), 3),
+        "max": round(values[-1], 3)
+    }
+
+class TimingCollector:
+    """
+    Thread-safe aggregate of stage timings keyed by operation and stage.
+
+    Only the most recent `max_samples` values per stage are kept so a
+    long-lived worker has bounded memory.
+    """
+
+    def __init__(self, max_samples=1000):
+        self.max_samples = max_samples
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, operation, timings_ms):
+        """Record one `timings_ms` block produced by `operation`"""
+        with self._lock:
+            stages = self._samples.setdefault(operation, {})
+            for name, elapsed_ms in timings_ms.items():
+                samples = stages.get(name)
+                if samples is None:
+                    samples = stages[name] = deque(maxlen=self.max_samples)
+                samples.append(float(elapsed_ms))
+
+    def summary(self):
+        """Return {operation: {stage: summarize_samples(...)}}"""
+        with self._lock:
+            snapshot = {
+                operation: {name: list(samples) for name, samples in stages.items()}
+                for operation, stages in self._samples.items()
+            }
+
+        return {
+            operation: {name: summarize_samples(values) for name, values in stages.items() if values}
+            for operation, stages in snapshot.items()
+        }
+
+    def export(self, output_path):
+        """Write the current summary as JSON and return it"""
+        summary = self.summary()
+        with open(output_path, 'w') as f:
+            json.dump(summary, f, indent=2)
+        return summary
+
+    def reset(self):
+        """Drop all recorded samples"""
+        with self._lock:
+            self._samples.clear()
+
+_collector = TimingCollector()
+
+def get_collector():
+    """Process-wide collector used by the ML entry points"""
+    return _collector
+
+def finalize_timings(result, timer, operation, include_timings=None):
+    """
+    Record a finished call in the collector and optionally attach `timings_ms`
+
+    Args:
+        result (dict): Result dict returned by the entry point
+        timer (StageTimer): Timer used during the call
+        operation (str): Name of the entry point
+        include_timings (bool): Force the block on/off (default: env variable)
+
+    Returns:
+        dict: The same result dict
+    """
+    timings = timer.as_dict()
+    _collector.record(operation, timings)
+    if isinstance(result, dict):
+        if timings_enabled(include_timings):
+            result["timings_ms"] = timings
+        if timer.memory_peaks:
+            result["memory_peak_kb"] = {name: round(kb, 1) for name, kb in timer.memory_peaks.items()}
+    return result
+
+def timed_serialize(serialize, result):
+    """
+    Serialize a result with `serialize(result)` and record how long it took
+
+    The serialization time cannot live inside the payload it measures, so it
+    is recorded in the collector and echoed to stderr when timings are enabled.
+    """
+    timer = StageTimer()
+    with timer.stage("serialize"):
+        payload = serialize(result)
+    timings = timer.as_dict()
+    _collector.record("write_result", timings)
+    if timings_enabled():
+        print(f"TIMINGS write_result serialize_ms={timings['serialize']}", file=sys.stderr)
+    return payload
+
+def timed_dumps(result, **json_kwargs):
+    """Serialize a result with json.dumps and record how long it took"""
+    return timed_serialize(lambda r: json.dumps(r, **json_kwargs), result)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Synthetic License Plates
+Renders plate crops with known text in Indian registration formats, so OCR
+engines can be trained and benchmarked without labelled real plates or
+network access. Each plate is a function of (seed, index) only, so a set is
+reproduced exactly whatever the number of workers.
+
+Large sets are written by a process pool as shards of memory-mappable arrays:
+
+    <output>/manifest.json                 seed, count, image size, shard list
+    <output>/shard_00000.images.npy        (N, H, W, 3) uint8, right-padded with white
+    <output>/shard_00000.widths.npy        (N,) width of each plate before padding
+    <output>/shard_00000.labels.txt        plate text, one line per image
+
+    cd backend
+    python ml/synthetic_plates.py --output datasets/synthetic_plates --count 200000 --workers 8
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from plate_format import SERIES_LETTERS, STATE_CODES
+
+# Share of Bharat (BH) series plates, e.g. 22BH1234AA
+BH_SERIES_SHARE = 0.1
+
+# (background BGR, text BGR): private, commercial, electric, rental
+PLATE_STYLES = [((245, 245, 245), (20, 20, 20)), ((40, 200, 240), (20, 20, 20)),
+                ((60, 140, 40), (245, 245, 245)), ((20, 20, 20), (40, 200, 240))]
+FONTS = [cv2.FONT_HERSHEY_SIMPLEX, cv2.FONT_HERSHEY_DUPLEX, cv2.FONT_HERSHEY_TRIPLEX]
+
+DEFAULT_HEIGHT = 64
+DEFAULT_WIDTH = 384
+DEFAULT_SHARD_SIZE = 10000
+MANIFEST_VERSION = 1
+
+def random_plate_text(rng):
+    """
+    Plate text in a current Indian format: state code, 2-digit district,
+    1-3 series letters and a 4-digit number (MH12AB1234), or the BH series
+    (22BH1234AA)
+    """
+    if rng.random() < BH_SERIES_SHARE:
+        letters = "".join(rng.choice(list(SERIES_LETTERS), size=int(rng.integers(1, 3))))
+        return f"{int(rng.integers(21, 30))}BH{int(rng.integers(1, 10000)):04d}{letters}"
+    series = "".join(rng.choice(list(SERIES_LETTERS), size=int(rng.integers(1, 4))))
+    return (f"{rng.choice(STATE_CODES)}{int(rng.integers(1, 100)):02d}"
+            f"{series}{int(rng.integers(1, 10000)):04d}")
+
+@lru_cache(maxsize=None)
+def _truetype(path, size):
+    from PIL import ImageFont
+    return ImageFont.truetype(path, size)
+
+def _draw_text(plate, text, color, height, font, thickness, margin):
+    """Draw with a Hershey font id or a TrueType font path"""
+    if isinstance(font, int):
+        scale = height / 40.0
+        (_, text_height), _ = cv2.getTextSize(text, font, scale, thickness)
+        cv2.putText(plate, text, (margin, (height + text_height) // 2), font, scale, color,
+                    thickness, cv2.LINE_AA)
+        return plate
+    from PIL import Image, ImageDraw
+    image = Image.fromarray(plate)
+    ImageDraw.Draw(image).text((margin, height // 2), text, fill=color, anchor="lm",
+                               font=_truetype(font, int(height * 0.7)))
+    return np.asarray(image).copy()
+
+def _text_width(text, height, font, thickness):
+    if isinstance(font, int):
+        return cv2.getTextSize(text, font, height / 40.0, thickness)[0][0]
+    return int(_truetype(font, int(height * 0.7)).getlength(text))
+
+def render_plate(text, rng, height=DEFAULT_HEIGHT, fonts=()):
+    """
+    Tight BGR crop of a plate showing `text`, as the detector would crop it
+
+    Variations: plate style, font (Hershey or the given TrueType files),
+    perspective warp, lighting gradient and gamma, Gaussian or motion blur,
+    sensor noise and JPEG artifacts.
+
+    Args:
+        text (str): Plate text
+        rng (numpy.random.Generator): Source of all random choices
+        height (int): Crop height in pixels
+        fonts (tuple): Extra TrueType font paths to choose from
+
+    Returns:
+        numpy.ndarray: The rendered crop
+    """
+    background, color = PLATE_STYLES[int(rng.integers(len(PLATE_STYLES)))]
+    choices = FONTS + list(fonts)
+    font = choices[int(rng.integers(len(choices)))]
+    thickness = int(rng.integers(2, 4))
+    margin = int(height * 0.2)
+    width = _text_width(text, height, font, thickness) + 2 * margin
+
+    plate = np.empty((height, width, 3), dtype=np.uint8)
+    plate[:] = background
+    cv2.rectangle(plate, (1, 1), (width - 2, height - 2), color, 2)
+    plate = _draw_text(plate, text, color, height, font, thickness, margin)
+
+    # Perspective: each corner moves by up to 6% of the plate size
+    corners = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+    jitter = rng.uniform(-0.06, 0.06, (4, 2)) * np.float32([width, height])
+    matrix = cv2.getPerspectiveTransform(corners, (corners + jitter).astype(np.float32))
+    plate = cv2.warpPerspective(plate, matrix, (width, height), borderMode=cv2.BORDER_REPLICATE)
+
+    # Lighting: linear gradient in a random direction, then gamma (as a lookup table)
+    direction = rng.uniform(-1, 1, 2).astype(np.float32)
+    ramp = (np.linspace(-0.5, 0.5, width, dtype=np.float32)[None, :] * direction[0]
+            + np.linspace(-0.5, 0.5, height, dtype=np.float32)[:, None] * direction[1])
+    gain = np.float32(rng.uniform(0.7, 1.15)) + np.float32(rng.uniform(0, 0.5)) * ramp
+    lit = plate.astype(np.float32)
+    lit *= gain[:, :, None]
+    plate = np.clip(lit, 0, 255, out=lit).astype(np.uint8)
+    gamma = float(rng.uniform(0.7, 1.4))
+    plate = cv2.LUT(plate, (255.0 * (np.arange(256) / 255.0) ** gamma).astype(np.uint8))
+
+    if rng.random() < 0.3:
+        # Horizontal motion blur from a moving vehicle
+        length = int(rng.integers(3, 10))
+        kernel = np.zeros((length, length), dtype=np.float32)
+        kernel[length // 2] = 1.0 / length
+        plate = cv2.filter2D(plate, -1, kernel)
+    else:
+        sigma = float(rng.uniform(0, 1.2))
+        if sigma > 0.3:
+            plate = cv2.GaussianBlur(plate, (0, 0), sigma)
+
+    noise = rng.standard_normal(plate.shape, dtype=np.float32) * np.float32(rng.uniform(2, 10))
+    noise += plate
+    plate = np.clip(noise, 0, 255, out=noise).astype(np.uint8)
+    if rng.random() < 0.5:
+        quality = int(rng.integers(30, 90))
+        _, encoded = cv2.imencode('.jpg', plate, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        plate = cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+    return plate
+
+def synthetic_sample(index, seed=0, height=DEFAULT_HEIGHT, fonts=()):
+    """(image, text) for plate `index` of the set generated with `seed`"""
+    rng = np.random.default_rng([seed, index])
+    text = random_plate_text(rng)
+    return render_plate(text, rng, height, fonts), text
+
+def fit_width(image, width):
+    """Shrink a plate wider than `width` (keeping its height) so it fits a shard row"""
+    if image.shape[1] <= width:
+        return image
+    return cv2.resize(image, (width, image.shape[0]), interpolation=cv2.INTER_AREA)
+
+def _write_shard(task):
+    """Render one shard into memory-mapped arrays (runs in a worker process)"""
+    output, shard_id, start, count, seed, height, width, fonts = task
+    prefix = Path(output) / f"shard_{shard_id:05d}"
+    images = np.lib.format.open_memmap(f"{prefix}.images.tmp.npy", mode='w+', dtype=np.uint8,
+                                       shape=(count, height, width, 3))
+    widths = np.empty(count, dtype=np.int32)
+    labels = []
+    for offset in range(count):
+        image, text = synthetic_sample(start + offset, seed, height, fonts)
+        image = fit_width(image, width)
+        images[offset] = 255
+        images[offset, :, :image.shape[1]] = image
+        widths[offset] = image.shape[1]
+        labels.append(text)
+    images.flush()
+    del images
+    np.save(f"{prefix}.widths.npy", widths)
+    Path(f"{prefix}.labels.txt").write_text("\n".join(labels) + "\n")
+    os.replace(f"{prefix}.images.tmp.npy", f"{prefix}.images.npy")
+    return {"name": prefix.name, "start": start, "count": count}
+
+def generate(output, count, seed=0, shard_size=DEFAULT_SHARD_SIZE, workers=None,
+             height=DEFAULT_HEIGHT, width=DEFAULT_WIDTH, fonts=()):
+    """
+    Render `count` plates into shards with a process pool
+
+    Returns:
+        dict: The manifest written to <output>/manifest.json
+    """
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    tasks = [(str(output), shard_id, start, min(shard_size, count - start), seed, height, width,
+              tuple(fonts))
+             for shard_id, start in enumerate(range(0, count, shard_size))]
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=min(workers, max(1, len(tasks)))) as pool:
+        shards = list(pool.map(_write_shard, tasks))
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "seed": seed,
+        "count": count,
+        "height": height,
+        "width": width,
+        "fonts": [os.path.basename(f) for f in fonts],
+        "shards": shards
+    }
+    with open(output / 'manifest.json', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+class SyntheticShards:
+    """
+    Read-only view over a generated set; images are memory-mapped, so only
+    the plates that are accessed are read from disk
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        with open(self.root / 'manifest.json', 'r') as f:
+            self.manifest = json.load(f)
+        self._shards = []
+        self._starts = []
+        for shard in self.manifest["shards"]:
+            prefix = self.root / shard["name"]
+            labels = Path(f"{prefix}.labels.txt").read_text().splitlines()
+            self._shards.append((f"{prefix}.images.npy", np.load(f"{prefix}.widths.npy"), labels))
+            self._starts.append(shard["start"])
+        self._images = {}
+
+    def __len__(self):
+        return self.manifest["count"]
+
+    def __getitem__(self, index):
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        shard_id = int(np.searchsorted(self._starts, index, side='right')) - 1
+        path, widths, labels = self._shards[shard_id]
+        # Opened lazily so each DataLoader worker maps the files itself
+        if path not in self._images:
+            self._images[path] = np.load(path, mmap_mode='r')
+        offset = index - self._starts[shard_id]
+        return np.array(self._images[path][offset, :, :widths[offset]]), labels[offset]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render synthetic license plates into sharded arrays")
+    parser.add_argument("--output", default="datasets/synthetic_plates")
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--height", type=int, default=DEFAULT_HEIGHT)
+    parser.add_argument("--width", type=int, default=DEFAULT_WIDTH, help="Padded row width")
+    parser.add_argument("--fonts-dir", help="Directory of extra .ttf/.otf plate fonts")
+    args = parser.parse_args(argv)
+
+    fonts = sorted(str(p) for p in Path(args.fonts_dir).iterdir()
+                   if p.suffix.lower() in ('.ttf', '.otf')) if args.fonts_dir else []
+    start = time.perf_counter()
+    manifest = generate(args.output, args.count, args.seed, args.shard_size, args.workers,
+                        args.height, args.width, fonts)
+    elapsed = time.perf_counter() - start
+    print(f"✅ {manifest['count']} plates in {len(manifest['shards'])} shards written to "
+          f"{args.output} ({manifest['count'] / max(elapsed, 1e-9):.0f} plates/s)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+CRNN Plate Recognizer Training and Benchmark
+Trains the CTC plate recognizer behind ocr_method "crnn" on synthetic plates
+(ml/synthetic_plates.py, rendered on the fly or read from pre-generated
+shards) plus, when given, real plate crops from the detection pipeline, and
+exports it to ONNX for ml/plate_recognizer.py.
+
+Real crops are listed in a tab-separated labels file, one
+`<image path>\\t<plate text>` line per crop with paths relative to the file,
+e.g. crops kept by `license_plate_full_service.py --keep-plates` whose text
+was reviewed.
+
+    cd backend
+    python ml/train_plate_recognizer.py train --synthetic 50000 --labels datasets/plate_crops/train.tsv
+    python ml/train_plate_recognizer.py train --shards datasets/synthetic_plates
+    python ml/train_plate_recognizer.py benchmark --labels datasets/plate_crops/valid.tsv --methods crnn,auto
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(ML_DIR)
+from ml_core import load_image
+from plate_format import edit_distance
+from synthetic_plates import SyntheticShards, synthetic_sample
+from plate_recognizer import (ALPHABET, BLANK, DEFAULT_MODEL_PATH, INPUT_HEIGHT, MIN_INPUT_WIDTH,
+                              OCR_METHOD, ctc_greedy_decode, encode_text, prepare_batch,
+                              recognize_plates)
+
+# Synthetic validation plates use seeds far from the training ones
+VALIDATION_SEED_OFFSET = 10_000_000
+
+def build_model(num_classes=len(ALPHABET) + 1):
+    """CRNN: 5 conv stages (32 px height -> 1, width / 4), a BiGRU and a linear CTC head"""
+    import torch.nn as nn
+
+    def block(in_channels, out_channels, pool):
+        return [nn.Conv2d(in_channels, out_channels, 3, padding=1), nn.BatchNorm2d(out_channels),
+                nn.ReLU(inplace=True), nn.MaxPool2d(pool)]
+
+    class CRNN(nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.features = nn.Sequential(
+                *block(1, 32, 2), *block(32, 64, 2), *block(64, 128, (2, 1)),
+                *block(128, 128, (2, 1)), nn.Conv2d(128, 256, (2, 1)), nn.ReLU(inplace=True))
+            self.rnn = nn.GRU(256, 128, bidirectional=True, batch_first=True)
+            self.head = nn.Linear(256, num_classes)
+
+        def forward(self, x):
+            features = self.features(x).squeeze(2).permute(0, 2, 1)
+            features, _ = self.rnn(features)
+            return self.head(features).log_softmax(2)
+
+    return CRNN()
+
+def load_labelled_crops(labels_path):
+    """(image path, text) pairs from a tab-separated labels file"""
+    base = Path(labels_path).parent
+    samples = []
+    with open(labels_path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            path, _, text = line.partition('\t')
+            samples.append((str(base / path), text.strip().upper()))
+    return samples
+
+class PlateSamples:
+    """
+    Labelled crops followed by synthetic plates: `synthetic_count` rendered
+    on the fly, or every plate of a SyntheticShards set when one is given
+    """
+
+    def __init__(self, labelled, synthetic_count, seed, shards=None):
+        self.labelled = labelled
+        self.synthetic_count = len(shards) if shards is not None else synthetic_count
+        self.seed = seed
+        self.shards = shards
+
+    def __len__(self):
+        return len(self.labelled) + self.synthetic_count
+
+    def __getitem__(self, index):
+        if index < len(self.labelled):
+            path, text = self.labelled[index]
+            return load_image(path), text
+        index -= len(self.labelled)
+        if self.shards is not None:
+            return self.shards[index]
+        return synthetic_sample(index, self.seed)
+
+def collate(samples):
+    """Batch tensors plus CTC targets; uses the inference preprocessing"""
+    import torch
+    images, texts = zip(*samples)
+    targets = [encode_text(text) for text in texts]
+    batch = torch.from_numpy(prepare_batch(list(images)))
+    flat_targets = torch.tensor([c for target in targets for c in target], dtype=torch.long)
+    target_lengths = torch.tensor([len(target) for target in targets], dtype=torch.long)
+    return batch, flat_targets, target_lengths, list(texts)
+
+def export_onnx(model, output_path):
+    """Export with dynamic batch and width so crops of any aspect ratio run unpadded"""
+    import torch
+    model.eval()
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    torch.onnx.export(model, torch.zeros(1, 1, INPUT_HEIGHT, MIN_INPUT_WIDTH), str(output_path),
+                      input_names=["image"], output_names=["log_probs"], opset_version=17,
+                      dynamic_axes={"image": {0: "batch", 3: "width"},
+                                    "log_probs": {0: "batch", 1: "steps"}})
+    print(f"✅ ONNX model saved to: {output_path}")
+
+def train(args):
+    """Train, keep the best validation checkpoint and export it to ONNX"""
+    import torch
+    from torch.utils.data import DataLoader
+
+    torch.manual_seed(args.seed)
+    labelled = load_labelled_crops(args.labels) if args.labels else []
+    holdout = len(labelled) // 10
+    shards = SyntheticShards(args.shards) if args.shards else None
+    train_set = PlateSamples(labelled[holdout:], args.synthetic, args.seed, shards)
+    valid_set = PlateSamples(labelled[:holdout], args.valid_synthetic,
+                             args.seed + VALIDATION_SEED_OFFSET)
+    print(f"🎯 Training on {len(train_set)} plates ({len(labelled) - holdout} real), "
+          f"validating on {len(valid_set)}")
+
+    loader = DataLoader(train_set, batch_size=args.batch_size, shuffle=True,
+                        num_workers=args.workers, collate_fn=collate)
+    valid_loader = DataLoader(valid_set, batch_size=args.batch_size, num_workers=args.workers,
+                              collate_fn=collate)
+
+    model = build_model()
+    optimizer = torch.optim.AdamW(model.parameters(), lr=args.lr)
+    ctc_loss = torch.nn.CTCLoss(blank=BLANK, zero_infinity=True)
+    checkpoint = Path(args.output).with_suffix('.pt')
+    best_accuracy = -1.0
+
+    for epoch in range(1, args.epochs + 1):
+        model.train()
+        total_loss = 0.0
+        for batch, targets, target_lengths, _ in loader:
+            log_probs = model(batch)
+            input_lengths = torch.full((log_probs.shape[0],), log_probs.shape[1], dtype=torch.long)
+            loss = ctc_loss(log_probs.permute(1, 0, 2), targets, input_lengths, target_lengths)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item()
+
+        model.eval()
+        correct = 0
+        with torch.no_grad():
+            for batch, _, _, texts in valid_loader:
+                decoded = ctc_greedy_decode(model(batch).numpy())
+                correct += sum(text == expected for (text, _), expected in zip(decoded, texts))
+        accuracy = correct / max(1, len(valid_set))
+        print(f"Epoch {epoch}/{args.epochs}: loss {total_loss / max(1, len(loader)):.4f}, "
+              f"exact match {accuracy:.1%}")
+        if accuracy > best_accuracy:
+            best_accuracy = accuracy
+            checkpoint.parent.mkdir(parents=True, exist_ok=True)
+            torch.save(model.state_dict(), checkpoint)
+
+    model.load_state_dict(torch.load(checkpoint))
+    export_onnx(model, args.output)
+    print(f"✅ Best validation exact match: {best_accuracy:.1%}")
+    return 0
+
+def _read(method, images, batch_size):
+    """OCR results for `images` with one method; crnn runs in batches"""
+    if method == OCR_METHOD:
+        results = []
+        for start in range(0, len(images), batch_size):
+            results.extend(recognize_plates(images[start:start + batch_size]))
+        return results
+    from license_plate_ocr import extract_license_plate_text
+    return [extract_license_plate_text(image, method) for image in images]
+
+def benchmark(samples, methods, batch_size):
+    """
+    Accuracy and warm CPU latency of each OCR method on the same crops
+
+    Returns:
+        dict: method -> exact match, character accuracy and per-crop latency
+    """
+    images = [load_image(path) if isinstance(path, str) else path for path, _ in samples]
+    expected = [text for _, text in samples]
+    report = {}
+    for method in methods:
+        # Warm-up so model loading is not counted
+        _read(method, images[:1], batch_size)
+        start = time.perf_counter()
+        results = _read(method, images, batch_size)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        texts = [(r.get("license_plate_text") or "").upper().replace(" ", "") for r in results]
+        errors = sum(edit_distance(text, truth) for text, truth in zip(texts, expected))
+        report[method] = {
+            "crops": len(images),
+            "exact_match": round(sum(t == e for t, e in zip(texts, expected)) / max(1, len(images)), 4),
+            "char_accuracy": round(1 - errors / max(1, sum(len(e) for e in expected)), 4),
+            "ms_per_crop": round(elapsed_ms / max(1, len(images)), 3),
+            "total_ms": round(elapsed_ms, 1)
+        }
+    return report
+
+def run_benchmark(args):
+    if args.labels:
+        samples = load_labelled_crops(args.labels)
+    elif args.shards:
+        shards = SyntheticShards(args.shards)
+        samples = [shards[i] for i in range(min(args.synthetic, len(shards)))]
+    else:
+        samples = [synthetic_sample(i, args.seed + VALIDATION_SEED_OFFSET)
+                   for i in range(args.synthetic)]
+    methods = [m.strip() for m in args.methods.split(",") if m.strip()]
+    report = benchmark(samples, methods, args.batch_size)
+    print(f"{'method':<10} {'exact':>8} {'chars':>8} {'ms/crop':>9}")
+    for method, row in report.items():
+        print(f"{method:<10} {row['exact_match']:>8.1%} {row['char_accuracy']:>8.1%} "
+              f"{row['ms_per_crop']:>9.2f}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"📊 Benchmark saved to: {args.output}")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train and benchmark the CRNN plate recognizer")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = commands.add_parser("train", help="Train and export to ONNX")
+    train_parser.add_argument("--labels", help="Tab-separated labels file of real plate crops")
+    train_parser.add_argument("--synthetic", type=int, default=50000,
+                              help="Synthetic plates rendered on the fly")
+    train_parser.add_argument("--shards", help="Pre-generated synthetic set (ml/synthetic_plates.py) "
+                                               "used instead of --synthetic")
+    train_parser.add_argument("--valid-synthetic", type=int, default=2000)
+    train_parser.add_argument("--epochs", type=int, default=20)
+    train_parser.add_argument("--batch-size", type=int, default=64)
+    train_parser.add_argument("--lr", type=float, default=1e-3)
+    train_parser.add_argument("--workers", type=int, default=max(0, (os.cpu_count() or 1) - 1))
+    train_parser.add_argument("--seed", type=int, default=0)
+    train_parser.add_argument("--output", default=DEFAULT_MODEL_PATH)
+
+    bench_parser = commands.add_parser("benchmark", help="Compare OCR methods on the same crops")
+    bench_parser.add_argument("--labels", help="Tab-separated labels file (default: synthetic plates)")
+    bench_parser.add_argument("--shards", help="Pre-generated synthetic set to benchmark on")
+    bench_parser.add_argument("--synthetic", type=int, default=500, help="Synthetic plates to use")
+    bench_parser.add_argument("--methods", default=f"{OCR_METHOD},auto")
+    bench_parser.add_argument("--batch-size", type=int, default=32)
+    bench_parser.add_argument("--seed", type=int, default=0)
+    bench_parser.add_argument("--output", help="Write the report as JSON")
+
+    args = parser.parse_args(argv)
+    return train(args) if args.command == "train" else run_benchmark(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
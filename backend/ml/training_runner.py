@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Headless YOLO Training Runner
+Config-file-driven training for the vehicle and license plate detectors.
+Never prompts: it resumes from last.pt automatically, verifies the dataset
+against a cached manifest, and sizes batch/workers from free RAM and CPUs.
+
+    python ml/training_runner.py ml/configs/license_plate.yaml
+    python ml/training_runner.py ml/configs/vehicle.yaml --set train.epochs=50 --no-resume
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+from pathlib import Path
+
+import yaml
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from yolo_dataset import category_for_name, load_class_names, load_dataset_manifest
+
+CONFIG_DIR = Path(__file__).resolve().parent / 'configs'
+REQUIRED_DIRS = ['train/images', 'train/labels', 'valid/images', 'valid/labels']
+COMPLETED_MARKER = 'COMPLETED'
+
+# Rough CPU training footprint per image (tensors, activations, mosaic buffers)
+BYTES_PER_PIXEL_IN_FLIGHT = 3 * 4 * 60
+RAM_BUDGET_FRACTION = 0.5
+BYTES_PER_WORKER = 768 * 1024 * 1024
+
+def load_config(config_path, overrides=()):
+    """
+    Load a YAML training config and apply `key.sub=value` overrides
+
+    Values in overrides are parsed as YAML, so `train.epochs=50` gives an int.
+    """
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f) or {}
+    config.setdefault('train', {})
+    for override in overrides:
+        key, _, raw = override.partition('=')
+        if not raw:
+            raise ValueError(f"Override must look like key=value: {override}")
+        target = config
+        parts = key.split('.')
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = yaml.safe_load(raw)
+    return config
+
+def available_memory_bytes():
+    """Free physical memory, from psutil, /proc/meminfo or sysconf"""
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def _cuda_available():
+    try:
+        import torch
+        return torch.cuda.is_available()
+    except ImportError:
+        return False
+
+def auto_batch_size(imgsz, available_bytes):
+    """Largest power-of-two batch that fits half of free RAM (1..64)"""
+    if not available_bytes:
+        return 4
+    per_image = imgsz * imgsz * BYTES_PER_PIXEL_IN_FLIGHT
+    fits = int(available_bytes * RAM_BUDGET_FRACTION // per_image)
+    batch = 1
+    while batch * 2 <= min(fits, 64):
+        batch *= 2
+    return batch
+
+def auto_workers(available_bytes):
+    """Dataloader workers limited by CPU count and a quarter of free RAM"""
+    cpu_limit = max(0, (os.cpu_count() or 1) - 1)
+    if not available_bytes:
+        return min(cpu_limit, 2)
+    ram_limit = int(available_bytes * 0.25 // BYTES_PER_WORKER)
+    return max(0, min(cpu_limit, ram_limit, 8))
+
+def resolve_resources(train_args):
+    """Replace batch/workers 'auto' with values for this machine"""
+    resolved = dict(train_args)
+    available = available_memory_bytes()
+    if resolved.get('batch', 'auto') == 'auto':
+        # Ultralytics AutoBatch (-1) sizes against GPU memory; CPU uses the RAM heuristic
+        resolved['batch'] = -1 if _cuda_available() else auto_batch_size(int(resolved.get('imgsz', 640)), available)
+    if resolved.get('workers', 'auto') == 'auto':
+        resolved['workers'] = auto_workers(available)
+    return resolved
+
+def verify_dataset(config):
+    """
+    Check data.yaml, the required class/categories and the split directories
+
+    File counts come from the cached manifest, so unchanged data is
+    verified with one directory listing per split.
+    """
+    data_yaml = Path(config['data'])
+    dataset_path = data_yaml.parent
+
+    if not dataset_path.exists():
+        print(f"❌ Dataset not found: {dataset_path}")
+        return False
+    if not data_yaml.exists():
+        print(f"❌ data.yaml not found in {dataset_path}")
+        return False
+
+    required_class = config.get('required_class')
+    required_categories = config.get('required_categories', [])
+    if required_class or required_categories:
+        try:
+            names = load_class_names(dataset_path)
+        except Exception as e:
+            print(f"❌ Error reading data.yaml: {e}")
+            return False
+        if required_class:
+            if required_class not in names:
+                print(f"❌ '{required_class}' class missing! Found classes: {names}")
+                return False
+            print(f"✅ Found '{required_class}' class at index {names.index(required_class)}")
+        for category in required_categories:
+            matching = [name for name in names if category_for_name(name) == category]
+            if not matching:
+                print(f"❌ No class maps to '{category}'! Found classes: {names}")
+                return False
+            print(f"✅ '{category}' covered by classes {matching}")
+
+    manifest, changed = load_dataset_manifest(dataset_path, REQUIRED_DIRS)
+    for d in REQUIRED_DIRS:
+        info = manifest["dirs"].get(d, {})
+        if not info.get("exists") or info.get("count", 0) == 0:
+            print(f"❌ Missing or empty directory: {dataset_path / d}")
+            return False
+        source = "rescanned" if d in changed else "cached"
+        print(f"✅ Found {info['count']} files in {d} ({source})")
+
+    print("✅ Dataset verified successfully!")
+    return True
+
+def _run_dir(config):
+    return Path(config['project']) / config['name']
+
+def resolve_split(dataset_path, entry):
+    """Absolute path for a data.yaml split entry (Roboflow exports use '../train/images')"""
+    candidate = Path(entry)
+    if candidate.is_absolute():
+        return candidate
+    for base in (dataset_path / candidate, dataset_path / str(entry).replace('../', '', 1)):
+        if base.exists():
+            return base.resolve()
+    return (dataset_path / candidate).resolve()
+
+def training_data_yaml(config):
+    """
+    data.yaml to train on: the configured dataset, plus the hard example
+    queue (see ml/hard_examples.py) when `hard_examples` points at one with
+    images and `include_hard_examples` is set
+
+    The queue's labels are partial pseudo-labels (a capture only labels what
+    its own stage detected), so every unlabelled object would train as
+    background; the queue is only used after its labels have been reviewed
+    and completed, opted in with `--set include_hard_examples=true`.
+
+    Returns:
+        str: Absolute path of the data.yaml passed to YOLO.train()
+    """
+    data_yaml = Path(config['data']).absolute()
+    hard_examples = config.get('hard_examples')
+    queue_images = Path(hard_examples) / 'train' / 'images' if hard_examples else None
+    if not queue_images or not queue_images.is_dir() or not any(queue_images.iterdir()):
+        return str(data_yaml)
+    if not config.get('include_hard_examples', False):
+        print(f"ℹ️  Not training on the unreviewed hard examples in {queue_images} "
+              f"(review their labels, then --set include_hard_examples=true)")
+        return str(data_yaml)
+
+    with open(data_yaml, 'r') as f:
+        data = yaml.safe_load(f)
+    dataset_path = Path(data.get('path') or data_yaml.parent)
+    if not dataset_path.is_absolute():
+        dataset_path = data_yaml.parent / dataset_path
+
+    train_entries = data['train'] if isinstance(data['train'], list) else [data['train']]
+    merged = dict(data)
+    merged.pop('path', None)
+    merged['train'] = [str(resolve_split(dataset_path, e)) for e in train_entries] + [str(queue_images.resolve())]
+    for split in ('val', 'test'):
+        if data.get(split):
+            merged[split] = str(resolve_split(dataset_path, data[split]))
+
+    merged_path = Path(config['project']).absolute() / f"{config['name']}_data.yaml"
+    with open(merged_path, 'w') as f:
+        yaml.safe_dump(merged, f, sort_keys=False)
+    print(f"✅ Including {sum(1 for _ in queue_images.iterdir())} hard examples from {queue_images}")
+    return str(merged_path)
+
+def train_from_config(config, resume=None):
+    """
+    Train (or resume) the model described by `config`
+
+    Args:
+        config (dict): Loaded training config
+        resume (bool): Force resume on/off; None follows config['resume']
+
+    Returns:
+        bool: True when the final model was written
+    """
+    from ultralytics import YOLO
+
+    run_dir = _run_dir(config)
+    weights_dir = run_dir / 'weights'
+    last_checkpoint = weights_dir / 'last.pt'
+    best_checkpoint = weights_dir / 'best.pt'
+    Path(config['project']).mkdir(parents=True, exist_ok=True)
+
+    if resume is None:
+        resume = config.get('resume', 'auto') in ('auto', True)
+    completed = (run_dir / COMPLETED_MARKER).exists()
+
+    if resume and last_checkpoint.exists() and not completed:
+        print(f"Resuming from checkpoint: {last_checkpoint}")
+        model = YOLO(str(last_checkpoint))
+        # Ultralytics restores every training argument from the checkpoint
+        model.train(resume=True)
+    else:
+        if completed and resume:
+            print(f"Previous run in {run_dir} completed; starting a new run")
+        train_args = resolve_resources(config.get('train', {}))
+        print("🎯 Training parameters:")
+        for key, value in train_args.items():
+            print(f"- {key}: {value}")
+        (run_dir / COMPLETED_MARKER).unlink(missing_ok=True)
+        model = YOLO(config.get('model', 'yolov8n.pt'))
+        model.train(
+            data=training_data_yaml(config),
+            project=str(config['project']),
+            name=config['name'],
+            exist_ok=True,
+            **train_args
+        )
+
+    final_model_path = Path(config['final_model'])
+    final_model_path.parent.mkdir(parents=True, exist_ok=True)
+    if best_checkpoint.exists():
+        shutil.copy2(best_checkpoint, final_model_path)
+        print(f"✅ Best model saved to: {final_model_path}")
+    else:
+        model.save(str(final_model_path))
+        print(f"✅ Model saved to: {final_model_path}")
+
+    with open(run_dir / COMPLETED_MARKER, 'w') as f:
+        json.dump({"final_model": str(final_model_path)}, f)
+
+    print(f"📊 Logs in: {run_dir}/")
+    return True
+
+def run(config_path, overrides=(), resume=None, verify_only=False):
+    """Verify the dataset and train; returns a process exit code"""
+    config = load_config(config_path, overrides)
+
+    print("Step 1: Verifying dataset...")
+    if not verify_dataset(config):
+        print("❌ Dataset verification failed.")
+        return 1
+    if verify_only:
+        return 0
+
+    print("\nStep 2: Training model...")
+    try:
+        if train_from_config(config, resume):
+            print("✅ Training completed successfully!")
+            return 0
+    except Exception as e:
+        print(f"❌ Training error: {e}")
+    print("❌ Training failed.")
+    return 1
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless YOLO training from a config file")
+    parser.add_argument("config", help="YAML config, e.g. ml/configs/license_plate.yaml")
+    parser.add_argument("--set", dest="overrides", action="append", default=[],
+                        help="Override a config value, e.g. train.epochs=50 (repeatable)")
+    resume_group = parser.add_mutually_exclusive_group()
+    resume_group.add_argument("--resume", dest="resume", action="store_true", default=None,
+                              help="Resume from last.pt even if the config says otherwise")
+    resume_group.add_argument("--no-resume", dest="resume", action="store_false",
+                              help="Start a fresh run")
+    parser.add_argument("--verify-only", action="store_true", help="Only verify the dataset")
+    args = parser.parse_args(argv)
+    return run(args.config, args.overrides, args.resume, args.verify_only)
+
+if __name__ == '__main__':
+    sys.exit(main())
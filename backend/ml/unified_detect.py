@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Unified Vehicle and License Plate Detection
+Runs one multi-class YOLO model (2-wheeler / 4-wheeler / number_plate, trained
+with ml/configs/unified.yaml) once per frame and adapts its boxes to the
+detect_vehicles() and detect_license_plates() response formats, instead of
+running the COCO vehicle model and the plate model separately.
+
+    python ml/unified_detect.py <image_path> [confidence_threshold] [--format=both|vehicle|plates]
+
+--format=vehicle and --format=plates print exactly what detect.py / detect_license_plate.py
+would, so either script can be swapped for this one.
+"""
+
+import os
+import sys
+import cv2
+from ultralytics import YOLO
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from stage_timer import StageTimer, finalize_timings
+from ml_metrics import record_call, record_model_cache, track_in_flight
+from ml_profiling import parse_profile_args, run_with_profile
+from deadline import parse_deadline_args, resolve_deadline
+from ml_core import load_image_reduced, scale_boxes, write_result
+from result_protocol import serve_requests
+from hard_examples import capture_plate_result, capture_vehicle_result
+from detect_license_plate import plate_detection, plate_result
+from yolo_dataset import category_for_name
+
+VEHICLE_CATEGORIES = ('2-wheeler', '4-wheeler')
+PLATE_CATEGORY = 'number_plate'
+OUTPUT_FORMATS = ('both', 'vehicle', 'plates')
+
+# Path of the unified model to use instead of the defaults
+MODEL_ENV_VAR = "ML_UNIFIED_MODEL"
+
+# Loaded once per process so long-lived workers skip the model load
+_unified_model = None
+_class_categories = None
+# Set once no model could be loaded, so later calls don't probe the paths again
+_unified_missing = False
+
+def load_unified_model():
+    """Load the trained unified detection model, reusing it across calls (None if unavailable)"""
+    global _unified_model, _class_categories, _unified_missing
+    if _unified_model is not None:
+        record_model_cache("unified_detector", True)
+        return _unified_model
+    if _unified_missing:
+        return None
+    record_model_cache("unified_detector", False)
+
+    configured_path = os.environ.get(MODEL_ENV_VAR)
+    model_paths = [configured_path] if configured_path else [
+        'models/unified_detector.pt',
+        'models/unified/unified_detector/weights/best.pt',
+        'models/unified/unified_detector/weights/last.pt'
+    ]
+    for model_path in model_paths:
+        if os.path.exists(model_path):
+            try:
+                model = YOLO(model_path)
+                print(f"Loaded unified model from: {model_path}")
+                # Dataset class names (car, bike, number_plate, ...) -> API categories
+                _class_categories = {int(class_id): category_for_name(name)
+                                     for class_id, name in model.names.items()}
+                _unified_model = model
+                return model
+            except Exception as e:
+                print(f"Failed to load model from {model_path}: {e}")
+                continue
+
+    print("Warning: No trained unified model found.")
+    print("Please train it first using: python ml/training_runner.py ml/configs/unified.yaml")
+    _unified_missing = True
+    return None
+
+def to_vehicle_result(detections):
+    """detect_vehicles() response: the most confident vehicle box"""
+    if not detections:
+        return {"success": False, "error": "No detections found"}
+    vehicles = [d for d in detections if d["category"] in VEHICLE_CATEGORIES]
+    if not vehicles:
+        return {"success": False, "error": "No valid vehicle detected"}
+    best = max(vehicles, key=lambda d: d["confidence"])
+    return {
+        "success": True,
+        "vehicle_type": best["category"],
+        "confidence": best["confidence"],
+        "bbox": list(best["bbox"])
+    }
+
+def to_plate_result(detections, width, height):
+    """detect_license_plates() response: plate-shaped number_plate boxes"""
+    plates = (plate_detection(*d["bbox"], d["confidence"])
+              for d in detections if d["category"] == PLATE_CATEGORY)
+    return plate_result([p for p in plates if p is not None], width, height)
+
+def detect_unified(image_path, confidence_threshold=0.25, include_timings=None, deadline=None):
+    """
+    Detect vehicles and license plates with a single forward pass
+
+    Args:
+        image_path (str): Path to the image file
+        confidence_threshold (float): Minimum confidence for detection
+        include_timings (bool): Attach a `timings_ms` block (default: ML_INCLUDE_TIMINGS)
+        deadline (Deadline | float): Time budget (see deadline.py); detection
+            is not started once it is spent
+
+    Returns:
+        dict: `detections` plus `vehicle` and `license_plates` in the formats
+            of detect_vehicles() and detect_license_plates()
+    """
+    timer = StageTimer()
+    deadline = resolve_deadline(deadline)
+    with track_in_flight("detect_unified"):
+        result = _detect_unified(image_path, confidence_threshold, timer, deadline)
+    deadline.annotate(result)
+    record_call("detect_unified", result, timer, model="unified_detector",
+                detection_count=len(result.get("detections", [])))
+    if result.get("success"):
+        capture_vehicle_result(image_path, result["vehicle"])
+        capture_plate_result(image_path, result["license_plates"])
+    return finalize_timings(result, timer, "detect_unified", include_timings)
+
+def _detect_unified(image_path, confidence_threshold, timer, deadline):
+    """Detection body; records each stage on `timer`"""
+    try:
+        if not os.path.exists(image_path):
+            return {"success": False, "error": f"Image not found: {image_path}"}
+
+        with timer.stage("imread"):
+            image, scale, (width, height) = load_image_reduced(image_path)
+        if image is None:
+            return {"success": False, "error": "Failed to load image"}
+        if deadline.skip("detect"):
+            return {"success": False, "error": "Deadline exceeded before detection"}
+
+        with timer.stage("model_load"):
+            model = load_unified_model()
+        if model is None:
+            return {"success": False, "error": "Unified detection model not available"}
+
+        with timer.stage("preprocess"):
+            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+        with timer.stage("inference"):
+            results = model(image_rgb, conf=confidence_threshold)
+        if results:
+            timer.split("inference", "nms", getattr(results[0], "speed", {}).get("postprocess"))
+
+        detections = []
+        if results and len(results[0].boxes) > 0:
+            boxes = results[0].boxes
+            xyxy = scale_boxes(boxes.xyxy.cpu().numpy(), *scale)
+            for class_id, confidence, bbox in zip(boxes.cls.tolist(), boxes.conf.tolist(),
+                                                  xyxy.tolist()):
+                category = _class_categories.get(int(class_id))
+                if category is None:
+                    continue
+                detections.append({
+                    "category": category,
+                    "class_name": model.names[int(class_id)],
+                    "confidence": confidence,
+                    "bbox": bbox
+                })
+        detections.sort(key=lambda d: d["confidence"], reverse=True)
+
+        vehicle = to_vehicle_result(detections)
+        license_plates = to_plate_result(detections, width, height)
+        return {
+            "success": vehicle["success"] or license_plates["success"],
+            "detections": detections,
+            "vehicle": vehicle,
+            "license_plates": license_plates,
+            "image_dimensions": {"width": width, "height": height}
+        }
+
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+def select_format(result, output_format):
+    """The part of a detect_unified() result a caller asked for"""
+    if output_format == 'both' or "vehicle" not in result:
+        return result
+    selected = dict(result["vehicle"] if output_format == 'vehicle' else result["license_plates"])
+    # Diagnostics attached by finalize_timings / run_with_profile describe the whole call
+    for key in ("timings_ms", "memory_peak_kb", "profile", "partial", "deadline"):
+        if key in result:
+            selected[key] = result[key]
+    return selected
+
+def run_cli(args, profile_modes):
+    """Result for one set of CLI arguments (also used per request by --serve)"""
+    output_format = 'both'
+    try:
+        args, deadline_ms = parse_deadline_args(args)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    for arg in list(args):
+        if arg.startswith('--format'):
+            output_format = arg.partition('=')[2]
+            args.remove(arg)
+    if len(args) < 1 or output_format not in OUTPUT_FORMATS:
+        return {
+            "success": False,
+            "error": "Usage: python unified_detect.py <image_path> [confidence_threshold] "
+                     "[--format=both|vehicle|plates] [--deadline-ms=N] [--profile[=modes]] | --serve"
+        }
+
+    image_path = args[0]
+    confidence_threshold = float(args[1]) if len(args) > 1 else 0.25
+
+    try:
+        result = run_with_profile(profile_modes, image_path, detect_unified,
+                                  image_path, confidence_threshold, deadline=deadline_ms)
+        return select_format(result, output_format)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+def main():
+    """Main function for CLI usage"""
+    args, profile_modes = parse_profile_args(sys.argv[1:])
+    if args[:1] == ["--serve"]:
+        # One JSON argument list per stdin line, one result written per request
+        return serve_requests(lambda request: run_cli(request, profile_modes), write_result)
+    result = run_cli(args, profile_modes)
+    write_result(result)
+    return 0 if result["success"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Geometric Two-Wheeler Classifier
+Python port of the aspect-ratio + edge-density heuristic in
+services/detection/vehicleDetection.js (determineVehicleType), run on the
+vehicle box crop with whole-array OpenCV/NumPy operations instead of a
+per-pixel loop. When enabled, detect.py attaches its opinion to vehicles
+YOLO is unsure of as an advisory `geometry` field; YOLO's `vehicle_type`
+(used for fees) is never replaced, as the heuristic is too crude for that.
+
+Same rules and thresholds as the JS version:
+    aspect ratio   width / height within [0.5, 0.8]      weight 0.4
+    edge density   share of pixels whose right or lower
+                   neighbour differs by more than 30,
+                   after grayscale, normalize, sharpen   >= 0.4, weight 0.4
+    vertical       width / height < 1.2                  weight 0.2
+    2-wheeler when the weighted score reaches 0.6
+
+    cd backend
+    python ml/vehicle_geometry.py <image_path> [--bbox=x1,y1,x2,y2] [--repeat=N]
+
+Settings (environment):
+    ML_GEOMETRY_FALLBACK_CONF  YOLO confidence below which detect.py attaches
+                               the classifier's opinion (default 0: disabled)
+"""
+
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from ml_core import crop_boxes, load_image, write_result
+
+FALLBACK_ENV_VAR = "ML_GEOMETRY_FALLBACK_CONF"
+DEFAULT_FALLBACK_CONFIDENCE = 0.0
+
+EDGE_DENSITY_THRESHOLD = 0.4
+ASPECT_RATIO_MIN = 0.5
+ASPECT_RATIO_MAX = 0.8
+CONFIDENCE_BASE = 0.7
+EDGE_DIFF_THRESHOLD = 30
+VERTICAL_RATIO = 1.2
+TWO_WHEELER_SCORE = 0.6
+
+# libvips' default (mild) sharpen, which sharp().sharpen() applies without arguments, is
+# the 3x3 kernel [[-1, -1, -1], [-1, 32, -1], [-1, -1, -1]] / 24, i.e.
+# pixel + 0.375 * (pixel - 3x3 mean); the box-mean form runs in integer code
+SHARPEN_AMOUNT = 0.375
+
+def fallback_confidence():
+    """YOLO confidence below which the geometric opinion is attached (ML_GEOMETRY_FALLBACK_CONF, 0 = off)"""
+    try:
+        return float(os.environ.get(FALLBACK_ENV_VAR, DEFAULT_FALLBACK_CONFIDENCE))
+    except ValueError:
+        return DEFAULT_FALLBACK_CONFIDENCE
+
+def edge_density(image):
+    """
+    Share of pixels with a strong horizontal or vertical neighbour difference
+
+    Args:
+        image (numpy.ndarray): BGR or grayscale crop
+
+    Returns:
+        float: Edge pixels / all pixels (the JS version's denominator)
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    h, w = gray.shape
+    if h < 3 or w < 3:
+        return 0.0
+    low, high, _, _ = cv2.minMaxLoc(gray)
+    if low > 0 or high < 255:
+        gray = cv2.normalize(gray, None, 0, 255, cv2.NORM_MINMAX)
+    mean = cv2.blur(gray, (3, 3), borderType=cv2.BORDER_REPLICATE)
+    gray = cv2.addWeighted(gray, 1 + SHARPEN_AMOUNT, mean, -SHARPEN_AMOUNT, 0)
+    center = gray[1:-1, 1:-1]
+    # absdiff on uint8 views (no int16 copies, no overflow); either neighbour
+    # above the threshold is the larger of the two differences above it
+    strongest = cv2.max(cv2.absdiff(center, gray[1:-1, 2:]), cv2.absdiff(center, gray[2:, 1:-1]))
+    return float(np.count_nonzero(strongest > EDGE_DIFF_THRESHOLD)) / (w * h)
+
+def classify_vehicle_crop(image):
+    """
+    Geometric 2-wheeler / 4-wheeler opinion for one vehicle crop
+
+    Returns:
+        dict: `vehicle_type`, `confidence` and the measures behind them
+    """
+    h, w = image.shape[:2]
+    aspect_ratio = w / h if h else 0.0
+    density = edge_density(image)
+    aspect_ok = ASPECT_RATIO_MIN <= aspect_ratio <= ASPECT_RATIO_MAX
+    edge_ok = density >= EDGE_DENSITY_THRESHOLD
+    vertical = aspect_ratio < VERTICAL_RATIO
+    score = 0.4 * aspect_ok + 0.4 * edge_ok + 0.2 * vertical
+    two_wheeler = score >= TWO_WHEELER_SCORE
+
+    if two_wheeler:
+        aspect_confidence = 0.8 if abs(aspect_ratio - 0.65) < 0.15 else 0.5
+        edge_confidence = 0.8 if edge_ok else 0.5
+    else:
+        aspect_confidence = 0.8 if abs(aspect_ratio - 1.5) < 0.3 else 0.5
+        edge_confidence = 0.8 if not edge_ok else 0.5
+    confidence = min(0.95, CONFIDENCE_BASE + aspect_confidence * 0.15 + edge_confidence * 0.15)
+
+    return {
+        "vehicle_type": "2-wheeler" if two_wheeler else "4-wheeler",
+        "confidence": round(confidence, 4),
+        "score": round(score, 2),
+        "aspect_ratio": round(aspect_ratio, 4),
+        "edge_density": round(density, 4),
+    }
+
+def classify_vehicle_boxes(image, boxes):
+    """classify_vehicle_crop() for each (N, 4) x1, y1, x2, y2 box of `image`"""
+    return [classify_vehicle_crop(crop) if crop.size else None
+            for crop in crop_boxes(image, boxes)]
+
+def main():
+    """Classify an image (or one box of it) and report the time per call"""
+    args = sys.argv[1:]
+    options = {key: value for key, _, value in (a.partition("=") for a in args if a.startswith("--"))}
+    args = [a for a in args if not a.startswith("--")]
+    if len(args) != 1:
+        write_result({"success": False, "error": "Usage: python vehicle_geometry.py <image_path> [--bbox=x1,y1,x2,y2] [--repeat=N]"})
+        return 1
+    image = load_image(args[0])
+    if image is None:
+        write_result({"success": False, "error": f"Could not load image: {args[0]}"})
+        return 1
+    if "--bbox" in options:
+        image = crop_boxes(image, [float(v) for v in options["--bbox"].split(",")])[0]
+
+    repeat = max(1, int(options.get("--repeat", 20)))
+    classify_vehicle_crop(image)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = classify_vehicle_crop(image)
+    elapsed_ms = (time.perf_counter() - start) * 1000 / repeat
+    write_result({"success": True, **result, "crop_size": list(image.shape[1::-1]),
+                  "ms_per_crop": round(elapsed_ms, 3)})
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Vehicle and License Plate Association Service
+Detects every vehicle and plate in a frame, assigns each plate to the vehicle
+box that encloses it and reads the plate text, so a frame with several
+vehicles yields one {vehicle_type, plate_text, confidences} record per vehicle.
+
+Uses the unified model (ml/unified_detect.py) for a single forward pass when
+it is available, otherwise the COCO vehicle model plus the plate model.
+
+    python ml/vehicle_plate_service.py <image_path> [confidence_threshold] [ocr_method] [--deadline-ms=N] [--profile[=modes]]
+"""
+
+import os
+import sys
+import statistics
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from detect import detect_vehicles
+from detect_license_plate import detect_license_plates
+from unified_detect import VEHICLE_CATEGORIES, detect_unified, load_unified_model
+from stage_timer import StageTimer, finalize_timings
+from ml_metrics import record_call, track_in_flight
+from ml_profiling import parse_profile_args, run_with_profile
+from ml_core import as_boxes, crop_boxes, load_image, write_result
+from result_protocol import serve_requests
+from plate_reading import read_plates
+from deadline import parse_deadline_args, resolve_deadline
+
+# Share of the plate area that must lie inside a vehicle box to assign it
+MIN_PLATE_OVERLAP = 0.6
+MIN_CELL_SIZE = 32
+PLATE_PADDING = 5
+
+class BoxGridIndex:
+    """
+    Uniform grid over (x1, y1, x2, y2) boxes
+
+    Each box is registered in every cell it touches, so a query only looks
+    at boxes near the queried region instead of all of them.
+    """
+
+    def __init__(self, boxes, cell_size=None):
+        self.boxes = list(boxes)
+        if cell_size is None:
+            # About one vehicle per cell keeps cell lists short
+            sides = [max(b[2] - b[0], b[3] - b[1]) for b in self.boxes]
+            cell_size = statistics.median(sides) if sides else MIN_CELL_SIZE
+        self.cell_size = max(float(cell_size), MIN_CELL_SIZE)
+        self._cells = {}
+        for box_id, box in enumerate(self.boxes):
+            for cell in self._cells_for(box):
+                self._cells.setdefault(cell, []).append(box_id)
+
+    def _cells_for(self, box):
+        x1, y1, x2, y2 = (int(v // self.cell_size) for v in box)
+        return ((cx, cy) for cx in range(x1, x2 + 1) for cy in range(y1, y2 + 1))
+
+    def query(self, box):
+        """Ids of boxes sharing a grid cell with `box` (a superset of the overlapping ones)"""
+        found = set()
+        for cell in self._cells_for(box):
+            found.update(self._cells.get(cell, ()))
+        return sorted(found)
+
+def overlap_fraction(inner, outer):
+    """Share of the `inner` box area that lies inside `outer`"""
+    inter_w = min(inner[2], outer[2]) - max(inner[0], outer[0])
+    inter_h = min(inner[3], outer[3]) - max(inner[1], outer[1])
+    area = (inner[2] - inner[0]) * (inner[3] - inner[1])
+    if inter_w <= 0 or inter_h <= 0 or area <= 0:
+        return 0.0
+    return inter_w * inter_h / area
+
+def assign_plates(vehicle_boxes, plate_boxes, min_overlap=MIN_PLATE_OVERLAP):
+    """
+    Match plates to the vehicles that enclose them
+
+    Candidate pairs come from the grid index. Pairs are taken best first:
+    largest enclosed share, then the tightest (smallest) vehicle box, so a
+    plate on a car in front of a bus goes to the car. Each vehicle and each
+    plate is used at most once.
+
+    Args:
+        vehicle_boxes (list): (x1, y1, x2, y2) per vehicle
+        plate_boxes (list): (x1, y1, x2, y2) per plate
+        min_overlap (float): Minimum enclosed share of the plate area
+
+    Returns:
+        dict: plate index -> vehicle index
+    """
+    index = BoxGridIndex(vehicle_boxes)
+    candidates = []
+    for plate_id, plate in enumerate(plate_boxes):
+        for vehicle_id in index.query(plate):
+            vehicle = vehicle_boxes[vehicle_id]
+            overlap = overlap_fraction(plate, vehicle)
+            if overlap >= min_overlap:
+                vehicle_area = (vehicle[2] - vehicle[0]) * (vehicle[3] - vehicle[1])
+                candidates.append((-overlap, vehicle_area, plate_id, vehicle_id))
+
+    assignment = {}
+    used_vehicles = set()
+    for _, _, plate_id, vehicle_id in sorted(candidates):
+        if plate_id in assignment or vehicle_id in used_vehicles:
+            continue
+        assignment[plate_id] = vehicle_id
+        used_vehicles.add(vehicle_id)
+    return assignment
+
+def _detect_objects(image_path, confidence_threshold, timer, deadline):
+    """
+    Vehicles as (vehicle_type, confidence, box), plates in the
+    detect_license_plates() detection format and the frame's image_dimensions,
+    from the unified model when available, else from the two separate models
+    """
+    with timer.stage("model_load"):
+        unified_available = load_unified_model() is not None
+    if unified_available:
+        unified = detect_unified(image_path, confidence_threshold, include_timings=True,
+                                 deadline=deadline)
+        timer.absorb(unified, prefix="detection.")
+        if "detections" not in unified:
+            raise RuntimeError(unified.get("error", "Unified detection failed"))
+        vehicles = [(d["category"], d["confidence"], tuple(d["bbox"]))
+                    for d in unified["detections"] if d["category"] in VEHICLE_CATEGORIES]
+        return ("unified", vehicles, unified["license_plates"].get("detections", []),
+                unified["image_dimensions"])
+
+    vehicle_result = detect_vehicles(image_path, include_timings=True, mode="all", deadline=deadline)
+    timer.absorb(vehicle_result, prefix="vehicles.")
+    vehicles = [(v["vehicle_type"], v["confidence"], tuple(v["bbox"]))
+                for v in vehicle_result.get("vehicles", [])]
+
+    plate_result = detect_license_plates(image_path, confidence_threshold, include_timings=True,
+                                         deadline=deadline)
+    timer.absorb(plate_result, prefix="plates.")
+    return ("separate", vehicles, plate_result.get("detections", []),
+            plate_result.get("image_dimensions", {}))
+
+def associate_vehicle_plates(image_path, confidence_threshold=0.25, ocr_method="auto",
+                             include_timings=None, deadline=None):
+    """
+    Detect vehicles and plates and link each plate to its vehicle
+
+    Args:
+        image_path (str): Path to the image file
+        confidence_threshold (float): Minimum confidence for plate detection
+        ocr_method (str): OCR method to use
+        include_timings (bool): Attach a `timings_ms` block (default: ML_INCLUDE_TIMINGS)
+        deadline (Deadline | float): Time budget (see deadline.py); plates not
+            read when it is spent keep their box without text (`partial`)
+
+    Returns:
+        dict: `vehicles` records ({vehicle_type, plate_text, confidences, ...})
+            and plates that no vehicle encloses
+    """
+    timer = StageTimer()
+    deadline = resolve_deadline(deadline)
+    with track_in_flight("associate_vehicle_plates"):
+        result = _associate_vehicle_plates(image_path, confidence_threshold, ocr_method, timer,
+                                           deadline)
+    deadline.annotate(result)
+    record_call("associate_vehicle_plates", result, timer,
+                detection_count=len(result.get("vehicles", [])))
+    return finalize_timings(result, timer, "associate_vehicle_plates", include_timings)
+
+def _associate_vehicle_plates(image_path, confidence_threshold, ocr_method, timer, deadline):
+    """Association body; records each stage on `timer`"""
+    try:
+        if not os.path.exists(image_path):
+            return {"success": False, "error": f"Image not found: {image_path}"}
+
+        # Detection decodes a reduced frame; full pixels are only needed for plate crops
+        source, vehicles, plates, dimensions = _detect_objects(image_path, confidence_threshold,
+                                                               timer, deadline)
+        if not vehicles and not plates:
+            error = ("Deadline exceeded before detection" if "detect" in deadline.skipped_stages
+                     else "No vehicles or license plates detected")
+            return {"success": False, "error": error, "image_dimensions": dimensions}
+
+        with timer.stage("associate"):
+            assignment = assign_plates([box for _, _, box in vehicles],
+                                       [as_boxes(p["bbox"])[0] for p in plates])
+        plate_for_vehicle = {vehicle_id: plate_id for plate_id, vehicle_id in assignment.items()}
+
+        image = None
+        if assignment and not deadline.skip("decode"):
+            with timer.stage("imread"):
+                image = load_image(image_path)
+            if image is None:
+                return {"success": False, "error": "Failed to load image"}
+
+        # Assigned plates are read together, so CRNN reads them in one batched pass
+        plate_ids = sorted(assignment)
+        crops = [None] * len(plate_ids)
+        if image is not None and plate_ids and not deadline.skip("ocr"):
+            with timer.stage("crop"):
+                crops = crop_boxes(image, [plates[i]["bbox"] for i in plate_ids],
+                                   padding=PLATE_PADDING)
+        readings = dict(zip(plate_ids, read_plates(crops, ocr_method, timer, deadline)))
+
+        records = []
+        for vehicle_id, (vehicle_type, vehicle_confidence, box) in enumerate(vehicles):
+            record = {
+                "vehicle_id": vehicle_id + 1,
+                "vehicle_type": vehicle_type,
+                "bbox": [round(v, 1) for v in box],
+                "plate_text": None,
+                "plate_bbox": None,
+                "confidences": {"vehicle": vehicle_confidence, "plate": None, "ocr": None}
+            }
+            plate_id = plate_for_vehicle.get(vehicle_id)
+            if plate_id is not None:
+                plate = plates[plate_id]
+                ocr_result, quality = readings[plate_id]
+                record["plate_bbox"] = plate["bbox"]
+                if quality is not None:
+                    record["plate_quality"] = quality
+                record["confidences"]["plate"] = plate["confidence"]
+                if ocr_result.get("success") and ocr_result.get("license_plate_text"):
+                    record["plate_text"] = ocr_result["license_plate_text"]
+                    record["plate_format_valid"] = ocr_result.get("format_valid", False)
+                    record["confidences"]["ocr"] = ocr_result.get("confidence")
+                else:
+                    record["ocr_error"] = ocr_result.get("error", "No text recognized")
+            records.append(record)
+
+        unassigned = [plates[i] for i in range(len(plates)) if i not in assignment]
+        return {
+            "success": True,
+            "source": source,
+            "vehicles": records,
+            "unassigned_plates": unassigned,
+            "summary": {
+                "vehicles_detected": len(vehicles),
+                "plates_detected": len(plates),
+                "vehicles_with_plate_text": sum(1 for r in records if r["plate_text"])
+            },
+            "image_dimensions": dimensions
+        }
+
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+def run_cli(args, profile_modes):
+    """Result for one set of CLI arguments (also used per request by --serve)"""
+    try:
+        args, deadline_ms = parse_deadline_args(args)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    if len(args) < 1:
+        return {
+            "success": False,
+            "error": "Usage: python vehicle_plate_service.py <image_path> [confidence_threshold] [ocr_method] [--deadline-ms=N] [--profile[=modes]] | --serve"
+        }
+
+    image_path = args[0]
+    confidence_threshold = float(args[1]) if len(args) > 1 else 0.25
+    ocr_method = args[2] if len(args) > 2 else "auto"
+
+    try:
+        return run_with_profile(profile_modes, image_path, associate_vehicle_plates,
+                                image_path, confidence_threshold, ocr_method, deadline=deadline_ms)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+def main():
+    """Main function for CLI usage"""
+    args, profile_modes = parse_profile_args(sys.argv[1:])
+    if args[:1] == ["--serve"]:
+        # One JSON argument list per stdin line, one result written per request
+        return serve_requests(lambda request: run_cli(request, profile_modes), write_result)
+    result = run_cli(args, profile_modes)
+    write_result(result)
+    return 0 if result["success"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
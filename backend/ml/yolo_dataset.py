@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+YOLO Dataset Helpers
+Shared helpers for the datasets/vehicle_detection layout used by the training,
+evaluation and dataset tooling scripts:
+
+    <dataset>/data.yaml
+    <dataset>/<split>/images/<stem>.jpg
+    <dataset>/<split>/labels/<stem>.txt   (class_id center_x center_y width height, normalized)
+"""
+
+import os
+import json
+import hashlib
+from pathlib import Path
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# Dataset class names mapped onto the categories used by the API
+TWO_WHEELER_NAMES = {'bike', 'motorbike', 'motorcycle', 'scooter', 'scooty', 'bicycle', 'moped',
+                     'two_wheeler', 'two-wheeler', '2-wheeler', '2_wheeler'}
+FOUR_WHEELER_NAMES = {'car', 'bus', 'truck', 'van', 'jeep', 'suv', 'auto', 'autorickshaw',
+                      'auto_rickshaw', 'tempo', 'lorry', 'four_wheeler', 'four-wheeler',
+                      '4-wheeler', '4_wheeler'}
+PLATE_NAMES = {'number_plate', 'license_plate', 'licence_plate', 'plate', 'numberplate'}
+
+def load_class_names(dataset_path):
+    """Class names from data.yaml as a list indexed by class id"""
+    import yaml
+
+    with open(Path(dataset_path) / 'data.yaml', 'r') as f:
+        names = yaml.safe_load(f).get('names', [])
+    if isinstance(names, dict):
+        names = [names[i] for i in sorted(names)]
+    return list(names)
+
+def category_for_name(name):
+    """'2-wheeler', '4-wheeler', 'number_plate' or None for a dataset class name"""
+    key = str(name).strip().lower()
+    if key in TWO_WHEELER_NAMES:
+        return '2-wheeler'
+    if key in FOUR_WHEELER_NAMES:
+        return '4-wheeler'
+    if key in PLATE_NAMES:
+        return 'number_plate'
+    return None
+
+def list_images(directory):
+    """Sorted image paths in a directory (empty list if it does not exist)"""
+    directory = Path(directory)
+    if not directory.exists():
+        return []
+    return sorted(p for p in directory.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+
+def label_path_for(image_path):
+    """<split>/images/<stem>.jpg -> <split>/labels/<stem>.txt"""
+    image_path = Path(image_path)
+    return image_path.parent.parent / 'labels' / f"{image_path.stem}.txt"
+
+def parse_label_text(text):
+    """
+    Parse the contents of a YOLO label file
+
+    Returns:
+        tuple: (boxes, bad_lines) where boxes is a list of
+            (class_id, center_x, center_y, width, height) in normalized units
+    """
+    boxes = []
+    bad_lines = 0
+    for line in text.splitlines():
+        parts = line.split()
+        if not parts:
+            continue
+        try:
+            class_id = int(float(parts[0]))
+            cx, cy, w, h = (float(v) for v in parts[1:5])
+        except (ValueError, IndexError):
+            bad_lines += 1
+            continue
+        if len(parts) != 5:
+            # Polygon (segmentation) rows: reduce to their bounding box
+            try:
+                coords = [float(v) for v in parts[1:]]
+            except ValueError:
+                bad_lines += 1
+                continue
+            xs, ys = coords[0::2], coords[1::2]
+            if len(xs) < 3 or len(xs) != len(ys):
+                bad_lines += 1
+                continue
+            cx, cy = (min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2
+            w, h = max(xs) - min(xs), max(ys) - min(ys)
+        boxes.append((class_id, cx, cy, w, h))
+    return boxes, bad_lines
+
+def read_yolo_labels(label_path):
+    """Boxes from a label file; missing file means an image with no objects"""
+    try:
+        with open(label_path, 'r') as f:
+            return parse_label_text(f.read())[0]
+    except FileNotFoundError:
+        return []
+
+def to_pixel_xyxy(box, width, height):
+    """Normalized (class, cx, cy, w, h) -> (class, x1, y1, x2, y2) in pixels"""
+    class_id, cx, cy, w, h = box
+    return (class_id,
+            (cx - w / 2) * width, (cy - h / 2) * height,
+            (cx + w / 2) * width, (cy + h / 2) * height)
+
+MANIFEST_FILENAME = '.dataset_manifest.json'
+
+def _scan_directory(directory):
+    """(name, size, mtime_ns) for every file in a directory, from a single scandir pass"""
+    entries = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.is_file():
+                stat = entry.stat()
+                entries.append((entry.name, stat.st_size, stat.st_mtime_ns))
+    entries.sort()
+    return entries
+
+def _file_digest(paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(path.name.encode('utf-8'))
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def load_dataset_manifest(dataset_path, subdirs):
+    """
+    File counts and label checksums for `subdirs`, cached in the dataset
+
+    Each directory is listed once; its content checksum is only recomputed
+    when a file was added, removed, resized or touched since the cached run,
+    so verification of unchanged data costs one scandir per directory.
+
+    Args:
+        dataset_path (Path): Dataset root containing data.yaml
+        subdirs (list): Relative directories such as 'train/images'
+
+    Returns:
+        tuple: (manifest dict, list of subdirs that changed since the cache)
+    """
+    dataset_path = Path(dataset_path)
+    manifest_path = dataset_path / MANIFEST_FILENAME
+    try:
+        with open(manifest_path, 'r') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        cached = {}
+
+    manifest = {"dirs": dict(cached.get("dirs", {}))}
+    changed = []
+    for subdir in subdirs:
+        directory = dataset_path / subdir
+        if not directory.is_dir():
+            manifest["dirs"][subdir] = {"exists": False, "count": 0}
+            continue
+
+        entries = _scan_directory(directory)
+        signature = hashlib.sha256(repr(entries).encode('utf-8')).hexdigest()
+        previous = cached.get("dirs", {}).get(subdir)
+        if previous and previous.get("signature") == signature:
+            continue
+
+        info = {"exists": True, "count": len(entries), "signature": signature}
+        if Path(subdir).name == 'labels':
+            info["checksum"] = _file_digest(directory / name for name, _, _ in entries)
+        manifest["dirs"][subdir] = info
+        changed.append(subdir)
+
+    data_yaml = dataset_path / 'data.yaml'
+    manifest["data_yaml_checksum"] = _file_digest([data_yaml]) if data_yaml.exists() else None
+    if changed or manifest["data_yaml_checksum"] != cached.get("data_yaml_checksum"):
+        try:
+            tmp_path = manifest_path.with_suffix('.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(tmp_path, manifest_path)
+        except OSError as e:
+            print(f"Warning: could not write dataset manifest: {e}")
+    return manifest, changed
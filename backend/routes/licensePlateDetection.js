@@ -6,11 +6,18 @@ import fsSync from "fs";
 import { spawn } from "child_process";
 import { fileURLToPath } from "url";
 import { dirname } from "path";
+import { ML_RESULT_ENV, ResultFrameDecoder } from "../utils/mlResultFrames.js";
+import { ML_METRICS_ENV } from "../utils/mlMetrics.js";
 
 // Import models
 import PlateRecord from "../models/PlateRecord.js";
 
 const router = express.Router();
+
+// The Python pipelines get a deadline this much shorter than the kill timeout,
+// so they return a partial result (e.g. detections without OCR) instead of
+// being killed; the margin covers interpreter start-up and model imports
+const DEADLINE_MARGIN = 15_000;
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = dirname(__filename);
 
@@ -48,13 +55,17 @@ async function runLicensePlateDetection(
     if (ocr) {
       args.push("auto"); // OCR method
     }
+    args.push(`--deadline-ms=${SCRIPT_TIMEOUT - DEADLINE_MARGIN}`);
 
-    const pythonProcess = spawn("python", args);
+    // Framed output: results are read by length instead of scanning for markers
+    const pythonProcess = spawn("python", args, {
+      env: { ...process.env, ...ML_RESULT_ENV, ...ML_METRICS_ENV },
+    });
 
+    const decoder = new ResultFrameDecoder();
     let output = "";
     let error = "";
-    let resultStarted = false;
-    let resultJson = "";
+    let resultReceived = false;
     let timer = null;
 
     // start timeout
@@ -68,30 +79,21 @@ async function runLicensePlateDetection(
     }, SCRIPT_TIMEOUT);
 
     pythonProcess.stdout.on("data", (data) => {
-      const dataStr = data.toString();
-
-      if (dataStr.includes("RESULT_START")) {
-        resultStarted = true;
+      let results;
+      try {
+        results = decoder.push(data);
+      } catch (parseError) {
+        if (timer) clearTimeout(timer);
+        reject(new Error(`Failed to parse result: ${parseError.message}`));
         return;
       }
-
-      if (dataStr.includes("RESULT_END")) {
-        resultStarted = false;
-        try {
-          if (timer) clearTimeout(timer);
-          const result = JSON.parse(resultJson);
-          resolve(result);
-        } catch (parseError) {
-          reject(new Error(`Failed to parse result: ${parseError.message}`));
-        }
+      if (results.length > 0) {
+        resultReceived = true;
+        if (timer) clearTimeout(timer);
+        resolve(results[results.length - 1]);
         return;
       }
-
-      if (resultStarted) {
-        resultJson += dataStr;
-      } else {
-        output += dataStr;
-      }
+      output += data.toString();
     });
 
     pythonProcess.stderr.on("data", (data) => {
@@ -102,7 +104,7 @@ async function runLicensePlateDetection(
     pythonProcess.on("close", (code) => {
       if (timer) clearTimeout(timer);
       console.log(`[License Plate] Process exited with code: ${code}`);
-      if (code !== 0 && !resultJson) {
+      if (code !== 0 && !resultReceived) {
         console.error(`[License Plate] Full stderr:`, error);
         console.error(`[License Plate] Full stdout:`, output);
         reject(
@@ -123,30 +125,66 @@ async function runLicensePlateDetection(
 
 /**
  * Utility function to run detection and cropping (like show_detected_plate.py)
+ * @param {string} artifacts - "all", "none" or a comma list of
+ *   annotated,cropped,resized; skipped ones are rendered later by
+ *   POST /render-artifacts from the returned `source_image`
  */
-async function runDetectionAndCropping(imagePath, confidence = 0.25) {
-  // Default timeout for cropping script
-  const SCRIPT_TIMEOUT = 60_000;
+async function runDetectionAndCropping(
+  imagePath,
+  confidence = 0.25,
+  artifacts = "all"
+) {
+  console.log(
+    `[License Plate] Image path exists: ${fsSync.existsSync(imagePath)}`
+  );
+  return runCropService(
+    [
+      imagePath,
+      confidence.toString(),
+      `--artifacts=${artifacts}`,
+      `--deadline-ms=${CROP_SCRIPT_TIMEOUT - DEADLINE_MARGIN}`,
+    ],
+    "Detection and cropping"
+  );
+}
+
+/**
+ * Utility function to render deferred artifacts for earlier detections
+ * @param {string} sourceImage - `source_image` kept by the detection run
+ * @param {object[]} detections - `detection_summary.detections` of that run
+ */
+async function runArtifactRendering(sourceImage, detections, artifacts = "all") {
+  return runCropService(
+    ["--render", sourceImage, JSON.stringify(detections), artifacts],
+    "Artifact rendering"
+  );
+}
+
+// Default timeout for the cropping script
+const CROP_SCRIPT_TIMEOUT = 60_000;
+
+/**
+ * Run detect_and_crop_service.py and resolve with its result frame
+ */
+function runCropService(scriptArgs, label) {
   return new Promise((resolve, reject) => {
     const scriptPath = path.join(__dirname, "../ml/detect_and_crop_service.py");
-    const args = [scriptPath, imagePath, confidence.toString()];
+    const args = [scriptPath, ...scriptArgs];
 
     console.log(`[License Plate] Running: python ${args.join(" ")}`);
-    console.log(
-      `[License Plate] Image path exists: ${fsSync.existsSync(imagePath)}`
-    );
 
     // Set working directory to backend folder where the script expects to run
     const options = {
       cwd: path.join(__dirname, ".."),
+      env: { ...process.env, ...ML_RESULT_ENV, ...ML_METRICS_ENV },
     };
 
     const pythonProcess = spawn("python", args, options);
 
+    const decoder = new ResultFrameDecoder();
     let output = "";
     let error = "";
-    let resultStarted = false;
-    let resultJson = "";
+    let resultReceived = false;
     let timer = null;
 
     // start timeout
@@ -154,37 +192,25 @@ async function runDetectionAndCropping(imagePath, confidence = 0.25) {
       try {
         if (!pythonProcess.killed) pythonProcess.kill("SIGTERM");
       } catch (e) {}
-      reject(new Error(`Cropping script timed out after ${SCRIPT_TIMEOUT}ms`));
-    }, SCRIPT_TIMEOUT);
+      reject(new Error(`${label} script timed out after ${CROP_SCRIPT_TIMEOUT}ms`));
+    }, CROP_SCRIPT_TIMEOUT);
 
     pythonProcess.stdout.on("data", (data) => {
-      const dataStr = data.toString();
-
-      if (dataStr.includes("RESULT_START")) {
-        resultStarted = true;
+      let results;
+      try {
+        results = decoder.push(data);
+      } catch (parseError) {
+        if (timer) clearTimeout(timer);
+        reject(new Error(`Failed to parse ${label.toLowerCase()} result: ${parseError.message}`));
         return;
       }
-
-      if (dataStr.includes("RESULT_END")) {
-        resultStarted = false;
-        try {
-          if (timer) clearTimeout(timer);
-          const result = JSON.parse(resultJson);
-          resolve(result);
-        } catch (parseError) {
-          console.error(`[License Plate] Parse error:`, parseError);
-          reject(
-            new Error(`Failed to parse cropping result: ${parseError.message}`)
-          );
-        }
+      if (results.length > 0) {
+        resultReceived = true;
+        if (timer) clearTimeout(timer);
+        resolve(results[results.length - 1]);
         return;
       }
-
-      if (resultStarted) {
-        resultJson += dataStr;
-      } else {
-        output += dataStr;
-      }
+      output += data.toString();
     });
 
     pythonProcess.stderr.on("data", (data) => {
@@ -195,14 +221,12 @@ async function runDetectionAndCropping(imagePath, confidence = 0.25) {
     pythonProcess.on("close", (code) => {
       if (timer) clearTimeout(timer);
       console.log(`[License Plate] Process exited with code: ${code}`);
-      if (code !== 0 && !resultJson) {
+      if (code !== 0 && !resultReceived) {
         console.error(`[License Plate] Full stderr:`, error);
         console.error(`[License Plate] Full stdout:`, output);
         reject(
           new Error(
-            `Detection and cropping script failed with code ${code}: ${
-              error || output
-            }`
+            `${label} script failed with code ${code}: ${error || output}`
           )
         );
       }
@@ -213,13 +237,29 @@ async function runDetectionAndCropping(imagePath, confidence = 0.25) {
       console.error(`[License Plate] Process error:`, err);
       reject(
         new Error(
-          `Failed to start detection and cropping process: ${err.message}`
+          `Failed to start ${label.toLowerCase()} process: ${err.message}`
         )
       );
     });
   });
 }
 
+// Frames kept by the cropping script for deferred rendering (see artifact_store.py)
+const ARTIFACTS_DIR =
+  process.env.ML_ARTIFACTS_DIR || path.join(__dirname, "../temp");
+const SOURCE_FRAME_NAME = /^source_[0-9a-f]{40}\.[a-z]+$/;
+
+/**
+ * Path of a kept source frame, or null when `sourceImage` is not one
+ */
+function resolveSourceFrame(sourceImage) {
+  if (typeof sourceImage !== "string") return null;
+  const name = path.basename(sourceImage);
+  if (!SOURCE_FRAME_NAME.test(name)) return null;
+  const framePath = path.join(path.resolve(__dirname, "..", ARTIFACTS_DIR), name);
+  return fsSync.existsSync(framePath) ? framePath : null;
+}
+
 /**
  * Save image buffer to temporary file
  */
@@ -369,8 +409,15 @@ router.post("/detect-and-crop", upload.single("image"), async (req, res) => {
     tempImagePath = await saveImageToTemp(buffer, req.file.originalname);
     console.log(`[License Plate] Saved temp image to: ${tempImagePath}`);
 
+    // Only render the artifacts the client asks for (default: all)
+    const artifacts = req.body.artifacts || "all";
+
     // Run detection and cropping using our Python script
-    const result = await runDetectionAndCropping(tempImagePath, confidence);
+    const result = await runDetectionAndCropping(
+      tempImagePath,
+      confidence,
+      artifacts
+    );
 
     // Add metadata
     result.processing_info = {
@@ -399,6 +446,40 @@ router.post("/detect-and-crop", upload.single("image"), async (req, res) => {
   }
 });
 
+/**
+ * @route POST /api/license-plate/render-artifacts
+ * @description Render artifacts a detect-and-crop call deferred (annotated
+ *   frame, upscaled crops), only when the client asks for them
+ */
+router.post("/render-artifacts", async (req, res) => {
+  try {
+    const { source_image: sourceImage, detections, artifacts = "all" } = req.body;
+
+    const framePath = resolveSourceFrame(sourceImage);
+    if (!framePath) {
+      return res.status(404).json({
+        success: false,
+        message: "Source frame not found (expired or never kept)",
+      });
+    }
+    if (!Array.isArray(detections) || detections.length === 0) {
+      return res.status(400).json({
+        success: false,
+        message: "Detections are required",
+      });
+    }
+
+    const result = await runArtifactRendering(framePath, detections, artifacts);
+    res.json(result);
+  } catch (error) {
+    console.error("License plate artifact rendering error:", error);
+    res.status(500).json({
+      success: false,
+      message: error.message || "Failed to render license plate artifacts",
+    });
+  }
+});
+
 /**
  * @route POST /api/license-plate/detect-with-ocr
  * @description Detect license plates and extract text using OCR
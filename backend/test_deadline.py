@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Deadline Tests
+pytest cases for budget parsing and propagation in ml/deadline.py.
+
+    cd backend
+    python -m pytest test_deadline.py
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ml'))
+from deadline import DEADLINE_ENV_VAR, Deadline, parse_budget, parse_deadline_args, resolve_deadline
+
+@pytest.mark.parametrize("value, expected", [(None, None), ("", None), (" ", None),
+                                             ("0", 0.0), ("250", 250.0), ("1.5", 1.5)])
+def test_parse_budget(value, expected):
+    assert parse_budget(value) == expected
+
+@pytest.mark.parametrize("value", ["-1", "abc", "inf", "nan"])
+def test_parse_budget_rejects_invalid_values(value):
+    with pytest.raises(ValueError):
+        parse_budget(value)
+
+def test_parse_deadline_args():
+    assert parse_deadline_args(["frame.jpg", "--deadline-ms=500", "0.25"]) == (["frame.jpg", "0.25"], 500.0)
+    assert parse_deadline_args(["frame.jpg"]) == (["frame.jpg"], None)
+    with pytest.raises(ValueError):
+        parse_deadline_args(["--deadline-ms=soon"])
+
+def test_explicit_zero_overrides_environment(monkeypatch):
+    monkeypatch.setenv(DEADLINE_ENV_VAR, "1")
+    assert resolve_deadline(0).budget_ms is None
+    assert resolve_deadline(None).budget_ms == 1.0
+
+def test_invalid_environment_means_no_deadline(monkeypatch):
+    monkeypatch.setenv(DEADLINE_ENV_VAR, "soon")
+    assert resolve_deadline().budget_ms is None
+
+def test_existing_deadline_is_shared():
+    deadline = Deadline(1000)
+    assert resolve_deadline(deadline) is deadline
+
+def test_child_args():
+    assert Deadline().child_args() == []
+    assert Deadline(60000).child_args()[0].startswith("--deadline-ms=")
+    # A spent budget still reaches the child as a deadline, not as 0 (none)
+    assert Deadline(0.0001).child_args() == ["--deadline-ms=1"]
+
+def test_skip_and_annotate():
+    deadline = Deadline(0.0001)
+    while not deadline.expired():
+        pass
+    assert deadline.skip("ocr")
+    assert deadline.skip("ocr")
+    result = deadline.annotate({"success": True})
+    assert result["partial"]
+    assert result["deadline"]["skipped_stages"] == ["ocr"]
+    assert Deadline().annotate({"success": True}) == {"success": True}
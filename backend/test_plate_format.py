@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Plate Format Tests
+pytest cases for the registration grammar and OCR confusion correction in
+ml/plate_format.py.
+
+    cd backend
+    python -m pytest test_plate_format.py
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ml'))
+from plate_format import apply_plate_format, clean_plate_text, edit_distance, normalize_plate
+
+@pytest.mark.parametrize("text, expected", [
+    ("MH12AB1234", "MH12AB1234"),
+    ("DL3CAB1234", "DL3CAB1234"),
+    ("KA051234", "KA051234"),
+    ("22BH1234AA", "22BH1234AA"),
+])
+def test_valid_plates_are_kept(text, expected):
+    result = normalize_plate(text)
+    assert result["text"] == expected
+    assert result["valid"]
+    assert result["corrections"] == 0
+
+def test_clean_plate_text():
+    assert clean_plate_text("mh 12-ab 1234") == "MH12AB1234"
+    assert clean_plate_text(None) == ""
+
+@pytest.mark.parametrize("text, expected", [
+    ("MH12AB12O4", "MH12AB1204"),  # O in the number
+    ("MH12A81234", "MH12AB1234"),  # 8 in the series
+    ("MHI2AB1234", "MH12AB1234"),  # I in the district
+    ("22BHI234AA", "22BH1234AA"),
+])
+def test_confusions_are_corrected_by_position(text, expected):
+    result = normalize_plate(text)
+    assert result["text"] == expected
+    assert result["valid"]
+    assert result["corrections"] == 1
+
+def test_format_detection():
+    assert normalize_plate("MH12AB1234")["format"] == "standard"
+    assert normalize_plate("22BH1234AA")["format"] == "bh"
+
+def test_unknown_state_is_invalid():
+    result = normalize_plate("XX12AB1234")
+    assert not result["valid"]
+    assert result["format"] is None
+
+def test_unissued_series_letter_is_invalid():
+    result = normalize_plate("MH12IO1234")
+    assert not result["valid"]
+
+def test_truncated_number_is_not_made_valid():
+    result = normalize_plate("MH12AB123")
+    assert not result["valid"]
+
+def test_apply_plate_format_keeps_raw_text():
+    ocr_result = {"success": True, "license_plate_text": "mh12ab12o4"}
+    apply_plate_format(ocr_result)
+    assert ocr_result["license_plate_text"] == "MH12AB1204"
+    assert ocr_result["raw_text"] == "mh12ab12o4"
+    assert ocr_result["format_valid"]
+    assert ocr_result["format_corrections"] == 1
+
+def test_apply_plate_format_ignores_failures():
+    failed = {"success": False, "error": "No text recognized"}
+    assert apply_plate_format(failed) == {"success": False, "error": "No text recognized"}
+
+def test_edit_distance():
+    assert edit_distance("MH12AB1234", "MH12AB1234") == 0
+    assert edit_distance("MH12AB1234", "MH12A81234") == 1
+    assert edit_distance("MH12AB1234", "MH12AB123") == 1
+    assert edit_distance("MH12AB1234", "KA05", max_distance=2) == 3
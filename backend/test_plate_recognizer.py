@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Plate Recognizer Tests
+pytest cases for the CTC decoding and text encoding of ml/plate_recognizer.py;
+they need numpy only, not onnxruntime or a trained model.
+
+    cd backend
+    python -m pytest test_plate_recognizer.py
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ml'))
+from plate_recognizer import ALPHABET, BLANK, ctc_greedy_decode, encode_text
+
+def _log_probs(paths, confidence=0.9):
+    """(N, T, C) log-probabilities whose best path is each list of class ids"""
+    classes = len(ALPHABET) + 1
+    steps = max(len(path) for path in paths)
+    rest = (1.0 - confidence) / (classes - 1)
+    probs = np.full((len(paths), steps, classes), rest, dtype=np.float32)
+    for row, path in enumerate(paths):
+        padded = list(path) + [BLANK] * (steps - len(path))
+        for step, class_id in enumerate(padded):
+            probs[row, step, class_id] = confidence
+    return np.log(probs)
+
+def test_encode_text():
+    assert encode_text("ab1") == [ALPHABET.index("A") + 1, ALPHABET.index("B") + 1, 2]
+    assert encode_text("MH-12") == encode_text("MH12")
+
+def test_decode_collapses_repeats_and_drops_blanks():
+    path = encode_text("MH12")
+    m, h, one, two = path
+    decoded = ctc_greedy_decode(_log_probs([[BLANK, m, m, BLANK, h, one, one, two, BLANK]]))
+    assert decoded[0][0] == "MH12"
+
+def test_blank_separates_repeated_characters():
+    one = encode_text("1")[0]
+    assert ctc_greedy_decode(_log_probs([[one, BLANK, one, one]]))[0][0] == "11"
+
+def test_decode_batch():
+    texts = ["MH12AB1234", "KA051234", "22BH1234AA"]
+    paths = []
+    for text in texts:
+        path = []
+        for class_id in encode_text(text):
+            path += [class_id, BLANK]
+        paths.append(path)
+    assert [text for text, _ in ctc_greedy_decode(_log_probs(paths))] == texts
+
+def test_confidence():
+    decoded = ctc_greedy_decode(_log_probs([encode_text("AB"), [BLANK, BLANK]], confidence=0.8))
+    assert decoded[0][1] == pytest.approx(0.8, abs=1e-5)
+    assert decoded[1] == ("", 0.0)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Result Protocol Tests
+pytest cases for the length-prefixed result frames of ml/result_protocol.py,
+including frames split across arbitrary chunks and mixed with log lines.
+
+    cd backend
+    python -m pytest test_result_protocol.py
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ml'))
+from result_protocol import FRAME_HEADER, FrameDecoder, decode_frames, encode_frame
+
+RESULT = {"success": True, "license_plate_text": "MH12AB1234", "confidence": 0.91,
+          "bbox": [10.5, 20.0, 110.25, 60.0], "plate_format": None, "label": "नंबर"}
+
+def test_json_round_trip():
+    assert decode_frames(encode_frame(RESULT)) == [RESULT]
+
+def test_msgpack_round_trip():
+    pytest.importorskip("msgpack")
+    assert decode_frames(encode_frame(RESULT, "msgpack")) == [RESULT]
+
+def test_bytes_are_base64_in_json():
+    assert decode_frames(encode_frame({"image": b"\xff\xd8"})) == [{"image": "/9g="}]
+
+def test_header_carries_payload_length():
+    frame = encode_frame(RESULT)
+    _, _, length = FRAME_HEADER.unpack_from(frame)
+    assert length == len(frame) - FRAME_HEADER.size
+
+def test_log_lines_between_frames_are_ignored():
+    data = b"Loaded model\n" + encode_frame(RESULT) + b"warning\n" + encode_frame({"success": False})
+    assert decode_frames(data) == [RESULT, {"success": False}]
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64])
+def test_chunked_input(chunk_size):
+    data = b"log\n" + encode_frame(RESULT) + encode_frame({"success": False}) + b"tail"
+    decoder = FrameDecoder()
+    results = []
+    for start in range(0, len(data), chunk_size):
+        results.extend(decoder.feed(data[start:start + chunk_size]))
+    assert results == [RESULT, {"success": False}]
+
+def test_incomplete_frame_waits_for_more_data():
+    frame = encode_frame(RESULT)
+    decoder = FrameDecoder()
+    assert decoder.feed(frame[:-1]) == []
+    assert decoder.feed(frame[-1:]) == [RESULT]
@@ -0,0 +1,15 @@
+/**
+ * Environment for the backend/ml scripts so each one-shot run merges its
+ * inference metrics into one file (see backend/ml/ml_metrics.py); serve it
+ * to Prometheus with `ML_METRICS_FILE=<file> python ml/ml_metrics.py --serve 9108`.
+ */
+
+import path from "path";
+import { fileURLToPath } from "url";
+
+const __dirname = path.dirname(fileURLToPath(import.meta.url));
+
+export const ML_METRICS_FILE =
+  process.env.ML_METRICS_FILE || path.join(__dirname, "../temp/ml_metrics.prom");
+
+export const ML_METRICS_ENV = { ML_METRICS_FILE };
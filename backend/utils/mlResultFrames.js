@@ -0,0 +1,55 @@
+/**
+ * Reader for the length-prefixed result frames written by backend/ml scripts
+ * when ML_RESULT_FORMAT=json (see backend/ml/result_protocol.py).
+ *
+ * Frame: "\x1eMLR" | format byte ("J") | payload length (uint32 BE) | payload
+ */
+
+export const ML_RESULT_ENV = { ML_RESULT_FORMAT: "json" };
+
+const FRAME_MAGIC = Buffer.from("\x1eMLR", "latin1");
+const HEADER_SIZE = FRAME_MAGIC.length + 1 + 4;
+
+export class ResultFrameDecoder {
+  constructor() {
+    this.buffer = Buffer.alloc(0);
+  }
+
+  /**
+   * Add a stdout chunk; returns every result completed by it.
+   * Bytes outside frames (log lines) are dropped.
+   * @param {Buffer} chunk
+   * @returns {object[]}
+   */
+  push(chunk) {
+    this.buffer = Buffer.concat([this.buffer, chunk]);
+    const results = [];
+    for (;;) {
+      const start = this.buffer.indexOf(FRAME_MAGIC);
+      if (start === -1) {
+        // Keep a partial magic that may complete with the next chunk
+        this.buffer = this.buffer.subarray(
+          Math.max(0, this.buffer.length - FRAME_MAGIC.length + 1)
+        );
+        return results;
+      }
+      if (this.buffer.length - start < HEADER_SIZE) {
+        this.buffer = this.buffer.subarray(start);
+        return results;
+      }
+      const format = String.fromCharCode(this.buffer[start + FRAME_MAGIC.length]);
+      const length = this.buffer.readUInt32BE(start + FRAME_MAGIC.length + 1);
+      const end = start + HEADER_SIZE + length;
+      if (this.buffer.length < end) {
+        this.buffer = this.buffer.subarray(start);
+        return results;
+      }
+      if (format !== "J") {
+        throw new Error(`Unsupported result frame format: ${format}`);
+      }
+      const payload = this.buffer.subarray(start + HEADER_SIZE, end);
+      results.push(JSON.parse(payload.toString("utf8")));
+      this.buffer = this.buffer.subarray(end);
+    }
+  }
+}
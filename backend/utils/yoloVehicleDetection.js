@@ -3,6 +3,7 @@ import path from "path";
 import fs from "fs/promises";
 import { fileURLToPath } from "url";
 import { dirname } from "path";
+import { ML_METRICS_ENV } from "./mlMetrics.js";
 
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = dirname(__filename);
@@ -28,7 +29,7 @@ export const detectVehicle = async (imageBuffer) => {
     return new Promise((resolve, reject) => {
       // Spawn Python process
       const pythonProcess = spawn("python", [scriptPath, tempImagePath], {
-        env: { ...process.env, PYTHONUNBUFFERED: "1" },
+        env: { ...process.env, ...ML_METRICS_ENV, PYTHONUNBUFFERED: "1" },
         stdio: ["pipe", "pipe", "pipe"],
       });
 
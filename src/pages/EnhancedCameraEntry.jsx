@@ -180,6 +180,9 @@ const EnhancedCameraEntry = () => {
         try {
           const plateForm = new FormData();
           plateForm.append("image", blob, "capture.jpg");
+          // Only the plate crops are used here; the annotated frame can be rendered
+          // later via /api/license-plate/render-artifacts with the returned source_image
+          plateForm.append("artifacts", "cropped");
 
           // allow more time for license-plate detection + OCR (60s)
           const plateRes = await fetch(